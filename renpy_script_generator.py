@@ -1,1015 +1,5424 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, font
-import json
-import os
-import re
-
-# 变量名校验正则：仅允许字母、数字、下划线，不能以数字开头，无中文
-VAR_NAME_PATTERN = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
-
-class ConfigWindow(tk.Toplevel):
-    """角色配置文件编辑窗口"""
-    def __init__(self, parent):
-        super().__init__(parent)
-        self.title("角色配置文件编辑")
-        self.geometry("550x600")
-        self.minsize(550, 600)
-        self.resizable(True, True)
-        self.configure(bg="#f0f0f0")
-        self.parent = parent
-        
-        self.config_characters = []
-        
-        self.base_font = font.Font(family="Microsoft YaHei", size=11)
-        self.title_font = font.Font(family="Microsoft YaHei", size=12, weight="bold")
-        
-        self._init_ui()
-    
-    def _init_ui(self):
-        lbl_title = ttk.Label(self, text="角色配置管理", font=self.title_font)
-        lbl_title.pack(pady=10)
-        
-        frame_list = ttk.LabelFrame(self, text="角色列表", padding=(10, 8))
-        frame_list.pack(fill="both", padx=15, pady=5, expand=True)
-        
-        self.lb_config_chars = tk.Listbox(
-            frame_list,
-            font=self.base_font,
-            width=50,
-            height=15,
-            bd=1,
-            relief="solid",
-            selectbackground="#4a90e2",
-            selectforeground="white"
-        )
-        self.lb_config_chars.pack(side="left", fill="both", padx=5, pady=5, expand=True)
-        
-        scrollbar = ttk.Scrollbar(frame_list, orient="vertical", command=self.lb_config_chars.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.lb_config_chars.config(yscrollcommand=scrollbar.set)
-        
-        frame_input = ttk.LabelFrame(self, text="角色信息编辑", padding=(10, 8))
-        frame_input.pack(fill="x", padx=15, pady=5)
-        
-        ttk.Label(frame_input, text="角色变量名（预定义值，仅字母/数字/下划线）：", font=self.base_font).grid(row=0, column=0, padx=5, pady=5, sticky="w")
-        self.entry_var_name = ttk.Entry(frame_input, font=self.base_font, width=25)
-        self.entry_var_name.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-        
-        ttk.Label(frame_input, text="角色显示名称（可中文）：", font=self.base_font).grid(row=1, column=0, padx=5, pady=5, sticky="w")
-        self.entry_display_name = ttk.Entry(frame_input, font=self.base_font, width=25)
-        self.entry_display_name.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
-        
-        frame_input.columnconfigure(1, weight=1)
-        
-        frame_ops = ttk.Frame(self, padding=(10, 8))
-        frame_ops.pack(fill="x", padx=15, pady=5)
-        
-        btn_style = ttk.Style()
-        btn_style.configure("Config.TButton", font=self.base_font, padding=(8, 4))
-        
-        btn_add = ttk.Button(frame_ops, text="添加角色", command=self.add_character, style="Config.TButton")
-        btn_add.grid(row=0, column=0, padx=10, pady=5)
-        
-        btn_del = ttk.Button(frame_ops, text="删除选中角色", command=self.delete_character, style="Config.TButton")
-        btn_del.grid(row=0, column=1, padx=10, pady=5)
-        
-        btn_save_config = ttk.Button(frame_ops, text="保存配置文件", command=self.save_config, style="Config.TButton")
-        btn_save_config.grid(row=1, column=0, padx=10, pady=5)
-        
-        btn_import_to_editor = ttk.Button(frame_ops, text="导入到编辑界面", command=self.import_to_editor, style="Config.TButton")
-        btn_import_to_editor.grid(row=1, column=1, padx=10, pady=5)
-        
-        frame_ops.columnconfigure(0, weight=1)
-        frame_ops.columnconfigure(1, weight=1)
-    
-    def add_character(self):
-        var_name = self.entry_var_name.get().strip()
-        display_name = self.entry_display_name.get().strip()
-        
-        if not var_name:
-            messagebox.showwarning("警告", "角色变量名不能为空！", parent=self)
-            return
-        if not VAR_NAME_PATTERN.match(var_name):
-            messagebox.showwarning("警告", "变量名仅允许字母、数字、下划线，且不能以数字开头，禁止中文！", parent=self)
-            return
-        for char in self.config_characters:
-            if char["var_name"] == var_name:
-                messagebox.showinfo("提示", f"变量名「{var_name}」已存在！", parent=self)
-                return
-        
-        if not display_name:
-            display_name = var_name
-        
-        self.config_characters.append({
-            "var_name": var_name,
-            "display_name": display_name
-        })
-        display_text = f"{var_name} - {display_name}"
-        self.lb_config_chars.insert(tk.END, display_text)
-        
-        self.entry_var_name.delete(0, tk.END)
-        self.entry_display_name.delete(0, tk.END)
-    
-    def delete_character(self):
-        selected_index = self.lb_config_chars.curselection()
-        if not selected_index:
-            messagebox.showwarning("警告", "请先选中要删除的角色！", parent=self)
-            return
-        
-        selected_index = selected_index[0]
-        char_info = self.config_characters[selected_index]
-        if messagebox.askyesno("确认", f"是否删除角色「{char_info['var_name']} - {char_info['display_name']}」？", parent=self):
-            del self.config_characters[selected_index]
-            self.lb_config_chars.delete(selected_index)
-    
-    def save_config(self):
-        if not self.config_characters:
-            messagebox.showwarning("警告", "请先添加至少一个角色！", parent=self)
-            return
-        
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".json",
-            filetypes=[("角色配置文件", "*.json"), ("所有文件", "*.*")],
-            title="保存角色配置文件",
-            parent=self
-        )
-        if not file_path:
-            return
-        
-        config_data = {"characters": self.config_characters}
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(config_data, f, ensure_ascii=False, indent=4)
-            messagebox.showinfo("成功", f"配置文件已保存到：\n{file_path}", parent=self)
-        except Exception as e:
-            messagebox.showerror("错误", f"保存失败：{str(e)}", parent=self)
-    
-    def import_to_editor(self):
-        if not self.config_characters:
-            messagebox.showwarning("警告", "请先添加至少一个角色！", parent=self)
-            return
-        
-        self.parent.characters.clear()
-        self.parent.lb_characters.delete(0, tk.END)
-        
-        for char in self.config_characters:
-            self.parent.characters.append(char)
-            display_text = f"{char['var_name']} - {char['display_name']}"
-            self.parent.lb_characters.insert(tk.END, display_text)
-        
-        self.parent.update_character_combobox()
-        messagebox.showinfo("成功", f"已导入{len(self.config_characters)}个角色到编辑界面！", parent=self)
-        self.destroy()
-
-class StartWindow(tk.Toplevel):
-    """开始界面窗口"""
-    def __init__(self, parent):
-        super().__init__(parent)
-        self.title("Ren'Py脚本生成工具 - 开始界面")
-        self.geometry("500x400")
-        self.minsize(500, 400)
-        self.resizable(False, False)
-        self.configure(bg="#f0f0f0")
-        self.parent = parent
-        
-        parent.withdraw()
-        
-        self.base_font = font.Font(family="Microsoft YaHei", size=12)
-        self.title_font = font.Font(family="Microsoft YaHei", size=16, weight="bold")
-        
-        self.protocol("WM_DELETE_WINDOW", self.on_close)
-        
-        self._init_ui()
-    
-    def _init_ui(self):
-        lbl_title = ttk.Label(self, text="Ren'Py 对话脚本生成工具", font=self.title_font)
-        lbl_title.pack(pady=50)
-        
-        frame_buttons = ttk.Frame(self)
-        frame_buttons.pack(pady=20)
-        
-        btn_style = ttk.Style()
-        btn_style.configure("Start.TButton", font=self.base_font, padding=(15, 10), width=22)
-        
-        btn_new_file = ttk.Button(frame_buttons, text="新建脚本文件", command=self.new_script_file, style="Start.TButton")
-        btn_new_file.pack(pady=10)
-        
-        btn_open_file = ttk.Button(frame_buttons, text="打开临时脚本文件", command=self.open_script_file, style="Start.TButton")
-        btn_open_file.pack(pady=10)
-        
-        btn_new_config = ttk.Button(frame_buttons, text="新建角色配置文件", command=self.new_config_file, style="Start.TButton")
-        btn_new_config.pack(pady=10)
-    
-    def new_script_file(self):
-        self.parent.reset_editor()
-        self.parent.deiconify()
-        self.destroy()
-    
-    def open_script_file(self):
-        file_path = filedialog.askopenfilename(
-            filetypes=[("临时脚本文件", "*.json"), ("所有文件", "*.*")],
-            title="打开临时脚本文件",
-            parent=self
-        )
-        if not file_path:
-            return
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                temp_data = json.load(f)
-            
-            required_keys = ["characters", "current_label", "dialogues"]
-            if not all(key in temp_data for key in required_keys):
-                messagebox.showerror("错误", "文件格式错误，不是有效的临时脚本文件！", parent=self)
-                return
-            
-            self.parent.load_temp_data(temp_data)
-            self.parent.deiconify()
-            self.destroy()
-        except json.JSONDecodeError:
-            messagebox.showerror("错误", "文件损坏，无法解析！", parent=self)
-        except Exception as e:
-            messagebox.showerror("错误", f"打开失败：{str(e)}", parent=self)
-    
-    def new_config_file(self):
-        config_win = ConfigWindow(self.parent)
-        config_win.grab_set()
-    
-    def on_close(self):
-        self.parent.destroy()
-        self.destroy()
-
-class RenPyScriptGenerator(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Ren'Py 对话脚本生成工具 - 编辑界面")
-        self.geometry("950x780")
-        self.minsize(900, 700)
-        self.resizable(True, True)
-        self.configure(bg="#f0f0f0")
-        
-        self.drag_item = None
-        self.drag_index = -1
-        
-        self.characters = []
-        self.dialogues = []
-        self.current_label = tk.StringVar(value="start")
-        
-        self.init_fonts()
-        self.protocol("WM_DELETE_WINDOW", self.on_window_close)
-        self._init_ui()
-        self.start_window = StartWindow(self)
-    
-    def init_fonts(self):
-        self.base_font = font.Font(family="Microsoft YaHei", size=11)
-        self.title_font = font.Font(family="Microsoft YaHei", size=12, weight="bold")
-        self.btn_font = font.Font(family="Microsoft YaHei", size=11)
-        
-        tk.TkDefaultFont = self.base_font
-        ttk.Style().configure('.', font=self.base_font)
-    
-    def _init_ui(self):
-        """初始化编辑界面布局（按钮移至上方+文本框新增滚动条）"""
-        # ========== 顶部：场景设置区 ==========
-        frame_label = ttk.LabelFrame(self, text="场景设置（Label标签）", style="Title.TLabelframe")
-        frame_label.pack(fill="x", padx=15, pady=8)
-        frame_label.configure(padding=(10, 8))
-        
-        lbl_label = ttk.Label(frame_label, text="场景名称：", font=self.base_font)
-        lbl_label.grid(row=0, column=0, padx=8, pady=8)
-        
-        entry_label = ttk.Entry(frame_label, textvariable=self.current_label, font=self.base_font)
-        entry_label.grid(row=0, column=1, padx=8, pady=8, sticky="ew")
-        entry_label.configure(width=50)
-        frame_label.columnconfigure(1, weight=1)
-        
-        # ========== 顶部：操作按钮区（移至此处） ==========
-        frame_buttons = ttk.Frame(self)
-        frame_buttons.pack(fill="x", padx=15, pady=8)
-        
-        btn_style = ttk.Style()
-        btn_style.configure("Custom.TButton", font=self.btn_font, padding=(8, 4))
-        
-        btn_new = ttk.Button(
-            frame_buttons, 
-            text="新建脚本", 
-            command=self.new_script,
-            style="Custom.TButton"
-        )
-        btn_new.grid(row=0, column=0, padx=8, pady=5)
-        
-        btn_save_temp = ttk.Button(
-            frame_buttons, 
-            text="保存临时文件", 
-            command=self.save_temp_file,
-            style="Custom.TButton"
-        )
-        btn_save_temp.grid(row=0, column=1, padx=8, pady=5)
-        
-        btn_open_temp = ttk.Button(
-            frame_buttons, 
-            text="打开临时文件", 
-            command=self.open_temp_file,
-            style="Custom.TButton"
-        )
-        btn_open_temp.grid(row=0, column=2, padx=8, pady=5)
-        
-        btn_generate = ttk.Button(
-            frame_buttons, 
-            text="生成Ren'Py脚本", 
-            command=self.generate_script,
-            style="Custom.TButton"
-        )
-        btn_generate.grid(row=0, column=3, padx=8, pady=5)
-        
-        btn_save = ttk.Button(
-            frame_buttons, 
-            text="保存脚本文件", 
-            command=self.save_script,
-            style="Custom.TButton"
-        )
-        btn_save.grid(row=0, column=4, padx=8, pady=5)
-        
-        # ========== 主体容器 ==========
-        main_frame = ttk.Frame(self)
-        main_frame.pack(fill="both", padx=15, pady=8, expand=True)
-        
-        # ========== 左侧：角色管理区 ==========
-        frame_char = ttk.LabelFrame(main_frame, text="角色管理", style="Title.TLabelframe")
-        frame_char.pack(side="left", fill="y", padx=(0, 10), pady=0, ipady=8)
-        frame_char.configure(width=260, padding=(10, 8))
-        
-        self.lb_characters = tk.Listbox(
-            frame_char, 
-            font=self.base_font,
-            width=30, 
-            height=15,
-            bd=1,
-            relief="solid",
-            selectbackground="#4a90e2",
-            selectforeground="white"
-        )
-        self.lb_characters.pack(padx=8, pady=8)
-        
-        frame_char_input = ttk.LabelFrame(frame_char, text="新增角色", padding=(8, 6))
-        frame_char_input.pack(padx=8, pady=5, fill="x")
-        
-        ttk.Label(frame_char_input, text="变量名（预定义值）：", font=self.base_font).pack(padx=5, pady=3, fill="x")
-        self.entry_var_name = ttk.Entry(frame_char_input, font=self.base_font, width=25)
-        self.entry_var_name.pack(padx=5, pady=3, fill="x")
-        
-        ttk.Label(frame_char_input, text="显示名称：", font=self.base_font).pack(padx=5, pady=3, fill="x")
-        self.entry_display_name = ttk.Entry(frame_char_input, font=self.base_font, width=25)
-        self.entry_display_name.pack(padx=5, pady=3, fill="x")
-        
-        frame_char_btns = ttk.Frame(frame_char)
-        frame_char_btns.pack(padx=8, pady=5, fill="x")
-        
-        btn_add_char = ttk.Button(
-            frame_char_btns, 
-            text="添加角色", 
-            command=self.add_character,
-            style="Custom.TButton"
-        )
-        btn_add_char.pack(padx=5, pady=3, fill="x")
-        
-        btn_del_char = ttk.Button(
-            frame_char_btns, 
-            text="删除选中角色", 
-            command=self.delete_character,
-            style="Custom.TButton"
-        )
-        btn_del_char.pack(padx=5, pady=3, fill="x")
-        
-        btn_import_config = ttk.Button(
-            frame_char_btns,
-            text="从配置文件导入角色",
-            command=self.import_from_config,
-            style="Custom.TButton"
-        )
-        btn_import_config.pack(padx=5, pady=3, fill="x")
-        
-        # ========== 右侧：内容编辑+列表区 ==========
-        right_frame = ttk.Frame(main_frame)
-        right_frame.pack(side="right", fill="both", expand=True)
-        
-        # ========== 右侧上半：内容编辑区（文本框新增滚动条） ==========
-        frame_content_edit = ttk.LabelFrame(right_frame, text="内容编辑", style="Title.TLabelframe")
-        frame_content_edit.pack(fill="x", padx=0, pady=0)
-        frame_content_edit.configure(padding=(10, 8))
-        
-        # 角色对话子区域（文本框新增滚动条）
-        frame_character_dialog = ttk.LabelFrame(frame_content_edit, text="角色对话", style="Sub.TLabelframe")
-        frame_character_dialog.pack(fill="x", padx=5, pady=5)
-        
-        ttk.Label(frame_character_dialog, text="选择角色：", font=self.base_font).grid(row=0, column=0, padx=8, pady=8)
-        
-        self.cb_character = ttk.Combobox(
-            frame_character_dialog, 
-            state="readonly",
-            font=self.base_font,
-            width=35
-        )
-        self.cb_character.grid(row=0, column=1, columnspan=2, padx=8, pady=8, sticky="ew")
-        
-        ttk.Label(frame_character_dialog, text="对话内容：", font=self.base_font).grid(row=1, column=0, padx=8, pady=8, sticky="n")
-        
-        # 角色对话文本框+滚动条容器
-        frame_char_dialog_text = ttk.Frame(frame_character_dialog)
-        frame_char_dialog_text.grid(row=1, column=1, columnspan=2, padx=8, pady=8, sticky="nsew")
-        
-        self.txt_character_dialog = tk.Text(
-            frame_char_dialog_text, 
-            font=self.base_font,
-            height=4,
-            width=50,
-            bd=1,
-            relief="solid"
-        )
-        self.txt_character_dialog.pack(side="left", fill="both", expand=True)
-        
-        # 新增角色对话滚动条
-        scrollbar_char_dialog = ttk.Scrollbar(frame_char_dialog_text, orient="vertical", command=self.txt_character_dialog.yview)
-        scrollbar_char_dialog.pack(side="right", fill="y")
-        self.txt_character_dialog.config(yscrollcommand=scrollbar_char_dialog.set)
-        
-        btn_add_character_dialog = ttk.Button(
-            frame_character_dialog, 
-            text="添加角色对话", 
-            command=self.add_character_dialogue,
-            style="Custom.TButton"
-        )
-        btn_add_character_dialog.grid(row=2, column=0, columnspan=3, pady=8)
-        
-        frame_character_dialog.columnconfigure(1, weight=1)
-        
-        # 旁白子区域（文本框新增滚动条）
-        frame_narration = ttk.LabelFrame(frame_content_edit, text="旁白内容", style="Sub.TLabelframe")
-        frame_narration.pack(fill="x", padx=5, pady=5)
-        
-        ttk.Label(frame_narration, text="旁白文本：", font=self.base_font).grid(row=0, column=0, padx=8, pady=8, sticky="n")
-        
-        # 旁白文本框+滚动条容器
-        frame_narration_text = ttk.Frame(frame_narration)
-        frame_narration_text.grid(row=0, column=1, columnspan=2, padx=8, pady=8, sticky="nsew")
-        
-        self.txt_narration = tk.Text(
-            frame_narration_text, 
-            font=self.base_font,
-            height=4,
-            width=50,
-            bd=1,
-            relief="solid"
-        )
-        self.txt_narration.pack(side="left", fill="both", expand=True)
-        
-        # 新增旁白滚动条
-        scrollbar_narration = ttk.Scrollbar(frame_narration_text, orient="vertical", command=self.txt_narration.yview)
-        scrollbar_narration.pack(side="right", fill="y")
-        self.txt_narration.config(yscrollcommand=scrollbar_narration.set)
-        
-        btn_add_narration = ttk.Button(
-            frame_narration, 
-            text="添加旁白", 
-            command=self.add_narration,
-            style="Custom.TButton"
-        )
-        btn_add_narration.grid(row=1, column=0, columnspan=3, pady=8)
-        
-        frame_narration.columnconfigure(1, weight=1)
-        
-        # ========== 右侧下半：内容列表+排序按钮 ==========
-        frame_dialog_list = ttk.LabelFrame(right_frame, text="内容列表（可拖动排序）", style="Title.TLabelframe")
-        frame_dialog_list.pack(fill="both", padx=0, pady=8, expand=True)
-        frame_dialog_list.configure(padding=(10, 8))
-        
-        frame_sort_btns = ttk.Frame(frame_dialog_list)
-        frame_sort_btns.pack(fill="x", padx=5, pady=5)
-        
-        btn_move_up = ttk.Button(
-            frame_sort_btns, 
-            text="上移选中项", 
-            command=self.move_item_up,
-            style="Custom.TButton"
-        )
-        btn_move_up.pack(side="left", padx=5, pady=2)
-        
-        btn_move_down = ttk.Button(
-            frame_sort_btns, 
-            text="下移选中项", 
-            command=self.move_item_down,
-            style="Custom.TButton"
-        )
-        btn_move_down.pack(side="left", padx=5, pady=2)
-        
-        btn_del_dialog = ttk.Button(
-            frame_sort_btns, 
-            text="删除选中内容", 
-            command=self.delete_content,
-            style="Custom.TButton"
-        )
-        btn_del_dialog.pack(side="left", padx=5, pady=2)
-        
-        self.lb_contents = tk.Listbox(
-            frame_dialog_list,
-            font=self.base_font,
-            width=65,
-            height=15,
-            bd=1,
-            relief="solid",
-            selectbackground="#4a90e2",
-            selectforeground="white"
-        )
-        self.lb_contents.pack(side="left", fill="both", padx=5, pady=5, expand=True)
-        
-        scrollbar = ttk.Scrollbar(
-            frame_dialog_list, 
-            orient="vertical", 
-            command=self.lb_contents.yview
-        )
-        scrollbar.pack(side="right", fill="y", padx=0, pady=5)
-        self.lb_contents.config(yscrollcommand=scrollbar.set)
-        
-        self.lb_contents.bind("<ButtonPress-1>", self.on_drag_start)
-        self.lb_contents.bind("<B1-Motion>", self.on_drag_motion)
-        self.lb_contents.bind("<ButtonRelease-1>", self.on_drag_end)
-        
-        self._init_styles()
-    
-    def _init_styles(self):
-        style = ttk.Style()
-        
-        style.configure(".", background="#f0f0f0", font=self.base_font)
-        
-        style.configure(
-            "Title.TLabelframe",
-            font=self.title_font,
-            padding=(10, 8),
-            background="#f0f0f0"
-        )
-        style.configure(
-            "Title.TLabelframe.Label",
-            font=self.title_font,
-            background="#f0f0f0"
-        )
-        
-        style.configure(
-            "Sub.TLabelframe",
-            font=self.base_font,
-            padding=(8, 6),
-            background="#f0f0f0"
-        )
-        style.configure(
-            "Sub.TLabelframe.Label",
-            font=self.base_font,
-            background="#f0f0f0"
-        )
-        
-        style.configure(
-            "Custom.TButton",
-            font=self.btn_font,
-            padding=(8, 4),
-            relief="flat",
-            background="#4a90e2",
-            foreground="white"
-        )
-        style.map(
-            "Custom.TButton",
-            background=[("active", "#357abd"), ("pressed", "#28598f")]
-        )
-    
-    def update_character_combobox(self):
-        char_options = [f"{c['var_name']} - {c['display_name']}" for c in self.characters]
-        self.cb_character['values'] = char_options
-        if char_options:
-            self.cb_character.current(0)
-        else:
-            self.cb_character.set("")
-    
-    def reset_editor(self):
-        self.characters.clear()
-        self.dialogues.clear()
-        self.current_label.set("start")
-        self.lb_characters.delete(0, tk.END)
-        self.lb_contents.delete(0, tk.END)
-        self.entry_var_name.delete(0, tk.END)
-        self.entry_display_name.delete(0, tk.END)
-        self.txt_character_dialog.delete("1.0", tk.END)
-        self.txt_narration.delete("1.0", tk.END)
-        self.update_character_combobox()
-    
-    def load_temp_data(self, temp_data):
-        self.reset_editor()
-        
-        self.characters = temp_data["characters"]
-        for char in self.characters:
-            display_text = f"{char['var_name']} - {char['display_name']}"
-            self.lb_characters.insert(tk.END, display_text)
-        
-        self.current_label.set(temp_data["current_label"])
-        
-        self.dialogues = temp_data["dialogues"]
-        for content_type, char_var, content in self.dialogues:
-            if content_type == "character":
-                char_display = char_var
-                for char in self.characters:
-                    if char["var_name"] == char_var:
-                        char_display = char["display_name"]
-                        break
-                display_text = f"[角色] {char_display}: {content}"
-            else:
-                display_text = f"[旁白] {content}"
-            self.lb_contents.insert(tk.END, display_text)
-        
-        self.update_character_combobox()
-    
-    def add_character(self):
-        var_name = self.entry_var_name.get().strip()
-        display_name = self.entry_display_name.get().strip()
-        
-        if not var_name:
-            messagebox.showwarning("警告", "角色变量名不能为空！")
-            return
-        if not VAR_NAME_PATTERN.match(var_name):
-            messagebox.showwarning("警告", "变量名仅允许字母、数字、下划线，且不能以数字开头，禁止中文！")
-            return
-        for char in self.characters:
-            if char["var_name"] == var_name:
-                messagebox.showinfo("提示", f"变量名「{var_name}」已存在！")
-                return
-        
-        if not display_name:
-            display_name = var_name
-        
-        self.characters.append({
-            "var_name": var_name,
-            "display_name": display_name
-        })
-        display_text = f"{var_name} - {display_name}"
-        self.lb_characters.insert(tk.END, display_text)
-        
-        self.entry_var_name.delete(0, tk.END)
-        self.entry_display_name.delete(0, tk.END)
-        
-        self.update_character_combobox()
-        messagebox.showinfo("成功", f"角色「{var_name} - {display_name}」添加完成！")
-    
-    def delete_character(self):
-        selected_index = self.lb_characters.curselection()
-        if not selected_index:
-            messagebox.showwarning("警告", "请先选中要删除的角色！")
-            return
-        
-        selected_index = selected_index[0]
-        char_info = self.characters[selected_index]
-        if messagebox.askyesno("确认", f"是否删除角色「{char_info['var_name']} - {char_info['display_name']}」？"):
-            del self.characters[selected_index]
-            self.lb_characters.delete(selected_index)
-            self.update_character_combobox()
-            messagebox.showinfo("成功", f"角色已删除！")
-    
-    def import_from_config(self):
-        file_path = filedialog.askopenfilename(
-            filetypes=[("角色配置文件", "*.json"), ("所有文件", "*.*")],
-            title="打开角色配置文件"
-        )
-        if not file_path:
-            return
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                config_data = json.load(f)
-            
-            if "characters" not in config_data:
-                messagebox.showerror("错误", "配置文件格式错误，缺少角色数据！")
-                return
-            
-            config_chars = config_data["characters"]
-            if not config_chars:
-                messagebox.showwarning("警告", "配置文件中无角色数据！")
-                return
-            
-            self.characters.clear()
-            self.lb_characters.delete(0, tk.END)
-            
-            for char in config_chars:
-                self.characters.append(char)
-                display_text = f"{char['var_name']} - {char['display_name']}"
-                self.lb_characters.insert(tk.END, display_text)
-            
-            self.update_character_combobox()
-            messagebox.showinfo("成功", f"已从配置文件导入{len(config_chars)}个角色！")
-        except json.JSONDecodeError:
-            messagebox.showerror("错误", "配置文件损坏，无法解析！")
-        except Exception as e:
-            messagebox.showerror("错误", f"导入失败：{str(e)}")
-    
-    def add_character_dialogue(self):
-        selected_char_text = self.cb_character.get()
-        dialog_content = self.txt_character_dialog.get("1.0", tk.END).strip()
-        
-        if not selected_char_text:
-            messagebox.showwarning("警告", "请先选择一个角色！")
-            return
-        if not dialog_content:
-            messagebox.showwarning("警告", "角色对话内容不能为空！")
-            return
-        
-        char_var = selected_char_text.split(" - ")[0]
-        char_display = selected_char_text.split(" - ")[1] if len(selected_char_text.split(" - "))>1 else char_var
-        
-        self.dialogues.append(("character", char_var, dialog_content))
-        display_text = f"[角色] {char_display}: {dialog_content}"
-        self.lb_contents.insert(tk.END, display_text)
-        self.txt_character_dialog.delete("1.0", tk.END)
-    
-    def add_narration(self):
-        narration_content = self.txt_narration.get("1.0", tk.END).strip()
-        
-        if not narration_content:
-            messagebox.showwarning("警告", "旁白内容不能为空！")
-            return
-        
-        self.dialogues.append(("narration", "", narration_content))
-        display_text = f"[旁白] {narration_content}"
-        self.lb_contents.insert(tk.END, display_text)
-        self.txt_narration.delete("1.0", tk.END)
-    
-    def on_drag_start(self, event):
-        self.drag_index = self.lb_contents.nearest(event.y)
-        if self.drag_index >= 0:
-            self.drag_item = self.lb_contents.get(self.drag_index)
-            self.lb_contents.selection_clear(0, tk.END)
-            self.lb_contents.selection_set(self.drag_index)
-    
-    def on_drag_motion(self, event):
-        if self.drag_item is None:
-            return
-        current_index = self.lb_contents.nearest(event.y)
-        if current_index != self.drag_index and current_index >= 0:
-            self.lb_contents.selection_clear(0, tk.END)
-            self.lb_contents.selection_set(current_index)
-    
-    def on_drag_end(self, event):
-        if self.drag_item is None or self.drag_index < 0:
-            self.drag_item = None
-            self.drag_index = -1
-            return
-        
-        drop_index = self.lb_contents.nearest(event.y)
-        if drop_index < 0 or drop_index == self.drag_index:
-            self.drag_item = None
-            self.drag_index = -1
-            return
-        
-        item_data = self.dialogues.pop(self.drag_index)
-        self.dialogues.insert(drop_index, item_data)
-        
-        self.lb_contents.delete(0, tk.END)
-        for content_type, char_var, content in self.dialogues:
-            if content_type == "character":
-                char_display = char_var
-                for char in self.characters:
-                    if char["var_name"] == char_var:
-                        char_display = char["display_name"]
-                        break
-                display_text = f"[角色] {char_display}: {content}"
-            else:
-                display_text = f"[旁白] {content}"
-            self.lb_contents.insert(tk.END, display_text)
-        
-        self.lb_contents.selection_clear(0, tk.END)
-        self.lb_contents.selection_set(drop_index)
-        self.drag_item = None
-        self.drag_index = -1
-    
-    def move_item_up(self):
-        selected_index = self.lb_contents.curselection()
-        if not selected_index:
-            messagebox.showwarning("警告", "请先选中要上移的内容！")
-            return
-        
-        selected_index = selected_index[0]
-        if selected_index == 0:
-            messagebox.showinfo("提示", "已到最顶部，无法上移！")
-            return
-        
-        self.dialogues[selected_index], self.dialogues[selected_index-1] = \
-            self.dialogues[selected_index-1], self.dialogues[selected_index]
-        
-        self.lb_contents.delete(0, tk.END)
-        for content_type, char_var, content in self.dialogues:
-            if content_type == "character":
-                char_display = char_var
-                for char in self.characters:
-                    if char["var_name"] == char_var:
-                        char_display = char["display_name"]
-                        break
-                display_text = f"[角色] {char_display}: {content}"
-            else:
-                display_text = f"[旁白] {content}"
-            self.lb_contents.insert(tk.END, display_text)
-        
-        self.lb_contents.selection_clear(0, tk.END)
-        self.lb_contents.selection_set(selected_index-1)
-    
-    def move_item_down(self):
-        selected_index = self.lb_contents.curselection()
-        if not selected_index:
-            messagebox.showwarning("警告", "请先选中要下移的内容！")
-            return
-        
-        selected_index = selected_index[0]
-        if selected_index == len(self.dialogues)-1:
-            messagebox.showinfo("提示", "已到最底部，无法下移！")
-            return
-        
-        self.dialogues[selected_index], self.dialogues[selected_index+1] = \
-            self.dialogues[selected_index+1], self.dialogues[selected_index]
-        
-        self.lb_contents.delete(0, tk.END)
-        for content_type, char_var, content in self.dialogues:
-            if content_type == "character":
-                char_display = char_var
-                for char in self.characters:
-                    if char["var_name"] == char_var:
-                        char_display = char["display_name"]
-                        break
-                display_text = f"[角色] {char_display}: {content}"
-            else:
-                display_text = f"[旁白] {content}"
-            self.lb_contents.insert(tk.END, display_text)
-        
-        self.lb_contents.selection_clear(0, tk.END)
-        self.lb_contents.selection_set(selected_index+1)
-    
-    def delete_content(self):
-        selected_index = self.lb_contents.curselection()
-        if not selected_index:
-            messagebox.showwarning("警告", "请先选中要删除的内容！")
-            return
-        
-        if messagebox.askyesno("确认", "是否删除选中的内容？"):
-            del self.dialogues[selected_index[0]]
-            self.lb_contents.delete(selected_index)
-            messagebox.showinfo("成功", "选中的内容已删除！")
-    
-    def new_script(self):
-        if messagebox.askyesno("确认", "是否新建脚本？当前未保存的内容将丢失！"):
-            self.reset_editor()
-            messagebox.showinfo("提示", "已新建空白脚本！")
-    
-    def generate_script(self):
-        if not self.dialogues:
-            messagebox.showwarning("警告", "请先添加至少一条角色对话或旁白！")
-            return
-        
-        label_name = self.current_label.get().strip().replace(" ", "_")
-        if not label_name:
-            label_name = "start"
-        
-        script_lines = []
-        has_character_dialog = any([d[0] == "character" for d in self.dialogues])
-        
-        if has_character_dialog and self.characters:
-            script_lines.append("# 角色定义（变量名=预定义值，禁止中文）")
-            for char in self.characters:
-                script_lines.append(f'define {char["var_name"]} = Character("{char["display_name"]}")')
-            script_lines.append("")
-        
-        script_lines.append(f"label {label_name}:")
-        for content_type, char_var, content in self.dialogues:
-            escaped_content = content.replace('"', '\\"')
-            if content_type == "character":
-                script_lines.append(f"    {char_var} \"{escaped_content}\"")
-            elif content_type == "narration":
-                script_lines.append(f"    \"{escaped_content}\"")
-        
-        self.generated_script = "\n".join(script_lines)
-        
-        script_window = tk.Toplevel(self)
-        script_window.title("生成的Ren'Py脚本")
-        script_window.geometry("750x550")
-        script_window.minsize(700, 500)
-        script_window.configure(bg="#f0f0f0")
-        
-        txt_script = tk.Text(script_window, font=self.base_font, bd=1, relief="solid")
-        txt_script.pack(fill="both", padx=15, pady=15, expand=True)
-        txt_script.insert("1.0", self.generated_script)
-        txt_script.config(state="readonly")
-        
-        ttk.Button(
-            script_window, 
-            text="关闭", 
-            command=script_window.destroy,
-            style="Custom.TButton"
-        ).pack(pady=10)
-    
-    def save_script(self):
-        if not hasattr(self, 'generated_script') or not self.generated_script:
-            messagebox.showwarning("警告", "请先点击「生成Ren'Py脚本」按钮！")
-            return
-        
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".rpy",
-            filetypes=[("Ren'Py脚本文件", "*.rpy"), ("所有文件", "*.*")],
-            title="保存Ren'Py脚本"
-        )
-        if not file_path:
-            return
-        
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(self.generated_script)
-            messagebox.showinfo("成功", f"脚本已保存到：\n{file_path}")
-        except Exception as e:
-            messagebox.showerror("错误", f"保存失败：{str(e)}")
-    
-    def save_temp_file(self):
-        temp_data = {
-            "characters": self.characters,
-            "current_label": self.current_label.get(),
-            "dialogues": self.dialogues
-        }
-        
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".json",
-            filetypes=[("临时配置文件", "*.json"), ("所有文件", "*.*")],
-            title="保存临时文件"
-        )
-        if not file_path:
-            return
-        
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(temp_data, f, ensure_ascii=False, indent=4)
-            messagebox.showinfo("成功", f"临时文件已保存到：\n{file_path}")
-        except Exception as e:
-            messagebox.showerror("错误", f"临时文件保存失败：{str(e)}")
-    
-    def open_temp_file(self):
-        file_path = filedialog.askopenfilename(
-            filetypes=[("临时配置文件", "*.json"), ("所有文件", "*.*")],
-            title="打开临时文件"
-        )
-        if not file_path:
-            return
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                temp_data = json.load(f)
-            
-            required_keys = ["characters", "current_label", "dialogues"]
-            if not all(key in temp_data for key in required_keys):
-                messagebox.showerror("错误", "临时文件格式错误，缺少必要数据！")
-                return
-            
-            self.load_temp_data(temp_data)
-            messagebox.showinfo("成功", f"已从临时文件恢复数据：\n{file_path}")
-        except json.JSONDecodeError:
-            messagebox.showerror("错误", "临时文件损坏，无法解析！")
-        except Exception as e:
-            messagebox.showerror("错误", f"打开临时文件失败：{str(e)}")
-    
-    def on_window_close(self):
-        close_confirm = messagebox.askyesno("确认关闭", "是否确定关闭Ren'Py脚本生成工具？")
-        if not close_confirm:
-            return
-        
-        backup_confirm = messagebox.askyesno("备份文档", "是否需要备份当前编辑的内容为临时脚本文件？")
-        if backup_confirm:
-            self.save_temp_file_on_close()
-        
-        self.destroy()
-    
-    def save_temp_file_on_close(self):
-        temp_data = {
-            "characters": self.characters,
-            "current_label": self.current_label.get(),
-            "dialogues": self.dialogues
-        }
-        
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".json",
-            filetypes=[("临时配置文件", "*.json"), ("所有文件", "*.*")],
-            title="备份临时脚本文件"
-        )
-        if not file_path:
-            return
-        
-        try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(temp_data, f, ensure_ascii=False, indent=4)
-            messagebox.showinfo("备份成功", f"当前内容已备份到：\n{file_path}")
-        except Exception as e:
-            messagebox.showerror("备份失败", f"临时文件备份失败：{str(e)}")
-
-if __name__ == "__main__":
-    try:
-        from ctypes import windll
-        windll.shcore.SetProcessDpiAwareness(1)
-    except:
-        pass
-    
-    app = RenPyScriptGenerator()
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog, font, simpledialog
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from functools import lru_cache
+from itertools import chain, groupby, islice, repeat
+
+# 变量名校验正则：仅允许字母、数字、下划线，不能以数字开头，无中文
+VAR_NAME_PATTERN = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+
+# Ren'Py保留字：用作角色变量名会覆盖内置对象或与脚本语句冲突
+RENPY_RESERVED_NAMES = frozenset([
+    # Python关键字
+    "False", "None", "True", "and", "as", "assert", "async", "await", "break", "class",
+    "continue", "def", "del", "elif", "else", "except", "finally", "for", "from", "global",
+    "if", "import", "in", "is", "lambda", "nonlocal", "not", "or", "pass", "raise",
+    "return", "try", "while", "with", "yield",
+    # Ren'Py脚本语句
+    "at", "behind", "call", "camera", "default", "define", "expression", "hide", "image",
+    "init", "jump", "label", "layeredimage", "menu", "nvl", "onlayer", "pause", "play",
+    "python", "queue", "scene", "screen", "show", "stop", "style", "testcase", "transform",
+    "translate", "voice", "window", "zorder",
+    # Ren'Py内置对象
+    "renpy", "store", "config", "persistent", "preferences", "gui", "build", "ui", "im",
+    "layout", "theme", "achievement", "updater", "director", "iap", "narrator", "centered",
+    "vcentered", "extend", "adv", "name_only", "Character", "DynamicCharacter", "Text",
+    "Image", "Movie", "Transform", "_",
+])
+# 场景名（label）校验：标识符，可带一级以“.”开头的局部名
+LABEL_NAME_PATTERN = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*(\.[a-zA-Z_][a-zA-Z0-9_]*)?$')
+# 文本中未闭合的插值 [ ] 与文本标签 { }（[[ 与 {{ 为转义，检查前先去掉）
+_UNCLOSED_INTERPOLATION_PATTERN = re.compile(r'\[(?![^\[\]]*\])')
+_UNCLOSED_TEXT_TAG_PATTERN = re.compile(r'\{(?![^{}]*\})')
+# 检查报告中最多列出的问题条数（统计数量不受限制）
+MAX_LINT_ISSUES = 1000
+# 修改后延迟多久启动后台检查、以及轮询检查结果的间隔（毫秒）
+LINT_DELAY_MS = 300
+LINT_POLL_MS = 100
+
+# 角色导入模式
+IMPORT_MODE_MERGE = "merge"
+IMPORT_MODE_REPLACE = "replace"
+IMPORT_MODE_ADD_NEW = "add_new"
+IMPORT_MODES = [
+    (IMPORT_MODE_MERGE, "合并：追加新角色，同名角色以导入的显示名称为准"),
+    (IMPORT_MODE_ADD_NEW, "仅新增：只追加新角色，已有角色保持不变"),
+    (IMPORT_MODE_REPLACE, "替换：清空现有角色后导入"),
+]
+# 流式解析配置文件时每次读取的字符数
+CONFIG_READ_CHUNK = 1 << 16
+# JSON中可跳过的空白字符
+JSON_WHITESPACE = re.compile(r"[ \t\r\n]*")
+# 导入报告中最多列出的冲突条数
+MAX_REPORTED_CONFLICTS = 20
+
+# 压缩文件的魔数：读取时据此识别格式，与扩展名无关
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+# 文件对话框中的压缩文件类型（保存时按扩展名 .gz / .xz 选择压缩格式）
+COMPRESSED_FILE_TYPES = [("gzip压缩文件", "*.json.gz"), ("xz压缩文件", "*.json.xz")]
+# 紧凑JSON的分隔符（不缩进、不留空格）
+COMPACT_SEPARATORS = (",", ":")
+
+# 内容列表每行默认最多显示的文本字符数（超出部分以省略号代替，完整内容见悬停提示）
+DISPLAY_TEXT_WIDTH = 60
+# 悬停提示的延迟（毫秒）及最多显示的字符数
+TOOLTIP_DELAY_MS = 500
+TOOLTIP_MAX_CHARS = 2000
+
+# 渲染脚本时每段的内容条数（命令行模式逐段写出，内存占用与总条数无关）
+RENDER_CHUNK_SIZE = 50000
+# 界面中后台渲染脚本时检查结果的间隔（毫秒）
+RENDER_POLL_MS = 100
+
+# 项目统计：Ren'Py文本标签不计入字数；预计朗读速度（每分钟中日韩文字数 / 其他语言单词数）
+_TEXT_TAG_PATTERN = re.compile(r'\{[^{}]*\}')
+_WORD_PATTERN = re.compile(r"\w+(?:['’]\w+)*")
+READ_CJK_CHARS_PER_MINUTE = 300
+READ_WORDS_PER_MINUTE = 180
+STATS_REFRESH_MS = 200
+
+# 中日韩文字：建立全文索引时逐字切分
+_CJK_CHAR_PATTERN = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff])')
+# 工作区全文索引的数据库文件名（位于工作区根目录）及参与索引的项目文件后缀
+WORKSPACE_INDEX_FILE = ".renpy_workspace_index.sqlite3"
+PROJECT_FILE_SUFFIXES = (".json", ".json.gz", ".json.xz")
+# 工作区查找最多返回的结果条数
+MAX_SEARCH_RESULTS = 500
+
+# SQLite项目文件：内容按位置键排序，新位置取相邻两条的中点，相邻位置键无法再取中点时整体重新编号
+PROJECT_DB_SUFFIX = ".rpyproj"
+PROJECT_DB_FILE_TYPES = [("项目数据库", "*.rpyproj")]
+POSITION_STEP = 1024.0
+# 脚本预览：条数不超过此值时一次填充完，否则每次事件循环填充一批，填充期间界面保持可操作
+CONTENT_FILL_BATCH = 5000
+CONTENT_SYNC_FILL_LIMIT = 20000
+
+# 分片项目：清单文件（角色、场景顺序、分片校验值）+ 同名目录下的分片文件
+SHARDED_PROJECT_SUFFIX = ".rpyshards"
+SHARDED_PROJECT_FILE_TYPES = [("分片项目", "*.rpyshards")]
+# 每个分片的目标条数，保存时超过两倍的分片拆分
+SHARD_SIZE = 2000
+# 分片目录中记录本机上次编辑场景的文件，由同目录的 .gitignore 排除在版本控制之外
+SHARD_LOCAL_STATE_FILE = ".local_state.json"
+SHARD_GITIGNORE = f"# 本机状态与未完成的临时文件，不纳入版本控制\n{SHARD_LOCAL_STATE_FILE}\n*.tmp\n"
+
+# 台本表格（CSV/TSV）：各列可用的表头名称（不区分大小写），说话人为空或为这些名称时视为旁白
+SHEET_FILE_TYPES = [("表格文件", "*.csv *.tsv"), ("CSV文件", "*.csv"), ("TSV文件", "*.tsv")]
+SHEET_HEADER_NAMES = {
+    "speaker": ("speaker", "character", "角色", "说话人"),
+    "text": ("text", "line", "dialogue", "台词", "文本", "内容"),
+    "label": ("label", "scene", "场景")
+}
+NARRATOR_NAMES = frozenset(["", "narration", "narrator", "旁白"])
+
+# 快速录入模式：状态栏提示的显示时长（毫秒）；最多可撤销的删除次数
+STATUS_MESSAGE_MS = 4000
+UNDO_LIMIT = 50
+
+# 拖动排序：鼠标移动事件合并为每帧最多处理一次（毫秒）
+DRAG_FRAME_MS = 16
+# 拖动到列表上下边缘此距离（像素）以内时自动滚动
+DRAG_AUTOSCROLL_MARGIN = 24
+
+# 翻译文件中翻译块的起始行：translate <语言> <ID>:
+TRANSLATE_BLOCK_PATTERN = re.compile(r'^translate\s+(\w+)\s+(\w+)\s*:\s*$')
+# 生成的翻译文件首行标记，重新生成时据此识别并替换
+TRANSLATION_FILE_HEADER = "# 由Ren'Py脚本生成工具生成的翻译文件，已有译文会在重新生成时保留"
+TRANSLATION_STALE_HEADER = "# 以下翻译块对应的原文已变更或删除，保留原有译文供参考"
+# 翻译摘要缓存的最大条数
+TRANSLATION_DIGEST_CACHE_SIZE = 1 << 16
+
+# Ren'Py 词法规则：字符串中连续的空格/换行折叠为一个空格，再还原反斜杠转义
+_RENPY_WHITESPACE_PATTERN = re.compile(r'[ \n]+')
+_RENPY_ESCAPE_PATTERN = re.compile(r'\\(u([0-9a-fA-F]{1,4})|.)', re.DOTALL)
+_RENPY_DOUBLE_SPACE_PATTERN = re.compile(r'(?<= ) ')
+
+def escape_dialogue_text(content):
+    """转义对话内容中的双引号"""
+    return content.replace('"', '\\"')
+
+def build_say_statement(content_type, char_var, content):
+    """生成单条对话/旁白语句（不含缩进），未知类型返回None"""
+    escaped_content = escape_dialogue_text(content)
+    if content_type == "character":
+        return f"{char_var} \"{escaped_content}\""
+    if content_type == "narration":
+        return f"\"{escaped_content}\""
+    return None
+
+def _renpy_unquote(escaped_content):
+    """按Ren'Py的词法规则还原脚本中字符串的实际文本"""
+    def dequote(match):
+        if match.group(2):
+            return chr(int(match.group(2), 16))
+        if match.group(1) == "n":
+            return "\n"
+        return match.group(1)
+    
+    collapsed = _RENPY_WHITESPACE_PATTERN.sub(" ", escaped_content)
+    return _RENPY_ESCAPE_PATTERN.sub(dequote, collapsed)
+
+def translation_code(content_type, char_var, content):
+    """生成与Ren'Py一致的语句代码（用于计算翻译ID及翻译块中的原文注释）"""
+    what = _renpy_unquote(escape_dialogue_text(content))
+    what = what.replace("\\", "\\\\").replace("\n", "\\n").replace("\"", "\\\"")
+    what = "\"" + _RENPY_DOUBLE_SPACE_PATTERN.sub("\\ ", what) + "\""
+    if content_type == "character":
+        return f"{char_var} {what}"
+    return what
+
+def translation_digest(content_type, char_var, content):
+    """计算单条语句的翻译摘要（与Ren'Py相同：语句代码的md5前8位）"""
+    code = translation_code(content_type, char_var, content)
+    return hashlib.md5((code + "\r\n").encode("utf-8")).hexdigest()[:8]
+
+@lru_cache(maxsize=TRANSLATION_DIGEST_CACHE_SIZE)
+def cached_translation_digest(content_type, char_var, content):
+    """带缓存的 translation_digest：重复生成时未修改的语句不再重新计算，缓存条数有上限"""
+    return translation_digest(content_type, char_var, content)
+
+def assign_translation_ids(label_name, dialogues):
+    """为每条语句分配稳定的翻译ID（场景名_摘要，重复语句依次追加_1、_2后缀）
+    
+    摘要通过 cached_translation_digest 计算；未知类型的条目ID为None。
+    """
+    prefix = label_name.replace(".", "_") + "_"
+    suffix_counter = {}
+    ids = []
+    for content_type, char_var, content in dialogues:
+        if content_type not in ("character", "narration"):
+            ids.append(None)
+            continue
+        base = prefix + cached_translation_digest(content_type, char_var, content)
+        count = suffix_counter.get(base, 0)
+        suffix_counter[base] = count + 1
+        ids.append(base if count == 0 else f"{base}_{count}")
+    return ids
+
+def parse_translation_file(text):
+    """解析已有翻译文件，返回 {翻译ID: 翻译块行列表}（保持文件中的顺序）
+    
+    翻译块之前紧邻的顶格注释（如 Ren'Py 写入的源文件位置）归入该翻译块。
+    """
+    blocks = {}
+    pending_comments = []
+    current = None
+    for line in text.splitlines():
+        match = TRANSLATE_BLOCK_PATTERN.match(line)
+        if match:
+            current = pending_comments + [line]
+            pending_comments = []
+            blocks[match.group(2)] = current
+        elif line.startswith("#"):
+            if line not in (TRANSLATION_FILE_HEADER, TRANSLATION_STALE_HEADER):
+                pending_comments.append(line)
+        elif current is not None and (not line.strip() or line[0].isspace()):
+            current.append(line)
+        elif line.strip():
+            pending_comments = []
+    
+    for block in blocks.values():
+        while block and not block[-1].strip():
+            block.pop()
+    return blocks
+
+def render_translation_file(language, dialogues, ids, existing_blocks):
+    """生成某一语言的翻译文件内容
+    
+    已有译文的翻译块原样保留，仅为新增或原文变更的语句生成翻译块；
+    原文已变更或删除的旧翻译块保留在文件末尾，避免丢失已翻译的内容。
+    返回 (文件内容, 新增数, 保留数, 过期数)。
+    """
+    remaining = dict(existing_blocks)
+    lines = [TRANSLATION_FILE_HEADER, ""]
+    added = kept = 0
+    for (content_type, char_var, content), identifier in zip(dialogues, ids):
+        if identifier is None:
+            continue
+        block = remaining.pop(identifier, None)
+        if block is None:
+            code = translation_code(content_type, char_var, content)
+            block = [f"translate {language} {identifier}:", "", f"    # {code}", f"    {code}"]
+            added += 1
+        else:
+            kept += 1
+        lines.extend(block)
+        lines.append("")
+    
+    if remaining:
+        lines.append(TRANSLATION_STALE_HEADER)
+        lines.append("")
+        for block in remaining.values():
+            lines.extend(block)
+            lines.append("")
+    return "\n".join(lines), added, kept, len(remaining)
+
+def write_translation_files(tl_dir, languages, label_name, dialogues):
+    """一次性为多个语言生成/更新翻译文件（tl_dir/<语言>/<场景名>.rpy）
+    
+    翻译ID只计算一次并在所有语言间共享；内容未变化的文件不会被重写。
+    返回 {语言: (新增数, 保留数, 过期数, 是否写入)}。
+    """
+    ids = assign_translation_ids(label_name, dialogues)
+    results = {}
+    for language in languages:
+        file_path = os.path.join(tl_dir, language, f"{label_name}.rpy")
+        old_text = ""
+        if os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8") as f:
+                old_text = f.read()
+        
+        existing_blocks = parse_translation_file(old_text)
+        new_text, added, kept, stale = render_translation_file(language, dialogues, ids, existing_blocks)
+        written = new_text != old_text
+        if written:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(new_text)
+        results[language] = (added, kept, stale, written)
+    return results
+
+def index_runs(indices):
+    """把升序下标分成连续的段，返回 [(起始下标, 条数)]"""
+    runs = []
+    for index in indices:
+        if runs and runs[-1][0] + runs[-1][1] == index:
+            runs[-1][1] += 1
+        else:
+            runs.append([index, 1])
+    return [(start, count) for start, count in runs]
+
+class DialogueStore:
+    """紧凑的对话内容存储
+    
+    每条内容只占用：1字节类型编码 + 4字节角色ID（变量名驻留在角色表中，只保存一份）
+    + 8字节文本偏移 + 4字节文本长度 + 4字节条目编号，文本统一以UTF-8存放在单一缓冲区中。
+    对外以 (内容类型, 角色变量名, 文本) 元组的形式读写，编辑、生成脚本和保存都通过此接口访问。
+    条目编号（uid）在条目存续期间保持不变，可作为按条目缓存计算结果的键。
+    """
+    # 被删除的文本在缓冲区中留下的空洞超过此大小且超过缓冲区一半时整理缓冲区
+    COMPACT_THRESHOLD = 1 << 20
+    
+    def __init__(self, entries=()):
+        self._type_names = ["character", "narration"]
+        self._type_codes = {"character": 0, "narration": 1}
+        self._char_names = []
+        self._char_ids = {}
+        
+        self._types = array("B")
+        self._chars = array("i")
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._uids = array("I")
+        self._next_uid = 0
+        self._buffer = bytearray()
+        self._garbage = 0
+        
+        # 每次修改递增，后台任务据此判断快照是否过期
+        self.version = 0
+        self._listeners = []
+        
+        self.extend(entries)
+    
+    def __len__(self):
+        return len(self._types)
+    
+    def __bool__(self):
+        return len(self._types) > 0
+    
+    def __getitem__(self, index):
+        return (self.content_type(index), self.char_var(index), self.text(index))
+    
+    def __iter__(self):
+        type_names = self._type_names
+        char_names = self._char_names
+        buffer = self._buffer
+        for type_code, char_id, offset, length in zip(self._types, self._chars, self._offsets, self._lengths):
+            yield (
+                type_names[type_code],
+                char_names[char_id] if char_id >= 0 else "",
+                buffer[offset:offset + length].decode("utf-8")
+            )
+    
+    def __delitem__(self, index):
+        self.pop(index)
+    
+    def iter_headers(self):
+        """遍历 (条目编号, 内容类型, 角色变量名)，不解码文本"""
+        type_names = self._type_names
+        char_names = self._char_names
+        for uid, type_code, char_id in zip(self._uids, self._types, self._chars):
+            yield uid, type_names[type_code], (char_names[char_id] if char_id >= 0 else "")
+    
+    def content_type(self, index):
+        return self._type_names[self._types[index]]
+    
+    def char_var(self, index):
+        char_id = self._chars[index]
+        return self._char_names[char_id] if char_id >= 0 else ""
+    
+    def text(self, index):
+        offset = self._offsets[index]
+        return self._buffer[offset:offset + self._lengths[index]].decode("utf-8")
+    
+    def uid(self, index):
+        return self._uids[index]
+    
+    def count_type(self, content_type):
+        type_code = self._type_codes.get(content_type)
+        return 0 if type_code is None else self._types.count(type_code)
+    
+    def add_listener(self, callback):
+        """注册修改通知：callback(事件, *参数)
+        
+        事件包括 ("insert", 下标, 条数)、("delete", 下标, 被删除的条目)、
+        ("delete_many", 升序下标列表, 被删除的条目列表)、
+        ("move", 原下标, 新下标)、("swap", 下标A, 下标B)、("clear",)。
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def close(self):
+        """释放存储占用的外部资源（内存存储没有需要释放的）"""
+    
+    def _notify(self, event, *args):
+        self.version += 1
+        for callback in self._listeners:
+            callback(event, *args)
+    
+    @staticmethod
+    def _drop_rows(column, indices):
+        """返回去掉 indices（升序）各行后的新数组，逐段复制"""
+        result = array(column.typecode)
+        start = 0
+        for index in indices:
+            result += column[start:index]
+            start = index + 1
+        result += column[start:]
+        return result
+    
+    @staticmethod
+    def _merge_rows(column, indices, values):
+        """返回把 values 依次放到 indices（插入后的下标，升序）处的新数组"""
+        result = array(column.typecode)
+        start = 0
+        for index, value in zip(indices, values):
+            end = start + index - len(result)
+            result += column[start:end]
+            start = end
+            result.append(value)
+        result += column[start:]
+        return result
+    
+    def _intern(self, content_type, char_var):
+        """返回 (类型编码, 角色ID)，新出现的类型与角色变量名加入驻留表"""
+        type_code = self._type_codes.get(content_type)
+        if type_code is None:
+            type_code = len(self._type_names)
+            self._type_names.append(content_type)
+            self._type_codes[content_type] = type_code
+        
+        char_id = -1
+        if char_var:
+            char_id = self._char_ids.get(char_var)
+            if char_id is None:
+                char_id = len(self._char_names)
+                self._char_names.append(char_var)
+                self._char_ids[char_var] = char_id
+        return type_code, char_id
+    
+    def _encode(self, content_type, char_var, content):
+        type_code, char_id = self._intern(content_type, char_var)
+        data = content.encode("utf-8")
+        offset = len(self._buffer)
+        self._buffer += data
+        uid = self._next_uid
+        self._next_uid += 1
+        return type_code, char_id, offset, len(data), uid
+    
+    def _append_row(self, content_type, char_var, content):
+        type_code, char_id, offset, length, uid = self._encode(content_type, char_var, content)
+        self._types.append(type_code)
+        self._chars.append(char_id)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+        self._uids.append(uid)
+    
+    def append(self, content_type, char_var, content):
+        self._append_row(content_type, char_var, content)
+        self._notify("insert", len(self._types) - 1, 1)
+    
+    def extend(self, entries):
+        start = len(self._types)
+        try:
+            for content_type, char_var, content in entries:
+                self._append_row(content_type, char_var, content)
+        finally:
+            # 数据源中途出错时，已追加的条目照常通知
+            if len(self._types) > start:
+                self._notify("insert", start, len(self._types) - start)
+    
+    def insert(self, index, content_type, char_var, content):
+        if index < 0:
+            index = max(index + len(self._types), 0)
+        index = min(index, len(self._types))
+        type_code, char_id, offset, length, uid = self._encode(content_type, char_var, content)
+        self._types.insert(index, type_code)
+        self._chars.insert(index, char_id)
+        self._offsets.insert(index, offset)
+        self._lengths.insert(index, length)
+        self._uids.insert(index, uid)
+        self._notify("insert", index, 1)
+    
+    def pop(self, index=-1):
+        if index < 0:
+            index += len(self._types)
+        entry = self[index]
+        self._types.pop(index)
+        self._chars.pop(index)
+        self._offsets.pop(index)
+        self._uids.pop(index)
+        self._garbage += self._lengths.pop(index)
+        if self._garbage > self.COMPACT_THRESHOLD and self._garbage * 2 > len(self._buffer):
+            self._compact()
+        self._notify("delete", index, entry)
+        return entry
+    
+    def delete_many(self, indices):
+        """一次删除多条内容（各列整体重建一次，只通知一次），返回按下标升序的被删除条目"""
+        indices = sorted(set(indices))
+        if not indices:
+            return []
+        entries = [self[index] for index in indices]
+        self._garbage += sum(self._lengths[index] for index in indices)
+        for name in ("_types", "_chars", "_offsets", "_lengths", "_uids"):
+            setattr(self, name, self._drop_rows(getattr(self, name), indices))
+        if self._garbage > self.COMPACT_THRESHOLD and self._garbage * 2 > len(self._buffer):
+            self._compact()
+        self._notify("delete_many", indices, entries)
+        return entries
+    
+    def insert_many(self, items):
+        """按 [(插入后的下标, 条目)]（下标升序）一次插入多条，每段连续下标通知一次"""
+        indices = [index for index, entry in items]
+        rows = [self._encode(*entry) for index, entry in items]
+        for column, name in enumerate(("_types", "_chars", "_offsets", "_lengths", "_uids")):
+            values = [row[column] for row in rows]
+            setattr(self, name, self._merge_rows(getattr(self, name), indices, values))
+        for start, count in index_runs(indices):
+            self._notify("insert", start, count)
+    
+    def move(self, from_index, to_index):
+        """将一条内容移动到新位置（文本不复制，只调整各列顺序）"""
+        for column in (self._types, self._chars, self._offsets, self._lengths, self._uids):
+            column.insert(to_index, column.pop(from_index))
+        self._notify("move", from_index, to_index)
+    
+    def swap(self, index_a, index_b):
+        for column in (self._types, self._chars, self._offsets, self._lengths, self._uids):
+            column[index_a], column[index_b] = column[index_b], column[index_a]
+        self._notify("swap", index_a, index_b)
+    
+    def clear(self):
+        self._types = array("B")
+        self._chars = array("i")
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._uids = array("I")
+        self._buffer = bytearray()
+        self._garbage = 0
+        self._notify("clear")
+    
+    def _compact(self):
+        """丢弃已删除内容残留的文本，按当前顺序重新排列缓冲区"""
+        buffer = bytearray()
+        offsets = array("Q")
+        old_buffer = self._buffer
+        for offset, length in zip(self._offsets, self._lengths):
+            offsets.append(len(buffer))
+            buffer += old_buffer[offset:offset + length]
+        self._buffer = buffer
+        self._offsets = offsets
+        self._garbage = 0
+    
+    def snapshot(self):
+        """复制一份独立的快照（供后台线程读取，不带修改通知）"""
+        copy = DialogueStore.__new__(DialogueStore)
+        copy._type_names = list(self._type_names)
+        copy._type_codes = dict(self._type_codes)
+        copy._char_names = list(self._char_names)
+        copy._char_ids = dict(self._char_ids)
+        copy._types = array("B", self._types)
+        copy._chars = array("i", self._chars)
+        copy._offsets = array("Q", self._offsets)
+        copy._lengths = array("I", self._lengths)
+        copy._uids = array("I", self._uids)
+        copy._next_uid = self._next_uid
+        copy._buffer = bytearray(self._buffer)
+        copy._garbage = self._garbage
+        copy.version = self.version
+        copy._listeners = []
+        return copy
+    
+    def to_list(self):
+        """转换为可JSON序列化的列表（与旧版临时文件格式一致）"""
+        return [list(entry) for entry in self]
+    
+    def memory_usage(self):
+        """估算当前占用的内存字节数（各列数组 + 文本缓冲区 + 驻留的角色表）"""
+        columns = (self._types, self._chars, self._offsets, self._lengths, self._uids)
+        total = sum(sys.getsizeof(column) for column in columns)
+        total += sys.getsizeof(self._buffer)
+        total += sys.getsizeof(self._char_names) + sum(sys.getsizeof(name) for name in self._char_names)
+        return total
+    
+    def bytes_per_line(self):
+        return self.memory_usage() / len(self) if self else 0.0
+
+class SQLiteDialogueStore(DialogueStore):
+    """以SQLite项目文件中一个场景的内容为后端的对话存储，读写接口与 DialogueStore 相同
+    
+    内存中只保存每条内容的行号、位置键、类型编码与角色ID，文本按页从数据库读取并缓存；
+    每次插入、删除、移动都作为一个小事务立即提交。条目编号（uid）即数据库行号。
+    快照不复制文本，在读取它的线程中另开只读连接按行号取文本。
+    """
+    # 每次从数据库读取的连续条数；缓存的文本超过此条数时整体清空
+    PAGE_SIZE = 500
+    CACHE_SIZE = 50000
+    
+    def __init__(self, db_path, label_id, conn=None):
+        self.db_path = db_path
+        self.label_id = label_id
+        self._conn = conn
+        self._type_names = ["character", "narration"]
+        self._type_codes = {"character": 0, "narration": 1}
+        self._char_names = []
+        self._char_ids = {}
+        
+        self._uids = array("q")
+        self._positions = array("d")
+        self._types = array("B")
+        self._chars = array("i")
+        self._cache = {}
+        
+        self.version = 0
+        self._listeners = []
+        
+        if conn is not None:
+            self._load()
+    
+    def close(self):
+        """关闭数据库连接；与项目共用连接时，项目也随之关闭"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    @property
+    def conn(self):
+        # 快照在后台线程中首次读取时才连接（SQLite连接不跨线程共享）
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30)
+        return self._conn
+    
+    def _load(self):
+        """只读取排序所需的列，不读取文本"""
+        cursor = self.conn.execute(
+            "SELECT id, position, type, char_var FROM dialogues WHERE label_id = ? ORDER BY position", (self.label_id,)
+        )
+        while True:
+            rows = cursor.fetchmany(self.CACHE_SIZE)
+            if not rows:
+                break
+            types = [row[2] for row in rows]
+            chars = [row[3] for row in rows]
+            # 先驻留本批出现的类型与角色，再整列查表转换
+            for content_type in set(types):
+                self._intern(content_type, "")
+            for char_var in set(chars):
+                self._intern("character", char_var)
+            char_ids = {None: -1, "": -1}
+            char_ids.update(self._char_ids)
+            self._uids.extend(array("q", [row[0] for row in rows]))
+            self._positions.extend(array("d", [row[1] for row in rows]))
+            self._types.extend(array("B", map(self._type_codes.__getitem__, types)))
+            self._chars.extend(array("i", map(char_ids.__getitem__, chars)))
+    
+    def _fetch_texts(self, uids):
+        placeholders = ",".join("?" * len(uids))
+        return dict(self.conn.execute(f"SELECT id, text FROM dialogues WHERE id IN ({placeholders})", tuple(uids)))
+    
+    def __iter__(self):
+        type_names = self._type_names
+        char_names = self._char_names
+        for start in range(0, len(self._uids), self.PAGE_SIZE):
+            uids = self._uids[start:start + self.PAGE_SIZE]
+            texts = self._fetch_texts(uids)
+            for uid, type_code, char_id in zip(uids, self._types[start:start + self.PAGE_SIZE], self._chars[start:start + self.PAGE_SIZE]):
+                yield (
+                    type_names[type_code],
+                    char_names[char_id] if char_id >= 0 else "",
+                    texts.get(uid, "")
+                )
+    
+    def text(self, index):
+        uid = self._uids[index]
+        content = self._cache.get(uid)
+        if content is None:
+            # 读取所在的整页，顺序浏览列表时每页只查询一次
+            start = index - index % self.PAGE_SIZE
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.clear()
+            self._cache.update(self._fetch_texts(self._uids[start:start + self.PAGE_SIZE]))
+            # 快照读取时该条可能已被删除
+            content = self._cache.get(uid, "")
+        return content
+    
+    def _position_at(self, index):
+        """插入到第 index 条之前所用的位置键（须在事务中调用）"""
+        positions = self._positions
+        if not positions:
+            return 0.0
+        if index >= len(positions):
+            return positions[-1] + POSITION_STEP
+        if index == 0:
+            return positions[0] - POSITION_STEP
+        position = (positions[index - 1] + positions[index]) / 2
+        if positions[index - 1] < position < positions[index]:
+            return position
+        self._renumber()
+        return (self._positions[index - 1] + self._positions[index]) / 2
+    
+    def _renumber(self):
+        positions = array("d", (index * POSITION_STEP for index in range(len(self._uids))))
+        self.conn.executemany(
+            "UPDATE dialogues SET position = ? WHERE id = ?",
+            zip(positions, self._uids)
+        )
+        self._positions = positions
+    
+    def append(self, content_type, char_var, content):
+        self.insert(len(self._uids), content_type, char_var, content)
+    
+    def extend(self, entries):
+        """批量追加（在一个事务中提交，行号与位置键连续分配）"""
+        start = len(self._uids)
+        
+        def rows():
+            uid = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM dialogues").fetchone()[0]
+            position = self._positions[-1] if self._positions else -POSITION_STEP
+            for content_type, char_var, content in entries:
+                type_code, char_id = self._intern(content_type, char_var)
+                uid += 1
+                position += POSITION_STEP
+                self._uids.append(uid)
+                self._positions.append(position)
+                self._types.append(type_code)
+                self._chars.append(char_id)
+                yield uid, self.label_id, position, content_type, char_var, content
+        
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO dialogues (id, label_id, position, type, char_var, text) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows()
+                )
+        except BaseException:
+            for column in (self._uids, self._positions, self._types, self._chars):
+                del column[start:]
+            raise
+        if len(self._uids) > start:
+            self._notify("insert", start, len(self._uids) - start)
+    
+    def insert(self, index, content_type, char_var, content):
+        if index < 0:
+            index = max(index + len(self._uids), 0)
+        index = min(index, len(self._uids))
+        type_code, char_id = self._intern(content_type, char_var)
+        # 分配位置键时可能整体重排（替换 self._positions），事务回滚时一并恢复
+        positions = self._positions
+        try:
+            with self.conn:
+                position = self._position_at(index)
+                uid = self.conn.execute(
+                    "INSERT INTO dialogues (label_id, position, type, char_var, text) VALUES (?, ?, ?, ?, ?)",
+                    (self.label_id, position, content_type, char_var, content)
+                ).lastrowid
+        except BaseException:
+            self._positions = positions
+            raise
+        self._uids.insert(index, uid)
+        self._positions.insert(index, position)
+        self._types.insert(index, type_code)
+        self._chars.insert(index, char_id)
+        self._cache[uid] = content
+        self._notify("insert", index, 1)
+    
+    def pop(self, index=-1):
+        if index < 0:
+            index += len(self._uids)
+        entry = self[index]
+        uid = self._uids[index]
+        with self.conn:
+            self.conn.execute("DELETE FROM dialogues WHERE id = ?", (uid,))
+        for column in (self._uids, self._positions, self._types, self._chars):
+            column.pop(index)
+        self._cache.pop(uid, None)
+        self._notify("delete", index, entry)
+        return entry
+    
+    def delete_many(self, indices):
+        """一次删除多条内容：在一个事务中删除，只通知一次"""
+        indices = sorted(set(indices))
+        if not indices:
+            return []
+        entries = [self[index] for index in indices]
+        uids = [self._uids[index] for index in indices]
+        with self.conn:
+            self.conn.executemany("DELETE FROM dialogues WHERE id = ?", ((uid,) for uid in uids))
+        for name in ("_uids", "_positions", "_types", "_chars"):
+            setattr(self, name, self._drop_rows(getattr(self, name), indices))
+        for uid in uids:
+            self._cache.pop(uid, None)
+        self._notify("delete_many", indices, entries)
+        return entries
+    
+    def _positions_for(self, indices):
+        """为插入到 indices（插入后的下标，升序）处的各条分配位置键，放不下时返回 None"""
+        old = self._positions
+        positions = []
+        for start, count in index_runs(indices):
+            before = start - len(positions)
+            if not old:
+                run = [step * POSITION_STEP for step in range(count)]
+            elif before >= len(old):
+                run = [old[-1] + step * POSITION_STEP for step in range(1, count + 1)]
+            elif before == 0:
+                run = [old[0] - step * POSITION_STEP for step in range(count, 0, -1)]
+            else:
+                low, high = old[before - 1], old[before]
+                gap = (high - low) / (count + 1)
+                run = [low + gap * step for step in range(1, count + 1)]
+                if not all(a < b for a, b in zip([low] + run, run + [high])):
+                    return None
+            positions.extend(run)
+        return positions
+    
+    def insert_many(self, items):
+        """按 [(插入后的下标, 条目)]（下标升序）在一个事务中插入多条，每段连续下标通知一次"""
+        if not items:
+            return
+        indices = [index for index, entry in items]
+        codes = [self._intern(content_type, char_var) for index, (content_type, char_var, content) in items]
+        positions = self._positions_for(indices)
+        with self.conn:
+            uid = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM dialogues").fetchone()[0]
+            uids = list(range(uid + 1, uid + 1 + len(items)))
+            self.conn.executemany(
+                "INSERT INTO dialogues (id, label_id, position, type, char_var, text) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (row_uid, self.label_id, position, content_type, char_var, content)
+                    for row_uid, position, (index, (content_type, char_var, content)) in zip(uids, positions or repeat(0.0), items)
+                )
+            )
+            merged_uids = self._merge_rows(self._uids, indices, uids)
+            if positions is None:
+                # 相邻位置键之间放不下，整体重新编号
+                merged_positions = array("d", (index * POSITION_STEP for index in range(len(merged_uids))))
+                self.conn.executemany(
+                    "UPDATE dialogues SET position = ? WHERE id = ?",
+                    zip(merged_positions, merged_uids)
+                )
+            else:
+                merged_positions = self._merge_rows(self._positions, indices, positions)
+        self._uids = merged_uids
+        self._positions = merged_positions
+        self._types = self._merge_rows(self._types, indices, [type_code for type_code, char_id in codes])
+        self._chars = self._merge_rows(self._chars, indices, [char_id for type_code, char_id in codes])
+        for uid, (index, (content_type, char_var, content)) in zip(uids, items):
+            self._cache[uid] = content
+        for start, count in index_runs(indices):
+            self._notify("insert", start, count)
+    
+    def move(self, from_index, to_index):
+        """移动一条内容：只更新该条的位置键"""
+        uid = self._uids[from_index]
+        columns = (self._uids, self._types, self._chars)
+        values = [column.pop(from_index) for column in columns]
+        # 重排会替换 self._positions 而不修改原数组，失败时换回原数组即与回滚后的数据库一致
+        positions = self._positions
+        old_position = positions.pop(from_index)
+        try:
+            with self.conn:
+                position = self._position_at(to_index)
+                self.conn.execute("UPDATE dialogues SET position = ? WHERE id = ?", (position, uid))
+        except BaseException:
+            for column, value in zip(columns, values):
+                column.insert(from_index, value)
+            positions.insert(from_index, old_position)
+            self._positions = positions
+            raise
+        for column, value in zip(columns, values):
+            column.insert(to_index, value)
+        self._positions.insert(to_index, position)
+        self._notify("move", from_index, to_index)
+    
+    def swap(self, index_a, index_b):
+        for column in (self._uids, self._types, self._chars):
+            column[index_a], column[index_b] = column[index_b], column[index_a]
+        # 位置键留在原下标，两条内容交换位置键
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE dialogues SET position = ? WHERE id = ?",
+                ((self._positions[index_a], self._uids[index_a]), (self._positions[index_b], self._uids[index_b]))
+            )
+        self._notify("swap", index_a, index_b)
+    
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM dialogues WHERE label_id = ?", (self.label_id,))
+        self._uids = array("q")
+        self._positions = array("d")
+        self._types = array("B")
+        self._chars = array("i")
+        self._cache = {}
+        self._notify("clear")
+    
+    def snapshot(self):
+        """复制排序列作为快照（不复制文本，不带修改通知）"""
+        copy = SQLiteDialogueStore(self.db_path, self.label_id)
+        copy._type_names = list(self._type_names)
+        copy._type_codes = dict(self._type_codes)
+        copy._char_names = list(self._char_names)
+        copy._char_ids = dict(self._char_ids)
+        copy._uids = array("q", self._uids)
+        copy._positions = array("d", self._positions)
+        copy._types = array("B", self._types)
+        copy._chars = array("i", self._chars)
+        copy.version = self.version
+        return copy
+    
+    def memory_usage(self):
+        """估算当前占用的内存字节数（各列数组 + 文本缓存 + 驻留的角色表）"""
+        columns = (self._uids, self._positions, self._types, self._chars)
+        total = sum(sys.getsizeof(column) for column in columns)
+        total += sys.getsizeof(self._cache) + sum(sys.getsizeof(content) for content in self._cache.values())
+        total += sys.getsizeof(self._char_names) + sum(sys.getsizeof(name) for name in self._char_names)
+        return total
+
+class SQLiteProject:
+    """SQLite单文件项目（.rpyproj）
+    
+    角色、场景与内容分表存放，内容按场景与位置键排序。打开时不读取文本，很大的项目也能立即打开；
+    编辑通过 SQLiteDialogueStore 逐条提交，保存只写入修改的部分。可与临时脚本文件（JSON）相互转换。
+    """
+    # 文件结构版本，由更新版本的工具创建的文件拒绝打开
+    SCHEMA_VERSION = 1
+    # 文件头中的应用标识（"RpyG"），用于识别其他程序创建的SQLite文件
+    APPLICATION_ID = 0x52707947
+    
+    def __init__(self, file_path):
+        self.file_path = os.path.abspath(file_path)
+        self.conn = sqlite3.connect(self.file_path, timeout=30)
+        try:
+            # 修改表结构之前先确认是本工具的项目文件（或空文件），以免改动其他程序的数据库
+            application_id = self.conn.execute("PRAGMA application_id").fetchone()[0]
+            if application_id != self.APPLICATION_ID:
+                tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                # 应用标识为0且含有内容表的是早期版本创建的项目文件
+                if application_id != 0 or (tables and "dialogues" not in tables):
+                    raise ValueError(f"{file_path}：不是Ren'Py脚本生成工具的项目文件")
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > self.SCHEMA_VERSION:
+                raise ValueError(f"{file_path}：项目文件由更新版本的工具创建，请升级后再打开")
+            # 使用回滚日志：日志文件只在事务期间存在，项目始终是单个文件，可直接复制或提交到版本控制
+            self.conn.execute("PRAGMA journal_mode=DELETE")
+            self.conn.execute(f"PRAGMA application_id = {self.APPLICATION_ID}")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS characters (id INTEGER PRIMARY KEY, position INTEGER, var_name TEXT, display_name TEXT)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS labels (id INTEGER PRIMARY KEY, position INTEGER, name TEXT)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS dialogues (id INTEGER PRIMARY KEY, label_id INTEGER REFERENCES labels (id), "
+                "position REAL, type TEXT, char_var TEXT, text TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS dialogues_order ON dialogues (label_id, position)")
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            
+            row = self.conn.execute("SELECT id FROM labels ORDER BY position LIMIT 1").fetchone()
+            if row is None:
+                self.label_id = self.conn.execute("INSERT INTO labels (position, name) VALUES (0, 'start')").lastrowid
+            else:
+                self.label_id = row[0]
+            self.conn.commit()
+        except BaseException:
+            self.conn.close()
+            raise
+    
+    @classmethod
+    def create(cls, file_path, characters, current_label, dialogues):
+        """由角色、场景名与内容新建项目文件（覆盖已有文件），内容在一个事务中写入"""
+        for path in (file_path, file_path + "-journal", file_path + "-wal", file_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        project = cls(file_path)
+        try:
+            project.save_characters(characters)
+            project.set_label(current_label)
+            project.open_dialogues().extend(dialogues)
+        except BaseException:
+            project.close()
+            raise
+        return project
+    
+    def close(self):
+        self.conn.close()
+    
+    def load_characters(self):
+        return [
+            {"var_name": var_name, "display_name": display_name}
+            for var_name, display_name in self.conn.execute("SELECT var_name, display_name FROM characters ORDER BY position")
+        ]
+    
+    def save_characters(self, characters):
+        # 角色数量很少，整体重写
+        with self.conn:
+            self.conn.execute("DELETE FROM characters")
+            self.conn.executemany(
+                "INSERT INTO characters (position, var_name, display_name) VALUES (?, ?, ?)",
+                ((position, char["var_name"], char["display_name"]) for position, char in enumerate(characters))
+            )
+    
+    def get_label(self):
+        return self.conn.execute("SELECT name FROM labels WHERE id = ?", (self.label_id,)).fetchone()[0]
+    
+    def set_label(self, label_name):
+        with self.conn:
+            self.conn.execute("UPDATE labels SET name = ? WHERE id = ?", (label_name, self.label_id))
+    
+    def open_dialogues(self):
+        return SQLiteDialogueStore(self.file_path, self.label_id, self.conn)
+
+class ShardedProject:
+    """分片项目（.rpyshards清单 + 分片目录）
+    
+    清单记录角色、场景顺序以及每个场景的分片文件名、条数与SHA-256校验值；每个分片是一段内容的JSON列表，
+    每条内容占一行。打开时只读取所选场景的分片，保存时只重写有修改的分片，适合多人用版本控制协作。
+    分片文件名由场景名与随机编号组成，各人分别新增的分片不会重名；上次编辑的场景只记录在本机，不写入清单。
+    """
+    FORMAT_NAME = "renpy-script-shards"
+    # 版本2起清单不再记录当前场景与分片计数
+    FORMAT_VERSION = 2
+    
+    def __init__(self, file_path):
+        self.file_path = os.path.abspath(file_path)
+        self.shard_dir = os.path.splitext(self.file_path)[0] + "_shards"
+        with open(self.file_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        required_keys = ["characters", "labels"]
+        if not isinstance(manifest, dict) or manifest.get("format") != self.FORMAT_NAME or not all(key in manifest for key in required_keys):
+            raise ValueError(f"{file_path}：不是有效的分片项目清单")
+        if manifest.get("version", 0) > self.FORMAT_VERSION:
+            raise ValueError(f"{file_path}：项目文件由更新版本的工具创建，请升级后再打开")
+        self.characters = manifest["characters"]
+        self.labels = manifest["labels"]
+        if not self.labels:
+            self.labels.append({"name": "start", "shards": []})
+        names = [label["name"] for label in self.labels]
+        # 版本1的清单中记有当前场景，本机没有记录时沿用
+        current_label = self.load_local_state().get("current_label", manifest.get("current_label"))
+        self.label_index = names.index(current_label) if current_label in names else 0
+        # 当前场景中有修改的分片文件名；清单本身（角色、场景名）是否有修改
+        self.dirty = set()
+        self.manifest_changed = False
+        self._remember_label()
+    
+    @classmethod
+    def create(cls, file_path, characters, labels):
+        """由角色与 (场景名, 内容) 序列新建分片项目（覆盖已有清单），内容逐段写出
+        
+        同名场景合并为一个场景；原清单引用的分片文件在新清单写出后删除。
+        """
+        file_path = os.path.abspath(file_path)
+        old_files = set()
+        if os.path.exists(file_path):
+            try:
+                old_files = set(cls(file_path).iter_shard_files())
+            except ValueError:
+                pass
+        
+        project = cls.__new__(cls)
+        project.file_path = file_path
+        project.shard_dir = os.path.splitext(file_path)[0] + "_shards"
+        project.characters = characters
+        project.labels = []
+        project.label_index = 0
+        project.dirty = set()
+        project.manifest_changed = True
+        
+        label_map = {}
+        for label_name, dialogues in labels:
+            label = label_map.get(label_name)
+            if label is None:
+                label = label_map[label_name] = {"name": label_name, "shards": []}
+                project.labels.append(label)
+            entries = iter(dialogues)
+            while True:
+                chunk = list(islice(entries, SHARD_SIZE))
+                if not chunk:
+                    break
+                label["shards"].append(project._write_shard(project._new_shard_name(label_name), chunk))
+        if not project.labels:
+            project.labels.append({"name": "start", "shards": []})
+        project._remember_label()
+        project._write_manifest()
+        project._remove_files(old_files - set(project.iter_shard_files()))
+        return project
+    
+    @property
+    def label(self):
+        return self.labels[self.label_index]
+    
+    def label_names(self):
+        return [label["name"] for label in self.labels]
+    
+    def get_label(self):
+        return self.label["name"]
+    
+    def set_label(self, label_name):
+        if self.label["name"] != label_name:
+            self.label["name"] = label_name
+            self.manifest_changed = True
+    
+    def load_characters(self):
+        return self.characters
+    
+    def save_characters(self, characters):
+        # 只记录修改，随清单一起保存
+        self.characters = [dict(char) for char in characters]
+        self.manifest_changed = True
+    
+    def has_changes(self):
+        return bool(self.dirty) or self.manifest_changed
+    
+    def iter_shard_files(self):
+        for label in self.labels:
+            for shard in label["shards"]:
+                yield shard["file"]
+    
+    @staticmethod
+    def _new_shard_name(label_name):
+        """新分片的文件名：场景名（只保留字母、数字、下划线）+ 随机编号，不会与任何已有分片重名"""
+        prefix = re.sub(r"[^0-9A-Za-z_]+", "_", label_name).strip("_")[:40] or "label"
+        return f"{prefix}-{uuid.uuid4().hex[:16]}.json"
+    
+    def _write_shard(self, file_name, entries):
+        """写出一个分片（先写临时文件再替换），返回清单中的分片记录"""
+        data = "[\n" + ",\n".join(json.dumps(list(entry), ensure_ascii=False) for entry in entries) + "\n]\n"
+        if not entries:
+            data = "[]\n"
+        data = data.encode("utf-8")
+        os.makedirs(self.shard_dir, exist_ok=True)
+        path = os.path.join(self.shard_dir, file_name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        return {"file": file_name, "count": len(entries), "sha256": hashlib.sha256(data).hexdigest()}
+    
+    def _write_manifest(self):
+        manifest = {
+            "format": self.FORMAT_NAME,
+            "version": self.FORMAT_VERSION,
+            "characters": self.characters,
+            "labels": self.labels
+        }
+        with open(self.file_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        os.replace(self.file_path + ".tmp", self.file_path)
+        self.manifest_changed = False
+    
+    def _remove_files(self, file_names):
+        for file_name in file_names:
+            try:
+                os.remove(os.path.join(self.shard_dir, file_name))
+            except FileNotFoundError:
+                pass
+    
+    def load_local_state(self):
+        """读取本机记录（上次编辑的场景），不存在或无法读取时返回空字典"""
+        try:
+            with open(os.path.join(self.shard_dir, SHARD_LOCAL_STATE_FILE), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+    
+    def save_local_state(self):
+        """在本机记下当前场景，下次打开时默认选中；写入失败不影响编辑"""
+        try:
+            os.makedirs(self.shard_dir, exist_ok=True)
+            gitignore_path = os.path.join(self.shard_dir, ".gitignore")
+            if not os.path.exists(gitignore_path):
+                with open(gitignore_path, "w", encoding="utf-8") as f:
+                    f.write(SHARD_GITIGNORE)
+            with open(os.path.join(self.shard_dir, SHARD_LOCAL_STATE_FILE), "w", encoding="utf-8") as f:
+                json.dump({"current_label": self.get_label()}, f, ensure_ascii=False)
+        except OSError:
+            pass
+    
+    def read_shard(self, shard):
+        """读取一个分片的内容，校验值或条数与清单不符时抛出 ValueError"""
+        path = os.path.join(self.shard_dir, shard["file"])
+        with open(path, "rb") as f:
+            data = f.read()
+        if hashlib.sha256(data).hexdigest() != shard["sha256"]:
+            raise ValueError(f"{path}：分片文件与清单中的校验值不符（文件被修改或损坏）")
+        entries = json.loads(data.decode("utf-8"))
+        if len(entries) != shard["count"]:
+            raise ValueError(f"{path}：分片文件的条数与清单不符")
+        return entries
+    
+    def _remember_label(self):
+        """记下当前场景最近一次保存（或读取）时的分片列表，放弃修改时据此恢复"""
+        label = self.label
+        self._saved_label = {"name": label["name"], "shards": [dict(shard) for shard in label["shards"]]}
+    
+    def iter_label(self, label_index=None):
+        """逐个分片读取场景内容，不整体载入"""
+        label = self.label if label_index is None else self.labels[label_index]
+        for shard in label["shards"]:
+            yield from self.read_shard(shard)
+    
+    def open_label(self, label_index=None):
+        """切换到指定场景（默认为当前场景），只读取该场景的分片，返回 DialogueStore
+        
+        当前场景未保存的修改被放弃：分片列表恢复为上次保存时的状态，从未写出的分片记录随之去掉。
+        """
+        if label_index is None:
+            label_index = self.label_index
+        saved = self._saved_label
+        shards = saved["shards"] if label_index == self.label_index else self.labels[label_index]["shards"]
+        dialogues = DialogueStore(chain.from_iterable(self.read_shard(shard) for shard in shards))
+        
+        self.labels[self.label_index] = {"name": saved["name"], "shards": [dict(shard) for shard in saved["shards"]]}
+        self.label_index = label_index
+        self.dirty.clear()
+        self._remember_label()
+        return dialogues
+    
+    def add_label(self, label_name):
+        """追加一个空场景并返回其下标"""
+        self.labels.append({"name": label_name, "shards": []})
+        self.manifest_changed = True
+        return len(self.labels) - 1
+    
+    def _locate(self, index):
+        """返回第 index 条内容所在分片在当前场景分片列表中的下标"""
+        shards = self.label["shards"]
+        end = 0
+        for position, shard in enumerate(shards):
+            end += shard["count"]
+            if index < end:
+                return position
+        return len(shards) - 1
+    
+    def _add_rows(self, index, count):
+        shards = self.label["shards"]
+        if not shards:
+            shards.append({"file": self._new_shard_name(self.get_label()), "count": 0, "sha256": ""})
+            self.manifest_changed = True
+        # 新条目归入前一条所在的分片，各分片始终对应连续的一段内容
+        shard = shards[self._locate(index - 1) if index > 0 else 0]
+        shard["count"] += count
+        self.dirty.add(shard["file"])
+    
+    def _remove_row(self, index):
+        shard = self.label["shards"][self._locate(index)]
+        shard["count"] -= 1
+        self.dirty.add(shard["file"])
+    
+    def on_dialogues_changed(self, event, *args):
+        """内容存储的修改通知：更新各分片的条数并标记需要重写的分片"""
+        if event == "insert":
+            self._add_rows(args[0], args[1])
+        elif event == "delete":
+            self._remove_row(args[0])
+        elif event == "delete_many":
+            for index in reversed(args[0]):
+                self._remove_row(index)
+        elif event == "move":
+            self._remove_row(args[0])
+            self._add_rows(args[1], 1)
+        elif event == "swap":
+            self.dirty.add(self.label["shards"][self._locate(args[0])]["file"])
+            self.dirty.add(self.label["shards"][self._locate(args[1])]["file"])
+        elif event == "clear":
+            for shard in self.label["shards"]:
+                shard["count"] = 0
+                self.dirty.add(shard["file"])
+    
+    def save(self, dialogues):
+        """重写有修改的分片并更新清单，返回重写的分片数
+        
+        dialogues 为当前场景的内容存储；超过 SHARD_SIZE 两倍的分片拆分为多个，清空的分片删除。
+        有修改的分片一律以新文件名写出，清单替换后才删除旧文件：保存中途失败时，原清单与其引用的分片都保持完整。
+        """
+        if not self.has_changes():
+            return 0
+        label_name = self.get_label()
+        shards = []
+        written_files = []
+        removed = []
+        start = 0
+        try:
+            for shard in self.label["shards"]:
+                end = start + shard["count"]
+                if shard["file"] not in self.dirty:
+                    shards.append(shard)
+                    start = end
+                    continue
+                removed.append(shard["file"])
+                piece_size = SHARD_SIZE if end - start > SHARD_SIZE * 2 else end - start
+                for piece_start in range(start, end, max(piece_size, 1)):
+                    entries = [dialogues[index] for index in range(piece_start, min(piece_start + piece_size, end))]
+                    record = self._write_shard(self._new_shard_name(label_name), entries)
+                    written_files.append(record["file"])
+                    shards.append(record)
+                start = end
+            
+            manifest_shards = self.label["shards"]
+            self.label["shards"] = shards
+            try:
+                self._write_manifest()
+            except BaseException:
+                self.label["shards"] = manifest_shards
+                raise
+        except BaseException:
+            # 清单未更新，新写出的分片无人引用
+            self._remove_files(written_files)
+            raise
+        self._remove_files(removed)
+        self.dirty.clear()
+        self._remember_label()
+        self.save_local_state()
+        return len(written_files)
+
+def normalize_label_name(label_name):
+    """场景名中的空格替换为下划线，为空时使用start"""
+    return label_name.strip().replace(" ", "_") or "start"
+
+def render_script_header(characters, label_name, has_character_dialog):
+    """生成角色定义与 label 行"""
+    script_lines = []
+    if has_character_dialog and characters:
+        script_lines.append("# 角色定义（变量名=预定义值，禁止中文）")
+        for char in characters:
+            script_lines.append(f'define {char["var_name"]} = Character("{char["display_name"]}")')
+        script_lines.append("")
+    script_lines.append(f"label {label_name}:")
+    return "\n".join(script_lines)
+
+def render_dialogue_chunk(entries):
+    """渲染一段内容，每条语句以“换行+缩进”开头，各段按顺序直接拼接即为完整结果"""
+    parts = []
+    for content_type, char_var, content in entries:
+        statement = build_say_statement(content_type, char_var, content)
+        if statement is not None:
+            parts.append("\n    " + statement)
+    return "".join(parts)
+
+def iter_script_parts(characters, label_name, dialogues):
+    """按顺序逐段产出脚本内容，每段 RENDER_CHUNK_SIZE 条"""
+    yield render_script_header(characters, label_name, dialogues.count_type("character") > 0)
+    entries = iter(dialogues)
+    while True:
+        chunk = list(islice(entries, RENDER_CHUNK_SIZE))
+        if not chunk:
+            return
+        yield render_dialogue_chunk(chunk)
+
+def render_script(characters, label_name, dialogues):
+    """生成完整的Ren'Py脚本"""
+    return "".join(iter_script_parts(characters, label_name, dialogues))
+
+def write_sharded_script(file_path, out):
+    """把分片项目的全部场景按清单顺序渲染为一个Ren'Py脚本，逐个分片读取；返回 (场景数, 内容条数)"""
+    project = ShardedProject(file_path)
+    has_character_dialog = bool(project.characters) and any(
+        entry[0] == "character" for label_index in range(len(project.labels)) for entry in project.iter_label(label_index)
+    )
+    row_count = 0
+    for label_index, label in enumerate(project.labels):
+        label_name = normalize_label_name(label["name"])
+        if label_index == 0:
+            out.write(render_script_header(project.characters, label_name, has_character_dialog))
+        else:
+            out.write(f"\n\nlabel {label_name}:")
+        for shard in label["shards"]:
+            entries = project.read_shard(shard)
+            out.write(render_dialogue_chunk(entries))
+            row_count += len(entries)
+    return len(project.labels), row_count
+
+def read_temp_data(f):
+    """流式读取临时脚本文件的内容，返回各顶层键的字典
+    
+    "dialogues" 数组逐条解码后直接存入 DialogueStore，不会先生成完整的对话列表。
+    """
+    temp_data = {}
+    for key, value in iter_json_members(f, ("dialogues",)):
+        temp_data[key] = DialogueStore(value) if key == "dialogues" else value
+    return temp_data
+
+def read_temp_file(file_path):
+    """读取临时脚本文件，返回 (角色列表, 场景名, DialogueStore)，格式错误时抛出 ValueError"""
+    with open_data_file(file_path) as f:
+        temp_data = read_temp_data(f)
+    required_keys = ["characters", "current_label", "dialogues"]
+    if not isinstance(temp_data, dict) or not all(key in temp_data for key in required_keys):
+        raise ValueError(f"{file_path}：不是有效的临时脚本文件")
+    return temp_data["characters"], temp_data["current_label"], temp_data["dialogues"]
+
+def read_project_file(file_path, label_name=None):
+    """读取临时脚本文件、项目数据库或分片项目（按扩展名区分），返回 (角色列表, 场景名, 内容存储)
+    
+    分片项目只读取 label_name 指定的场景，默认为清单中的当前场景。
+    项目数据库的连接由返回的内容存储持有，用完后调用其 close() 关闭。
+    """
+    if file_path.lower().endswith(SHARDED_PROJECT_SUFFIX):
+        project = ShardedProject(file_path)
+        label_index = None
+        if label_name is not None:
+            label_names = project.label_names()
+            if label_name not in label_names:
+                raise ValueError(f"{file_path}：没有名为 {label_name} 的场景")
+            label_index = label_names.index(label_name)
+        dialogues = project.open_label(label_index)
+        return project.load_characters(), project.get_label(), dialogues
+    if not file_path.lower().endswith(PROJECT_DB_SUFFIX):
+        return read_temp_file(file_path)
+    if not os.path.isfile(file_path):
+        raise ValueError(f"{file_path}：文件不存在")
+    project = SQLiteProject(file_path)
+    try:
+        return project.load_characters(), project.get_label(), project.open_dialogues()
+    except sqlite3.Error:
+        project.close()
+        raise
+
+def read_project_labels(file_path):
+    """读取任意格式的项目文件，返回 (角色列表, [(场景名, 内容)])
+    
+    分片项目包含全部场景，各场景的内容在遍历时才逐个分片读取；其他格式只有一个场景。
+    用完后调用 close_project_labels() 关闭其中打开的项目数据库。
+    """
+    if file_path.lower().endswith(SHARDED_PROJECT_SUFFIX):
+        project = ShardedProject(file_path)
+        labels = [(label["name"], project.iter_label(label_index)) for label_index, label in enumerate(project.labels)]
+        return project.load_characters(), labels
+    characters, current_label, dialogues = read_project_file(file_path)
+    return characters, [(current_label, dialogues)]
+
+def close_project_labels(labels):
+    """关闭 read_project_labels() 返回的各场景内容（内容存储与分片读取的生成器都有 close()）"""
+    for label_name, dialogues in labels:
+        dialogues.close()
+
+def write_project_file(file_path, characters, current_label, dialogues, compact=False):
+    """写出临时脚本文件、项目数据库或分片项目（按扩展名区分）"""
+    if file_path.lower().endswith(SHARDED_PROJECT_SUFFIX):
+        ShardedProject.create(file_path, characters, [(current_label, dialogues)])
+        return
+    if file_path.lower().endswith(PROJECT_DB_SUFFIX):
+        SQLiteProject.create(file_path, characters, current_label, dialogues).close()
+        return
+    with open_data_file(file_path, "w") as f:
+        write_temp_data(f, characters, current_label, dialogues, compact)
+
+def summarize_text(content, width):
+    """生成单行摘要：换行与连续空白折叠为一个空格，超过 width 个字符时截断并加省略号"""
+    # 只处理开头足够长的一段，超长文本无需整体折叠
+    head = content[:width * 2 + 16]
+    summary = " ".join(head.split())
+    if len(summary) > width or len(head) < len(content):
+        summary = summary[:width] + "…"
+    return summary
+
+def open_data_file(file_path, mode="r"):
+    """以UTF-8文本方式打开临时脚本文件或角色配置文件
+    
+    读取时按文件头魔数识别gzip/xz压缩，写入时按扩展名（.gz/.xz）选择压缩格式，
+    压缩和解压都在读写过程中流式进行。
+    """
+    if "r" in mode:
+        with open(file_path, "rb") as f:
+            magic = f.read(len(XZ_MAGIC))
+        if magic.startswith(GZIP_MAGIC):
+            return gzip.open(file_path, "rt", encoding="utf-8")
+        if magic.startswith(XZ_MAGIC):
+            return lzma.open(file_path, "rt", encoding="utf-8")
+        return open(file_path, "r", encoding="utf-8")
+    
+    lower_path = file_path.lower()
+    if lower_path.endswith(".gz"):
+        return gzip.open(file_path, "wt", encoding="utf-8", compresslevel=6)
+    if lower_path.endswith(".xz"):
+        return lzma.open(file_path, "wt", encoding="utf-8")
+    return open(file_path, "w", encoding="utf-8")
+
+def write_temp_data(f, characters, current_label, dialogues, compact=False):
+    """逐条写出临时脚本文件，无需先生成完整的对话列表
+    
+    默认格式与 json.dump(indent=4) 完全一致；compact=True 时输出不缩进的紧凑JSON。
+    """
+    if compact:
+        f.write('{"characters":')
+        f.write(json.dumps(characters, ensure_ascii=False, separators=COMPACT_SEPARATORS))
+        f.write(',"current_label":')
+        f.write(json.dumps(current_label, ensure_ascii=False))
+        f.write(',"dialogues":[')
+        separator = ""
+        for entry in dialogues:
+            f.write(separator)
+            f.write(json.dumps(list(entry), ensure_ascii=False, separators=COMPACT_SEPARATORS))
+            separator = ","
+        f.write("]}")
+        return
+    
+    f.write("{\n")
+    f.write('    "characters": ')
+    f.write(json.dumps(characters, ensure_ascii=False, indent=4).replace("\n", "\n    "))
+    f.write(',\n    "current_label": ')
+    f.write(json.dumps(current_label, ensure_ascii=False))
+    f.write(',\n    "dialogues": [')
+    separator = "\n        "
+    for entry in dialogues:
+        f.write(separator)
+        f.write(json.dumps(list(entry), ensure_ascii=False, indent=4).replace("\n", "\n        "))
+        separator = ",\n        "
+    f.write("\n    ]\n}" if separator != "\n        " else "]\n}")
+
+def sheet_delimiter(file_path):
+    """.tsv/.tab 文件以制表符分隔，其余按逗号分隔"""
+    return "\t" if file_path.lower().endswith((".tsv", ".tab")) else ","
+
+def iter_sheet_rows(f, delimiter=","):
+    """逐行读取台本表格，产出 (说话人, 文本, 场景名或None)
+    
+    首行含「文本」列的表头时按表头确定各列位置，否则依次为说话人、文本、场景名（可省略）。
+    空行与文本为空的行跳过。
+    """
+    reader = csv.reader(f, delimiter=delimiter)
+    first_row = next(reader, None)
+    if first_row is None:
+        return
+    
+    header = [cell.strip().lower() for cell in first_row]
+    positions = {}
+    for key, names in SHEET_HEADER_NAMES.items():
+        for position, cell in enumerate(header):
+            if cell in names:
+                positions[key] = position
+                break
+    if "text" in positions:
+        rows = reader
+        speaker_column, text_column, label_column = positions.get("speaker"), positions["text"], positions.get("label")
+    else:
+        rows = chain([first_row], reader)
+        speaker_column, text_column, label_column = 0, 1, 2
+    
+    for row in rows:
+        if text_column >= len(row):
+            continue
+        text = row[text_column].strip()
+        if not text:
+            continue
+        speaker = row[speaker_column].strip() if speaker_column is not None and speaker_column < len(row) else ""
+        label = row[label_column].strip() if label_column is not None and label_column < len(row) else ""
+        yield speaker, text, label or None
+
+class SheetImporter:
+    """把台本表格的行转换为内容条目：说话人按角色变量名或显示名称匹配，未知的说话人自动创建角色
+    
+    自动创建的角色以说话人作为显示名称；变量名由说话人中的字母、数字、下划线组成，
+    不符合 VAR_NAME_PATTERN、是保留字或与已有变量名重复时改用 character_序号。
+    """
+    def __init__(self, characters):
+        self.characters = list(characters)
+        self.created = []
+        # 出现过的场景名（按首次出现的顺序）
+        self.labels = []
+        # 第一个不连续出现的场景名（同一场景的行被其他场景隔开），生成脚本时会出现重复的 label
+        self.split_label = None
+        self._last_label = None
+        self._seen_labels = set()
+        self.row_count = 0
+        self._next_number = 1
+        self._var_names = set()
+        self._by_name = {}
+        for char in self.characters:
+            self._var_names.add(char["var_name"])
+            self._by_name.setdefault(char["var_name"], char["var_name"])
+        for char in self.characters:
+            self._by_name.setdefault(char["display_name"], char["var_name"])
+    
+    def _new_var_name(self, speaker):
+        candidate = re.sub(r'[^a-zA-Z0-9_]+', '_', speaker).strip("_")
+        if VAR_NAME_PATTERN.match(candidate) and candidate not in RENPY_RESERVED_NAMES and candidate not in self._var_names:
+            return candidate
+        while f"character_{self._next_number}" in self._var_names:
+            self._next_number += 1
+        return f"character_{self._next_number}"
+    
+    def resolve(self, speaker):
+        """返回说话人对应的角色变量名，旁白返回空字符串"""
+        if speaker.lower() in NARRATOR_NAMES:
+            return ""
+        var_name = self._by_name.get(speaker)
+        if var_name is None:
+            var_name = self._new_var_name(speaker)
+            char = {"var_name": var_name, "display_name": speaker}
+            self.characters.append(char)
+            self.created.append(char)
+            self._var_names.add(var_name)
+            self._by_name[speaker] = var_name
+        return var_name
+    
+    def iter_dialogues(self, rows):
+        """逐行产出 (内容类型, 角色变量名, 文本)，同时记录出现过的场景名"""
+        for speaker, text, label in rows:
+            if label is not None:
+                if (not self.labels or self.labels[-1] != label) and label not in self.labels:
+                    self.labels.append(label)
+                label_name = normalize_label_name(label)
+                if label_name != self._last_label:
+                    if label_name in self._seen_labels and self.split_label is None:
+                        self.split_label = label_name
+                    self._seen_labels.add(label_name)
+                    self._last_label = label_name
+            self.row_count += 1
+            var_name = self.resolve(speaker)
+            yield ("character", var_name, text) if var_name else ("narration", "", text)
+
+def check_sheet_labels(file_path, importer):
+    """同一场景的行必须连续排列，否则按场景输出时会产生重复的 label，此时抛出 ValueError"""
+    if importer.split_label is not None:
+        raise ValueError(f"{file_path}：场景「{importer.split_label}」的行不连续（中间夹有其他场景），请把同一场景的行排在一起")
+
+def read_sheet_characters(file_path, characters=()):
+    """第一遍扫描台本表格：只收集说话人与场景名，返回 SheetImporter"""
+    importer = SheetImporter(characters)
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+        for entry in importer.iter_dialogues(iter_sheet_rows(f, sheet_delimiter(file_path))):
+            pass
+    return importer
+
+def iter_sheet_file(file_path, importer):
+    """第二遍逐行读取台本表格，产出内容条目（角色已在第一遍中全部创建）"""
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from importer.iter_dialogues(iter_sheet_rows(f, sheet_delimiter(file_path)))
+
+def iter_sheet_labels(file_path, importer, label_name="start"):
+    """第二遍按场景名列分组读取台本表格，产出 (规范化的场景名, 内容迭代器)，第一个场景名之前的行归入 label_name
+    
+    各组须按顺序读完再取下一组（供写出分片项目使用）。
+    """
+    current = [normalize_label_name(label_name)]
+    def row_label(row):
+        if row[2] is not None:
+            current[0] = normalize_label_name(row[2])
+        return current[0]
+    
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+        for label, rows in groupby(iter_sheet_rows(f, sheet_delimiter(file_path)), key=row_label):
+            yield label, importer.iter_dialogues(rows)
+
+def write_sheet(f, characters, labels, delimiter=","):
+    """按 (场景名, 内容) 序列逐条写出台本表格（说话人、文本、场景名），返回写出的条数
+    
+    说话人使用显示名称，显示名称有歧义时使用变量名。
+    """
+    writer = csv.writer(f, delimiter=delimiter)
+    writer.writerow(["speaker", "text", "label"])
+    
+    name_counts = {}
+    for char in characters:
+        for name in {char["var_name"], char["display_name"]}:
+            name_counts[name] = name_counts.get(name, 0) + 1
+    speaker_names = {}
+    for char in reversed(characters):
+        display_name = char["display_name"]
+        ambiguous = name_counts.get(display_name, 0) > 1 or display_name.lower() in NARRATOR_NAMES
+        speaker_names[char["var_name"]] = char["var_name"] if ambiguous else display_name
+    
+    row_count = 0
+    for label_name, dialogues in labels:
+        label_name = normalize_label_name(label_name)
+        for content_type, char_var, content in dialogues:
+            speaker = speaker_names.get(char_var, char_var) if content_type == "character" else ""
+            writer.writerow([speaker, content, label_name])
+            row_count += 1
+    return row_count
+
+def write_sheet_script(file_path, out):
+    """两遍把台本表格转换为Ren'Py脚本：第一遍收集角色与场景顺序并写出 define，第二遍逐行写出语句
+    
+    场景名列变化时开始新的 label 块，第一个场景名之前的行归入第一个场景（表格中没有场景名时为 start）；
+    同一场景的行不连续时抛出 ValueError。返回 (内容条数, 新建角色数)。
+    """
+    importer = read_sheet_characters(file_path)
+    check_sheet_labels(file_path, importer)
+    label_name = normalize_label_name(importer.labels[0]) if importer.labels else "start"
+    has_character_dialog = bool(importer.characters)
+    out.write(render_script_header(importer.characters, label_name, has_character_dialog))
+    
+    second_pass = SheetImporter(importer.characters)
+    with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+        for speaker, text, label in iter_sheet_rows(f, sheet_delimiter(file_path)):
+            if label is not None and normalize_label_name(label) != label_name:
+                label_name = normalize_label_name(label)
+                out.write(f"\n\nlabel {label_name}:")
+            var_name = second_pass.resolve(speaker)
+            if var_name:
+                out.write("\n    " + build_say_statement("character", var_name, text))
+            else:
+                out.write("\n    " + build_say_statement("narration", "", text))
+    return importer.row_count, len(importer.created)
+
+# 检查问题：severity 为"错误"/"警告"，target 为 "character"/"label"/"dialogue"，index 为对应列表中的下标
+LintIssue = namedtuple("LintIssue", ["severity", "target", "index", "message"])
+
+def check_dialogue_text(content):
+    """检查单条文本本身的问题，返回 (级别, 说明) 元组"""
+    if not content.strip():
+        return (("警告", "内容为空"),)
+    issues = []
+    unescaped = content.replace("[[", "").replace("{{", "")
+    if _UNCLOSED_INTERPOLATION_PATTERN.search(unescaped):
+        issues.append(("警告", "方括号未配对（Ren'Py会将[...]视为变量插值，字面量请写作[[）"))
+    if _UNCLOSED_TEXT_TAG_PATTERN.search(unescaped):
+        issues.append(("警告", "花括号未配对（Ren'Py会将{...}视为文本标签，字面量请写作{{）"))
+    return tuple(issues)
+
+class ProjectLinter:
+    """项目检查器：随内容的修改通知增量检查
+    
+    每行内容的文本检查结果按行保存；插入的行先记为待检查，take_job() 取出这些行的文本交给后台线程，
+    apply_job() 写回结果，删除、移动、交换只调整各行已有的结果，不重新检查。
+    角色引用检查按 (内容类型, 角色变量名) 计数，角色或场景名修改后无需遍历内容；
+    问题列表只在需要显示时按行生成。除 check_job() 外的方法都只能在界面线程中调用。
+    """
+    def __init__(self):
+        self.dialogues = None
+        self._reset()
+    
+    def _reset(self):
+        # 每行的文本问题元组；待检查的行为单元格 [结果]，结果写回前为None
+        self._rows = []
+        # 待检查行的单元格与对应的文本来源（按插入顺序）
+        self._pending = []
+        self._sources = []
+        # 已写回结果但仍以单元格存放的行数，过多时整理
+        self._resolved = 0
+        # 文本问题的 [错误数, 警告数]；(内容类型, 角色变量名) -> 条数
+        self._text_counts = [0, 0]
+        self._header_counts = {}
+    
+    def attach(self, dialogues):
+        """检查内容存储中的全部内容，之后随修改通知增量更新"""
+        self.dialogues = dialogues
+        self._add_rows(0, len(dialogues))
+        dialogues.add_listener(self.on_dialogues_changed)
+    
+    def detach(self):
+        if self.dialogues is not None:
+            self.dialogues.remove_listener(self.on_dialogues_changed)
+            self.dialogues = None
+    
+    def _count_text(self, issues, sign):
+        for severity, message in issues:
+            self._text_counts[0 if severity == "错误" else 1] += sign
+    
+    def _count_header(self, key, sign):
+        count = self._header_counts.get(key, 0) + sign
+        if count:
+            self._header_counts[key] = count
+        else:
+            del self._header_counts[key]
+    
+    def _add_rows(self, index, count):
+        if count <= 0:
+            return
+        dialogues = self.dialogues
+        for position in range(index, index + count):
+            self._count_header((dialogues.content_type(position), dialogues.char_var(position)), 1)
+        cells = [[None] for position in range(count)]
+        self._rows[index:index] = cells
+        self._pending.extend(cells)
+        if count > CONTENT_FILL_BATCH:
+            # 大批插入（打开项目、导入）：后台线程从快照中读取文本
+            self._sources.append((dialogues.snapshot(), index, count))
+        else:
+            self._sources.append(([dialogues.text(position) for position in range(index, index + count)], 0, count))
+    
+    def _remove_row(self, index, entry):
+        self._forget_row(self._rows.pop(index), entry)
+    
+    def _forget_row(self, row, entry):
+        """撤销一行在各计数中的贡献"""
+        self._count_header((entry[0], entry[1]), -1)
+        if type(row) is list:
+            if row[0] is None:
+                # 尚未检查：标记为已删除，后台结果不再写回
+                row[0] = ()
+                return
+            self._resolved -= 1
+            row = row[0]
+        self._count_text(row, -1)
+    
+    def on_dialogues_changed(self, event, *args):
+        if event == "insert":
+            self._add_rows(args[0], args[1])
+        elif event == "delete":
+            self._remove_row(args[0], args[1])
+        elif event == "delete_many":
+            indices, entries = args
+            for index, entry in zip(indices, entries):
+                self._forget_row(self._rows[index], entry)
+            # 逐段复制保留的行，不逐行弹出
+            rows = []
+            start = 0
+            for index in indices:
+                rows += self._rows[start:index]
+                start = index + 1
+            rows += self._rows[start:]
+            self._rows = rows
+        elif event == "move":
+            self._rows.insert(args[1], self._rows.pop(args[0]))
+        elif event == "swap":
+            index_a, index_b = args
+            self._rows[index_a], self._rows[index_b] = self._rows[index_b], self._rows[index_a]
+        elif event == "clear":
+            for cell in self._pending:
+                cell[0] = ()
+            self._reset()
+    
+    def has_pending(self):
+        return bool(self._pending)
+    
+    def take_job(self):
+        """取出待检查的行：返回 (单元格列表, 文本来源列表)，没有待检查的行时返回None"""
+        if not self._pending:
+            return None
+        job = (self._pending, self._sources)
+        self._pending = []
+        self._sources = []
+        return job
+    
+    @staticmethod
+    def check_job(sources):
+        """在后台线程中检查文本来源，按顺序返回每行的文本问题"""
+        results = []
+        for source, start, count in sources:
+            if isinstance(source, list):
+                texts = source
+            else:
+                texts = (source.text(index) for index in range(start, start + count))
+            results.extend(check_dialogue_text(content) for content in texts)
+        return results
+    
+    def apply_job(self, cells, results):
+        """写回后台检查的结果（已删除的行跳过）"""
+        for cell, issues in zip(cells, results):
+            if cell[0] is None:
+                cell[0] = issues
+                self._count_text(issues, 1)
+                self._resolved += 1
+        if self._resolved > len(self._rows) // 4 + CONTENT_FILL_BATCH:
+            self._rows = [row[0] if type(row) is list and row[0] is not None else row for row in self._rows]
+            self._resolved = sum(1 for row in self._rows if type(row) is list and row[0] is not None)
+    
+    def lint(self, characters, label_name, list_dialogues=True):
+        """汇总检查结果，返回 (问题列表, 错误数, 警告数)
+        
+        角色与场景名每次重新检查（数量很少）；内容问题的数量来自增量维护的计数，
+        list_dialogues 为 False 时问题列表中不列出内容问题，无需遍历内容。
+        """
+        issues = []
+        error_count = warning_count = 0
+        
+        def report(severity, target, index, message):
+            nonlocal error_count, warning_count
+            if severity == "错误":
+                error_count += 1
+            else:
+                warning_count += 1
+            if len(issues) < MAX_LINT_ISSUES:
+                issues.append(LintIssue(severity, target, index, message))
+        
+        defined_vars = set()
+        for index, char in enumerate(characters):
+            var_name = str(char.get("var_name", "")).strip()
+            display_name = str(char.get("display_name", ""))
+            if not var_name:
+                report("错误", "character", index, "角色变量名为空")
+                continue
+            if not VAR_NAME_PATTERN.match(var_name):
+                report("错误", "character", index, f"角色变量名「{var_name}」不合法（仅允许字母、数字、下划线，且不能以数字开头）")
+            elif var_name in RENPY_RESERVED_NAMES:
+                report("错误", "character", index, f"角色变量名「{var_name}」是Ren'Py保留字")
+            if var_name in defined_vars:
+                report("错误", "character", index, f"角色变量名「{var_name}」重复")
+            defined_vars.add(var_name)
+            if not display_name.strip():
+                report("警告", "character", index, f"角色「{var_name}」的显示名称为空")
+            elif '"' in display_name:
+                report("错误", "character", index, f"角色「{var_name}」的显示名称包含双引号")
+        
+        label_text = label_name.strip()
+        if not label_text:
+            report("错误", "label", 0, "场景名称为空（生成脚本时将使用start）")
+        elif not LABEL_NAME_PATTERN.match(label_text.replace(" ", "_")):
+            report("错误", "label", 0, f"场景名称「{label_text}」不合法（仅允许字母、数字、下划线，且不能以数字开头）")
+        
+        # 结构性问题只取决于 (内容类型, 角色变量名)，按计数汇总
+        bad_headers = {}
+        for (content_type, char_var), count in self._header_counts.items():
+            if content_type == "character":
+                if not char_var:
+                    bad_headers[(content_type, char_var)] = "角色对话未指定角色"
+                elif char_var not in defined_vars:
+                    bad_headers[(content_type, char_var)] = f"引用了不存在的角色「{char_var}」"
+            elif content_type != "narration":
+                bad_headers[(content_type, char_var)] = f"未知的内容类型「{content_type}」"
+        header_errors = sum(self._header_counts[key] for key in bad_headers)
+        dialogue_errors = header_errors + self._text_counts[0]
+        dialogue_warnings = self._text_counts[1]
+        
+        if list_dialogues and (dialogue_errors or dialogue_warnings) and len(issues) < MAX_LINT_ISSUES:
+            rows = self._rows
+            for index, (uid, content_type, char_var) in enumerate(self.dialogues.iter_headers()):
+                message = bad_headers.get((content_type, char_var))
+                if message is not None:
+                    issues.append(LintIssue("错误", "dialogue", index, f"第{index + 1}条：{message}"))
+                row = rows[index]
+                if type(row) is list:
+                    row = row[0] or ()
+                for severity, message in row:
+                    issues.append(LintIssue(severity, "dialogue", index, f"第{index + 1}条：{message}"))
+                if len(issues) >= MAX_LINT_ISSUES:
+                    del issues[MAX_LINT_ISSUES:]
+                    break
+        
+        return issues, error_count + dialogue_errors, warning_count + dialogue_warnings
+
+def text_stats(content):
+    """单条文本的 (单词数, 中日韩文字数, 字符数)：不计文本标签与空白，中日韩文字逐字计数，不算作单词"""
+    text = _TEXT_TAG_PATTERN.sub("", content)
+    cjk_count = len(_CJK_CHAR_PATTERN.findall(text))
+    word_count = len(_WORD_PATTERN.findall(_CJK_CHAR_PATTERN.sub(" ", text)))
+    return word_count, cjk_count, len("".join(text.split()))
+
+def estimate_read_seconds(word_count, cjk_count):
+    return word_count * 60 / READ_WORDS_PER_MINUTE + cjk_count * 60 / READ_CJK_CHARS_PER_MINUTE
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}小时{minutes:02d}分{seconds:02d}秒"
+    return f"{minutes}分{seconds:02d}秒"
+
+# 统计表的一行：变量名（旁白为空）、显示名称、条数、词数（单词数+中日韩文字数）、字符数、条数占比、预计朗读秒数
+StatsRow = namedtuple("StatsRow", ["var_name", "display_name", "lines", "words", "chars", "ratio", "read_seconds"])
+
+STATS_CSV_HEADER = ["角色变量名", "显示名称", "条数", "词数", "字数", "条数占比", "预计朗读时长（秒）"]
+
+class ProjectStats:
+    """项目统计：按角色累计条数、单词数、中日韩文字数、字符数
+    
+    attach() 后随内容的修改通知增量更新：插入或删除只统计变化的条目，移动和交换不影响统计，
+    无需重新遍历全部内容。统计按角色变量名累计，角色改名、增删只在生成统计表时体现。
+    """
+    def __init__(self):
+        # 变量名 -> [条数, 单词数, 中日韩文字数, 字符数]，旁白记在空字符串下
+        self.totals = {}
+        self.dialogues = None
+    
+    @classmethod
+    def from_dialogues(cls, dialogues):
+        stats = cls()
+        for entry in dialogues:
+            stats.add(*entry)
+        return stats
+    
+    def attach(self, dialogues):
+        """从内容存储完整统计一次，之后随修改通知增量更新"""
+        self.totals = {}
+        for entry in dialogues:
+            self.add(*entry)
+        self.dialogues = dialogues
+        dialogues.add_listener(self.on_dialogues_changed)
+    
+    def detach(self):
+        if self.dialogues is not None:
+            self.dialogues.remove_listener(self.on_dialogues_changed)
+            self.dialogues = None
+    
+    def add(self, content_type, char_var, content, sign=1):
+        key = char_var if content_type == "character" else ""
+        totals = self.totals.get(key)
+        if totals is None:
+            totals = self.totals[key] = [0, 0, 0, 0]
+        word_count, cjk_count, char_count = text_stats(content)
+        totals[0] += sign
+        totals[1] += sign * word_count
+        totals[2] += sign * cjk_count
+        totals[3] += sign * char_count
+        if totals[0] == 0:
+            del self.totals[key]
+    
+    def on_dialogues_changed(self, event, *args):
+        if event == "insert":
+            index, count = args
+            for position in range(index, index + count):
+                self.add(*self.dialogues[position])
+        elif event == "delete":
+            self.add(*args[1], sign=-1)
+        elif event == "delete_many":
+            for entry in args[1]:
+                self.add(*entry, sign=-1)
+        elif event == "clear":
+            self.totals = {}
+    
+    def rows(self, characters):
+        """按角色列表顺序生成统计表，未定义的角色与旁白排在后面，最后一行为合计"""
+        total_lines = sum(totals[0] for totals in self.totals.values())
+        
+        def make_row(var_name, display_name, totals):
+            lines, word_count, cjk_count, char_count = totals
+            return StatsRow(
+                var_name,
+                display_name,
+                lines,
+                word_count + cjk_count,
+                char_count,
+                lines / total_lines if total_lines else 0.0,
+                estimate_read_seconds(word_count, cjk_count)
+            )
+        
+        rows = []
+        listed = set()
+        for char in characters:
+            var_name = char["var_name"]
+            if var_name not in listed:
+                listed.add(var_name)
+                rows.append(make_row(var_name, char["display_name"], self.totals.get(var_name, (0, 0, 0, 0))))
+        for var_name in sorted(key for key in self.totals if key and key not in listed):
+            rows.append(make_row(var_name, "（未定义的角色）", self.totals[var_name]))
+        rows.append(make_row("", "旁白", self.totals.get("", (0, 0, 0, 0))))
+        
+        grand_total = [sum(column) for column in zip((0, 0, 0, 0), *self.totals.values())]
+        rows.append(make_row("", "合计", grand_total))
+        return rows
+
+def write_stats_csv(f, rows, file_name=None):
+    """写出统计表；file_name 不为 None 时在每行前加一列文件名（批量统计多个项目时使用）"""
+    writer = csv.writer(f)
+    prefix = [] if file_name is None else [file_name]
+    for row in rows:
+        writer.writerow(prefix + [row.var_name, row.display_name, row.lines, row.words, row.chars, f"{row.ratio:.2%}", round(row.read_seconds)])
+
+class WorkspaceIndex:
+    """工作区全文索引：用SQLite FTS5索引工作区目录下所有临时脚本文件
+    
+    每条内容记录角色变量名、角色显示名称、场景名、文本及其在项目中的位置。
+    中日韩文字逐字切分后建立索引，查找时按短语匹配，因此任意长度的中文子串都能走索引；
+    文件按修改时间与大小增量更新。SQLite未编译FTS5时退回普通表逐行匹配。
+    每个线程需使用各自的实例（SQLite连接不跨线程共享）。
+    """
+    # 索引表结构版本，结构变化时自动重建
+    SCHEMA_VERSION = 1
+    
+    def __init__(self, workspace_dir):
+        self.workspace_dir = os.path.abspath(workspace_dir)
+        self.conn = sqlite3.connect(os.path.join(self.workspace_dir, WORKSPACE_INDEX_FILE), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS lines")
+            self.conn.execute("DROP TABLE IF EXISTS files")
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime REAL, size INTEGER)"
+        )
+        self.use_fts = self._create_lines_table()
+        self.conn.commit()
+    
+    def _create_lines_table(self):
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'lines'").fetchone()
+        if row is not None:
+            return "fts5" in row[0].lower()
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE lines USING fts5("
+                "label, terms, speaker UNINDEXED, speaker_name UNINDEXED, text UNINDEXED, file_id UNINDEXED, position UNINDEXED, "
+                "tokenize='unicode61 remove_diacritics 0')"
+            )
+            return True
+        except sqlite3.OperationalError:
+            self.conn.execute(
+                "CREATE TABLE lines (label TEXT, terms TEXT, speaker TEXT, speaker_name TEXT, text TEXT, "
+                "file_id INTEGER, position INTEGER)"
+            )
+            self.conn.execute("CREATE INDEX lines_file ON lines (file_id)")
+            return False
+    
+    @staticmethod
+    def split_terms(text):
+        """中日韩文字逐字加空格，使分词器把每个字作为一个词"""
+        return _CJK_CHAR_PATTERN.sub(r" \1 ", text)
+    
+    def close(self):
+        self.conn.close()
+    
+    def _file_id(self, path):
+        row = self.conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.conn.execute("INSERT INTO files (path) VALUES (?)", (path,)).lastrowid
+    
+    def _set_file_stat(self, path, stat):
+        file_id = self._file_id(path)
+        self.conn.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?", (stat.st_mtime, stat.st_size, file_id))
+        return file_id
+    
+    def index_project(self, file_path, characters, current_label, dialogues):
+        """重新索引单个项目文件（保存后调用，直接使用内存中的数据，无需重新读取文件）"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        display_map = {char.get("var_name"): str(char.get("display_name", "")) for char in reversed(characters)}
+        label_name = normalize_label_name(current_label)
+        split_terms = self.split_terms
+        # 角色变量名、显示名称与文本一起写入索引列，原文另存一份用于显示
+        with self.conn:
+            file_id = self._set_file_stat(path, stat)
+            self.conn.execute("DELETE FROM lines WHERE file_id = ?", (file_id,))
+            self.conn.executemany(
+                "INSERT INTO lines (label, terms, speaker, speaker_name, text, file_id, position) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        label_name,
+                        split_terms(f"{char_var} {display_map.get(char_var, '')} {content}"),
+                        char_var,
+                        display_map.get(char_var, ""),
+                        content,
+                        file_id,
+                        position
+                    )
+                    for position, (content_type, char_var, content) in enumerate(dialogues)
+                )
+            )
+    
+    def remove_file(self, path):
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+            if row is not None:
+                self.conn.execute("DELETE FROM lines WHERE file_id = ?", (row[0],))
+                self.conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+    
+    def iter_project_files(self):
+        for root, dirs, files in os.walk(self.workspace_dir):
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for name in files:
+                if name.lower().endswith(PROJECT_FILE_SUFFIXES):
+                    yield os.path.join(root, name)
+    
+    def refresh(self):
+        """按修改时间与大小增量更新整个工作区，返回 (重新索引的文件数, 移除的文件数)"""
+        known = {path: (mtime, size) for path, mtime, size in self.conn.execute("SELECT path, mtime, size FROM files")}
+        updated = 0
+        for path in self.iter_project_files():
+            stat = os.stat(path)
+            if known.pop(path, None) == (stat.st_mtime, stat.st_size):
+                continue
+            try:
+                characters, current_label, dialogues = read_temp_file(path)
+            except Exception:
+                # 不是临时脚本文件（如角色配置文件）或已损坏：只记录修改时间，避免每次重复解析
+                self.remove_file(path)
+                with self.conn:
+                    self._set_file_stat(path, stat)
+                continue
+            self.index_project(path, characters, current_label, dialogues)
+            updated += 1
+        
+        for path in known:
+            self.remove_file(path)
+        return updated, len(known)
+    
+    def search(self, query, limit=MAX_SEARCH_RESULTS):
+        """查找包含 query 的内容（匹配角色、场景名或文本）
+        
+        返回 [(文件路径, 位置, 场景名, 角色变量名, 角色显示名称, 文本)]，按文件与位置排序。
+        查询按短语匹配，最后一个词按前缀匹配。匹配超过 limit 条时，全文索引取相关度最高的 limit 条，
+        不支持全文索引时取最先找到的 limit 条；只对这一页结果排序，不会对全部匹配排序。
+        """
+        query = query.strip()
+        if not query:
+            return []
+        
+        if self.use_fts:
+            phrase = '"' + self.split_terms(query).replace('"', '""') + '" *'
+            page = "SELECT rowid FROM lines WHERE lines MATCH ? ORDER BY rank LIMIT ?"
+            params = (phrase, limit)
+        else:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where = " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in ("speaker", "speaker_name", "label", "text"))
+            page = "SELECT rowid FROM lines WHERE " + where + " LIMIT ?"
+            params = (pattern,) * 4 + (limit,)
+        return self.conn.execute(
+            "SELECT files.path, lines.position, lines.label, lines.speaker, lines.speaker_name, lines.text "
+            f"FROM lines JOIN files ON files.id = lines.file_id WHERE lines.rowid IN ({page}) "
+            "ORDER BY files.path, lines.position",
+            params
+        ).fetchall()
+
+class WorkspaceSearchWindow(tk.Toplevel):
+    """在工作区中查找：跨工作区内所有临时脚本文件全文查找，双击结果打开对应项目并定位到该行"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("在工作区中查找")
+        self.geometry("800x500")
+        self.minsize(600, 350)
+        self.configure(bg="#f0f0f0")
+        self.parent = parent
+        self.results = []
+        self.index = None
+        self.refresh_queue = queue.Queue()
+        
+        frame_workspace = ttk.Frame(self, padding=(10, 8))
+        frame_workspace.pack(fill="x", padx=15, pady=(10, 0))
+        self.workspace_var = tk.StringVar(value=parent.workspace_dir or "（未选择工作区）")
+        ttk.Label(frame_workspace, text="工作区：", font=parent.base_font).pack(side="left")
+        ttk.Label(frame_workspace, textvariable=self.workspace_var, font=parent.base_font).pack(side="left", fill="x", expand=True)
+        ttk.Button(frame_workspace, text="选择工作区…", command=self.choose_workspace).pack(side="right")
+        
+        frame_query = ttk.Frame(self, padding=(10, 8))
+        frame_query.pack(fill="x", padx=15)
+        self.entry_query = ttk.Entry(frame_query, font=parent.base_font)
+        self.entry_query.pack(side="left", fill="x", expand=True, padx=(0, 8))
+        self.entry_query.bind("<Return>", lambda event: self.search())
+        ttk.Button(frame_query, text="查找", command=self.search).pack(side="right")
+        
+        frame_results = ttk.Frame(self)
+        frame_results.pack(fill="both", padx=15, pady=5, expand=True)
+        self.lb_results = tk.Listbox(
+            frame_results,
+            font=parent.base_font,
+            bd=1,
+            relief="solid",
+            selectbackground="#4a90e2",
+            selectforeground="white"
+        )
+        self.lb_results.pack(side="left", fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(frame_results, orient="vertical", command=self.lb_results.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.lb_results.config(yscrollcommand=scrollbar.set)
+        self.lb_results.bind("<Double-Button-1>", self.on_result_activate)
+        self.lb_results.bind("<Return>", self.on_result_activate)
+        
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.status_var, font=parent.base_font).pack(fill="x", padx=15, pady=(0, 10))
+        
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.entry_query.focus_set()
+        if parent.workspace_dir:
+            self.open_workspace(parent.workspace_dir)
+    
+    def choose_workspace(self):
+        workspace_dir = filedialog.askdirectory(title="选择工作区目录", parent=self)
+        if workspace_dir:
+            self.parent.workspace_dir = workspace_dir
+            self.workspace_var.set(workspace_dir)
+            self.open_workspace(workspace_dir)
+    
+    def open_workspace(self, workspace_dir):
+        if self.index is not None:
+            self.index.close()
+        try:
+            self.index = WorkspaceIndex(workspace_dir)
+        except sqlite3.Error as e:
+            self.index = None
+            self.status_var.set(f"无法打开工作区索引：{str(e)}")
+            return
+        
+        # 后台按修改时间更新索引（包括在其他地方修改过的文件），期间可以查找已有索引
+        self.status_var.set("正在更新索引…")
+        threading.Thread(target=self._refresh_index, args=(workspace_dir,), daemon=True).start()
+        self.after(LINT_POLL_MS, self._poll_refresh)
+    
+    def _refresh_index(self, workspace_dir):
+        try:
+            index = WorkspaceIndex(workspace_dir)
+            try:
+                updated, removed = index.refresh()
+            finally:
+                index.close()
+            self.refresh_queue.put(f"索引已更新：重新索引{updated}个文件，移除{removed}个文件")
+        except Exception as e:
+            self.refresh_queue.put(f"索引更新失败：{str(e)}")
+    
+    def _poll_refresh(self):
+        if not self.winfo_exists():
+            return
+        try:
+            message = self.refresh_queue.get_nowait()
+        except queue.Empty:
+            self.after(LINT_POLL_MS, self._poll_refresh)
+            return
+        self.status_var.set(message)
+    
+    def search(self):
+        if self.index is None:
+            messagebox.showwarning("警告", "请先选择工作区！", parent=self)
+            return
+        
+        started = time.perf_counter()
+        try:
+            self.results = self.index.search(self.entry_query.get())
+        except sqlite3.Error as e:
+            messagebox.showerror("错误", f"查找失败：{str(e)}", parent=self)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        self.lb_results.delete(0, tk.END)
+        lines = []
+        for path, position, label_name, speaker, speaker_name, text in self.results:
+            speaker_text = f"{speaker_name or speaker}: " if speaker else ""
+            relative_path = os.path.relpath(path, self.index.workspace_dir)
+            lines.append(f"{relative_path} [{label_name}] 第{position + 1}条  {speaker_text}{summarize_text(text, 80)}")
+        if lines:
+            self.lb_results.insert(tk.END, *lines)
+        
+        suffix = f"（仅列出前{MAX_SEARCH_RESULTS}条）" if len(self.results) >= MAX_SEARCH_RESULTS else ""
+        self.status_var.set(f"找到{len(self.results)}条结果{suffix}，用时{elapsed_ms:.1f}毫秒")
+    
+    def on_result_activate(self, event=None):
+        selected_index = self.lb_results.curselection()
+        if selected_index:
+            path, position = self.results[selected_index[0]][:2]
+            self.parent.open_project_at(path, position, parent=self)
+    
+    def on_close(self):
+        if self.index is not None:
+            self.index.close()
+        self.destroy()
+
+class LintReportWindow(tk.Toplevel):
+    """项目检查报告窗口（非模态，检查结果更新时自动刷新）"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("项目检查报告")
+        self.geometry("650x400")
+        self.minsize(500, 300)
+        self.configure(bg="#f0f0f0")
+        self.parent = parent
+        self.issues = []
+        
+        self.summary_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.summary_var, font=parent.base_font).pack(fill="x", padx=15, pady=(10, 0))
+        
+        frame_list = ttk.Frame(self)
+        frame_list.pack(fill="both", padx=15, pady=10, expand=True)
+        
+        self.lb_issues = tk.Listbox(
+            frame_list,
+            font=parent.base_font,
+            bd=1,
+            relief="solid",
+            selectbackground="#4a90e2",
+            selectforeground="white"
+        )
+        self.lb_issues.pack(side="left", fill="both", expand=True)
+        
+        scrollbar = ttk.Scrollbar(frame_list, orient="vertical", command=self.lb_issues.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.lb_issues.config(yscrollcommand=scrollbar.set)
+        
+        self.lb_issues.bind("<Double-Button-1>", self.on_issue_activate)
+        self.lb_issues.bind("<Return>", self.on_issue_activate)
+        
+        ttk.Label(self, text="双击问题可定位到对应的角色或内容", font=parent.base_font).pack(pady=(0, 10))
+    
+    def update_issues(self, issues, error_count, warning_count):
+        self.issues = issues
+        summary = f"共{error_count}个错误，{warning_count}个警告"
+        if error_count + warning_count > len(issues):
+            summary += f"（仅列出前{len(issues)}个）"
+        self.summary_var.set(summary)
+        
+        self.lb_issues.delete(0, tk.END)
+        if issues:
+            self.lb_issues.insert(tk.END, *[f"[{issue.severity}] {issue.message}" for issue in issues])
+    
+    def on_issue_activate(self, event=None):
+        selected_index = self.lb_issues.curselection()
+        if selected_index:
+            self.parent.goto_lint_issue(self.issues[selected_index[0]])
+
+class VirtualListbox(tk.Listbox):
+    """只显示可见行的列表框：总条数由 row_count() 给出，可见行的文本按位置向 row_texts(起始, 结束) 读取
+    
+    下标、选中、滚动等方法与 tk.Listbox 相同，但都按全部行中的位置计；原生列表框中只有当前可见的几十行，
+    条数再多也无需逐行填充。点击、键盘与滚轮操作由本类处理（模拟 extended 选择模式），
+    内容修改后调用 on_rows_changed() 调整选中行并重绘可见部分。
+    """
+    def __init__(self, master, row_count, row_texts, **options):
+        options["exportselection"] = False
+        super().__init__(master, **options)
+        self.row_count = row_count
+        self.row_texts = row_texts
+        self.top = 0
+        self.selected = set()
+        self.active_index = 0
+        self.anchor_index = 0
+        self.scroll_command = None
+        self.drawn_count = 0
+        self.draw_after_id = None
+        
+        # 不使用 Listbox 的类绑定（它只认识原生列表框中的几十行），改用本类的绑定
+        self.bindtags((str(self), "VirtualListbox", str(self.winfo_toplevel()), "all"))
+        for sequence, handler in (
+            ("<ButtonPress-1>", "_on_click"),
+            ("<B1-Motion>", "_on_drag_select"),
+            ("<MouseWheel>", "_on_mouse_wheel"),
+            ("<Button-4>", "_on_mouse_wheel"),
+            ("<Button-5>", "_on_mouse_wheel"),
+            ("<Up>", "_on_key"),
+            ("<Down>", "_on_key"),
+            ("<Shift-Up>", "_on_key"),
+            ("<Shift-Down>", "_on_key"),
+            ("<Prior>", "_on_key"),
+            ("<Next>", "_on_key"),
+            ("<Home>", "_on_key"),
+            ("<End>", "_on_key"),
+            ("<Control-Home>", "_on_key"),
+            ("<Control-End>", "_on_key"),
+            ("<Control-a>", "_on_select_all"),
+            ("<Configure>", "_on_configure"),
+        ):
+            self.bind_class("VirtualListbox", sequence, lambda event, name=handler: getattr(event.widget, name)(event))
+    
+    def configure(self, cnf=None, **options):
+        # 原生列表框的滚动比例只对应可见的几十行，滚动条改由本类按全部行更新
+        if "yscrollcommand" in options:
+            self.scroll_command = options.pop("yscrollcommand")
+            self.schedule_draw()
+        return super().configure(cnf, **options)
+    
+    config = configure
+    
+    def _index(self, index):
+        if index in (tk.END, "end"):
+            return self.row_count() - 1
+        if index == tk.ACTIVE:
+            return self.active_index
+        if index == tk.ANCHOR:
+            return self.anchor_index
+        return int(index)
+    
+    def _range(self, first, last=None):
+        first = self._index(first)
+        last = first if last is None else self._index(last)
+        if first > last:
+            first, last = last, first
+        return range(max(first, 0), min(last, self.row_count() - 1) + 1)
+    
+    def page_size(self):
+        """完整显示的行数"""
+        line_height = self.tk.call("font", "metrics", self.cget("font"), "-linespace") + 1 + 2 * int(self.cget("selectborderwidth"))
+        inset = int(self.cget("borderwidth")) + int(self.cget("highlightthickness"))
+        return max(1, (self.winfo_height() - 2 * inset) // line_height)
+    
+    def _clamp_top(self):
+        self.top = max(0, min(self.top, self.row_count() - self.page_size()))
+    
+    def schedule_draw(self):
+        if self.draw_after_id is None:
+            self.draw_after_id = self.after_idle(self.draw)
+    
+    def draw(self):
+        """重绘可见行：只读取可见部分的文本，并同步选中状态与滚动条"""
+        if self.draw_after_id is not None:
+            self.after_cancel(self.draw_after_id)
+            self.draw_after_id = None
+        total = self.row_count()
+        page = self.page_size()
+        self._clamp_top()
+        end = min(self.top + page + 1, total)
+        super().delete(0, tk.END)
+        if self.top < end:
+            super().insert(0, *self.row_texts(self.top, end))
+        self.drawn_count = end - self.top
+        for index in self.selected:
+            if self.top <= index < end:
+                super().selection_set(index - self.top)
+        if self.top <= self.active_index < end:
+            super().activate(self.active_index - self.top)
+        super().yview_moveto(0)
+        if self.scroll_command is not None:
+            self.scroll_command(*self.yview())
+    
+    def _ensure_drawn(self):
+        if self.draw_after_id is not None:
+            self.draw()
+    
+    def reset(self):
+        """内容整体替换后清除选中并回到顶部"""
+        self.top = 0
+        self.selected.clear()
+        self.active_index = self.anchor_index = 0
+        self.schedule_draw()
+    
+    def refresh(self):
+        """行文本的显示方式变化（如角色显示名称修改）后重绘可见行"""
+        self.schedule_draw()
+    
+    def on_rows_changed(self, event, *args):
+        """按内容存储的修改通知调整选中行与滚动位置，与原生列表框插入、删除行时的行为一致"""
+        if event == "clear":
+            self.reset()
+            return
+        if event == "insert":
+            index, count = args
+            remap = lambda position: position + count if position >= index else position
+            if 0 < self.top and index <= self.top:
+                self.top += count
+        elif event == "delete":
+            index = args[0]
+            self.selected.discard(index)
+            remap = lambda position: position - 1 if position > index else position
+            if index < self.top:
+                self.top -= 1
+        elif event == "delete_many":
+            indices = args[0]
+            self.selected.difference_update(indices)
+            # 被删除的行映射到其后第一条保留的行
+            remap = lambda position: position - bisect_left(indices, position)
+            self.top -= bisect_left(indices, self.top)
+        elif event == "move":
+            from_index, to_index = args
+            def remap(position):
+                if position == from_index:
+                    return to_index
+                if from_index < position <= to_index:
+                    return position - 1
+                if to_index <= position < from_index:
+                    return position + 1
+                return position
+        elif event == "swap":
+            index_a, index_b = args
+            remap = lambda position: index_b if position == index_a else index_a if position == index_b else position
+        else:
+            return
+        self.selected = set(map(remap, self.selected))
+        self.active_index = remap(self.active_index)
+        self.anchor_index = remap(self.anchor_index)
+        self.schedule_draw()
+    
+    def size(self):
+        return self.row_count()
+    
+    def get(self, first, last=None):
+        rows = self._range(first, last)
+        if not rows:
+            return "" if last is None else ()
+        texts = self.row_texts(rows.start, rows.stop)
+        return texts[0] if last is None else tuple(texts)
+    
+    def curselection(self):
+        return tuple(sorted(self.selected))
+    
+    def selection_set(self, first, last=None):
+        self.selected.update(self._range(first, last))
+        self.schedule_draw()
+    
+    select_set = selection_set
+    
+    def selection_clear(self, first, last=None):
+        rows = self._range(first, last)
+        if len(rows) >= self.row_count():
+            self.selected.clear()
+        else:
+            self.selected.difference_update(rows)
+        self.schedule_draw()
+    
+    select_clear = selection_clear
+    
+    def selection_includes(self, index):
+        return self._index(index) in self.selected
+    
+    def selection_anchor(self, index):
+        self.anchor_index = self._index(index)
+    
+    def activate(self, index):
+        self.active_index = max(0, min(self._index(index), self.row_count() - 1))
+        self.schedule_draw()
+    
+    def index(self, index):
+        return self._index(index)
+    
+    def see(self, index):
+        index = self._index(index)
+        page = self.page_size()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + page:
+            self.top = index - page + 1
+        self.schedule_draw()
+    
+    def nearest(self, y):
+        total = self.row_count()
+        if total == 0:
+            return -1
+        self._ensure_drawn()
+        return min(self.top + max(super().nearest(y), 0), total - 1)
+    
+    def bbox(self, index):
+        self._ensure_drawn()
+        index = self._index(index)
+        if not self.top <= index < self.top + self.drawn_count:
+            return None
+        return super().bbox(index - self.top)
+    
+    def yview(self, *args):
+        if not args:
+            total = self.row_count()
+            if total == 0:
+                return 0.0, 1.0
+            return self.top / total, min(1.0, (self.top + self.page_size()) / total)
+        if args[0] == "moveto":
+            self.yview_moveto(args[1])
+        elif args[0] == "scroll":
+            self.yview_scroll(int(args[1]), args[2])
+    
+    def yview_moveto(self, fraction):
+        self.top = int(float(fraction) * self.row_count())
+        self._clamp_top()
+        self.draw()
+    
+    def yview_scroll(self, number, what):
+        self.top += number * (self.page_size() - 1 if what == "pages" else 1)
+        self._clamp_top()
+        self.draw()
+    
+    def _select_only(self, index):
+        self.selected = {index}
+        self.anchor_index = self.active_index = index
+    
+    def _on_click(self, event):
+        self.focus_set()
+        index = self.nearest(event.y)
+        if index < 0:
+            return
+        if event.state & 0x0001:
+            # Shift：选中锚点到点击行之间的所有行
+            self.selected = set(self._range(self.anchor_index, index))
+            self.active_index = index
+        elif event.state & 0x0004:
+            # Ctrl：切换点击行的选中状态
+            self.selected.symmetric_difference_update((index,))
+            self.anchor_index = self.active_index = index
+        else:
+            self._select_only(index)
+        self.draw()
+        self.event_generate("<<ListboxSelect>>")
+    
+    def _on_drag_select(self, event):
+        index = self.nearest(event.y)
+        if index < 0:
+            return
+        self.selected = set(self._range(self.anchor_index, index))
+        self.active_index = index
+        self.see(index)
+        self.draw()
+        self.event_generate("<<ListboxSelect>>")
+    
+    def _on_mouse_wheel(self, event):
+        if event.num == 4:
+            units = -5
+        elif event.num == 5:
+            units = 5
+        else:
+            units = -(event.delta // 120) * 4
+        self.yview_scroll(units, "units")
+    
+    def _on_key(self, event):
+        total = self.row_count()
+        if total == 0:
+            return "break"
+        page = self.page_size()
+        steps = {"Up": -1, "Down": 1, "Prior": -page, "Next": page, "Home": -total, "End": total}
+        index = max(0, min(self.active_index + steps[event.keysym], total - 1))
+        if event.state & 0x0001:
+            self.selected = set(self._range(self.anchor_index, index))
+            self.active_index = index
+        else:
+            self._select_only(index)
+        self.see(index)
+        self.draw()
+        self.event_generate("<<ListboxSelect>>")
+        return "break"
+    
+    def _on_select_all(self, event):
+        self.selected = set(range(self.row_count()))
+        self.draw()
+        self.event_generate("<<ListboxSelect>>")
+        return "break"
+    
+    def _on_configure(self, event):
+        self.schedule_draw()
+
+class BlockPrefixSums:
+    """可在任意位置插入、删除的非负整数序列，支持前缀和与按累计值反查下标
+    
+    数值按块存放（每块至多 BLOCK_SIZE*2 个），每块记录合计；各块起始下标与起始累计值只在修改后从受影响的块起重算，
+    前缀和与反查只需二分查找块、再累加块内的一段，代价与块大小相当，与总条数基本无关。
+    """
+    BLOCK_SIZE = 512
+    
+    def __init__(self):
+        self.blocks = []
+        self.block_sums = []
+        # 各块起始的下标与累计值，第 valid_blocks 块起需重算
+        self.index_starts = []
+        self.value_starts = []
+        self.valid_blocks = 0
+        self.length = 0
+        self.total = 0
+    
+    def __len__(self):
+        return self.length
+    
+    def _refresh(self):
+        block_count = len(self.blocks)
+        if self.valid_blocks >= block_count:
+            return
+        del self.index_starts[self.valid_blocks:]
+        del self.value_starts[self.valid_blocks:]
+        if self.valid_blocks:
+            index = self.index_starts[-1] + len(self.blocks[self.valid_blocks - 1])
+            value = self.value_starts[-1] + self.block_sums[self.valid_blocks - 1]
+        else:
+            index = value = 0
+        for block_index in range(self.valid_blocks, block_count):
+            self.index_starts.append(index)
+            self.value_starts.append(value)
+            index += len(self.blocks[block_index])
+            value += self.block_sums[block_index]
+        self.valid_blocks = block_count
+    
+    def _locate(self, index):
+        """第 index 个数所在的 (块下标, 块内下标)；index 等于长度时返回最后一块的末尾"""
+        self._refresh()
+        block_index = max(bisect_right(self.index_starts, index) - 1, 0)
+        if index == self.length and self.blocks:
+            block_index = len(self.blocks) - 1
+        return block_index, index - self.index_starts[block_index]
+    
+    def __getitem__(self, index):
+        block_index, offset = self._locate(index)
+        return self.blocks[block_index][offset]
+    
+    def prefix(self, index):
+        """前 index 个数之和"""
+        if index >= self.length:
+            return self.total
+        block_index, offset = self._locate(index)
+        return self.value_starts[block_index] + sum(self.blocks[block_index][:offset])
+    
+    def find(self, value):
+        """累计值 value 落在第几个数上（满足 prefix(i) <= value < prefix(i + 1)），超出合计时返回 -1"""
+        if not 0 <= value < self.total:
+            return -1
+        self._refresh()
+        block_index = bisect_right(self.value_starts, value) - 1
+        value -= self.value_starts[block_index]
+        for offset, number in enumerate(self.blocks[block_index]):
+            if value < number:
+                return self.index_starts[block_index] + offset
+            value -= number
+        return -1
+    
+    def insert(self, index, numbers):
+        """在第 index 个数之前插入 numbers（array）"""
+        if not numbers:
+            return
+        if not self.blocks:
+            self.blocks.append(array(numbers.typecode))
+            self.block_sums.append(0)
+        block_index, offset = self._locate(index)
+        block = self.blocks[block_index]
+        block[offset:offset] = numbers
+        added = sum(numbers)
+        self.block_sums[block_index] += added
+        self.length += len(numbers)
+        self.total += added
+        if len(block) > self.BLOCK_SIZE * 2:
+            # 过大的块拆分为若干个 BLOCK_SIZE 大小的块
+            pieces = [block[start:start + self.BLOCK_SIZE] for start in range(0, len(block), self.BLOCK_SIZE)]
+            self.blocks[block_index:block_index + 1] = pieces
+            self.block_sums[block_index:block_index + 1] = [sum(piece) for piece in pieces]
+        self.valid_blocks = min(self.valid_blocks, block_index)
+    
+    def delete(self, index, count=1):
+        """删除从第 index 个起的 count 个数，返回被删除的数之和"""
+        count = min(count, self.length - index)
+        if count <= 0:
+            return 0
+        removed_total = 0
+        block_index, offset = self._locate(index)
+        first_block = block_index
+        while count > 0:
+            block = self.blocks[block_index]
+            taken = min(count, len(block) - offset)
+            removed = sum(block[offset:offset + taken])
+            del block[offset:offset + taken]
+            self.block_sums[block_index] -= removed
+            removed_total += removed
+            count -= taken
+            self.length -= taken
+            if block:
+                block_index += 1
+            else:
+                del self.blocks[block_index]
+                del self.block_sums[block_index]
+            offset = 0
+        self.total -= removed_total
+        self.valid_blocks = min(self.valid_blocks, first_block)
+        return removed_total
+
+class ScriptPreviewPane(ttk.LabelFrame):
+    """停靠在编辑界面右侧的实时脚本预览
+    
+    随内容的修改通知只改动受影响的行：每条内容在预览中所占的行数记在 BlockPrefixSums 中，
+    第 i 条的起始行号 = 头部行数 + 1 + 前 i 条的行数之和，点击时按行号反查条目，都无需逐条累加。
+    预览中始终是前若干条内容，条数很多时分批填入。
+    """
+    def __init__(self, parent, editor):
+        super().__init__(parent, text="脚本预览", style="Title.TLabelframe")
+        self.configure(padding=(10, 8))
+        self.editor = editor
+        self.header_lines = 1
+        self.has_character_dialog = False
+        self.line_counts = BlockPrefixSums()
+        self.fill_after_id = None
+        self.active = False
+        
+        frame_text = ttk.Frame(self)
+        frame_text.pack(fill="both", padx=5, pady=5, expand=True)
+        frame_text.rowconfigure(0, weight=1)
+        frame_text.columnconfigure(0, weight=1)
+        
+        self.txt_preview = tk.Text(
+            frame_text,
+            font=editor.base_font,
+            width=48,
+            bd=1,
+            relief="solid",
+            wrap="none",
+            state="disabled"
+        )
+        self.txt_preview.grid(row=0, column=0, sticky="nsew")
+        scrollbar_y = ttk.Scrollbar(frame_text, orient="vertical", command=self.txt_preview.yview)
+        scrollbar_y.grid(row=0, column=1, sticky="ns")
+        scrollbar_x = ttk.Scrollbar(frame_text, orient="horizontal", command=self.txt_preview.xview)
+        scrollbar_x.grid(row=1, column=0, sticky="ew")
+        self.txt_preview.config(yscrollcommand=scrollbar_y.set, xscrollcommand=scrollbar_x.set)
+        
+        self.txt_preview.tag_configure("selected_row", background="#d6e6f8")
+        self.txt_preview.bind("<Button-1>", self.on_click)
+    
+    def _row_text(self, index):
+        """第 index 条内容在预览中的文本与行数（未知类型不生成语句，占0行）"""
+        statement = build_say_statement(*self.editor.dialogues[index])
+        if statement is None:
+            return "", 0
+        return "    " + statement, statement.count("\n") + 1
+    
+    def _row_start(self, index):
+        return self.header_lines + 1 + self.line_counts.prefix(index)
+    
+    def _last_line(self):
+        return int(self.txt_preview.index("end-1c").split(".")[0])
+    
+    def _insert_rows(self, index, count):
+        texts = []
+        counts = array("I")
+        for position in range(index, index + count):
+            text, lines = self._row_text(position)
+            if lines:
+                texts.append(text)
+            counts.append(lines)
+        
+        if texts:
+            start = self._row_start(index)
+            if start <= self._last_line():
+                self.txt_preview.insert(f"{start}.0", "\n".join(texts) + "\n")
+            else:
+                # 插入到末尾：接在最后一行之后
+                self.txt_preview.insert("end-1c", "\n" + "\n".join(texts))
+        self.line_counts.insert(index, counts)
+    
+    def _delete_rows(self, index, count=1):
+        start = self._row_start(index)
+        lines = self.line_counts.delete(index, count)
+        if lines:
+            if start + lines - 1 < self._last_line():
+                self.txt_preview.delete(f"{start}.0", f"{start + lines}.0")
+            else:
+                # 删除末尾的行：连同前一行的换行符一起删除
+                self.txt_preview.delete(f"{start - 1}.end", f"{start + lines - 1}.end")
+    
+    def set_active(self, active):
+        """隐藏时不跟随修改，重新显示时整体重建"""
+        self.active = active
+        if active:
+            self.rebuild()
+        else:
+            self._cancel_fill()
+    
+    def _cancel_fill(self):
+        if self.fill_after_id is not None:
+            self.after_cancel(self.fill_after_id)
+            self.fill_after_id = None
+    
+    def rebuild(self):
+        if not self.active:
+            return
+        self._cancel_fill()
+        self.txt_preview.config(state="normal")
+        self.txt_preview.delete("1.0", tk.END)
+        self.line_counts = BlockPrefixSums()
+        self.header_lines = 1
+        self._update_header()
+        self.txt_preview.config(state="disabled")
+        self.fill()
+    
+    def _update_header(self):
+        """重写角色定义与 label 行（头部很短，整体替换）"""
+        self.has_character_dialog = self.editor.dialogues.count_type("character") > 0
+        header = render_script_header(self.editor.characters, self.editor.get_label_name(), self.has_character_dialog)
+        self.txt_preview.delete("1.0", f"{self.header_lines}.end")
+        self.txt_preview.insert("1.0", header)
+        self.header_lines = header.count("\n") + 1
+    
+    def update_header(self):
+        if not self.active:
+            return
+        self.txt_preview.config(state="normal")
+        self._update_header()
+        self.txt_preview.config(state="disabled")
+    
+    def update_label(self):
+        """场景名变化时只替换 label 行"""
+        if not self.active:
+            return
+        self.txt_preview.config(state="normal")
+        self.txt_preview.delete(f"{self.header_lines}.0", f"{self.header_lines}.end")
+        self.txt_preview.insert(f"{self.header_lines}.0", f"label {self.editor.get_label_name()}:")
+        self.txt_preview.config(state="disabled")
+    
+    def fill(self):
+        if not self.active or self.fill_after_id is not None:
+            return
+        remaining = len(self.editor.dialogues) - len(self.line_counts)
+        if remaining > CONTENT_SYNC_FILL_LIMIT:
+            self._fill_step()
+        elif remaining > 0:
+            self.txt_preview.config(state="normal")
+            self._insert_rows(len(self.line_counts), remaining)
+            self.txt_preview.config(state="disabled")
+    
+    def _fill_step(self):
+        self.fill_after_id = None
+        filled = len(self.line_counts)
+        count = min(CONTENT_FILL_BATCH, len(self.editor.dialogues) - filled)
+        if count > 0:
+            self.txt_preview.config(state="normal")
+            self._insert_rows(filled, count)
+            self.txt_preview.config(state="disabled")
+        if len(self.line_counts) < len(self.editor.dialogues):
+            self.fill_after_id = self.after(1, self._fill_step)
+    
+    def on_dialogues_changed(self, event, *args):
+        if not self.active:
+            return
+        if event == "clear":
+            self.rebuild()
+            return
+        
+        self.txt_preview.config(state="normal")
+        filled = len(self.line_counts)
+        if event == "insert":
+            index, count = args
+            if index < filled:
+                if count <= CONTENT_FILL_BATCH:
+                    self._insert_rows(index, count)
+                else:
+                    # 大批插入：从插入处起重新填充
+                    self._delete_rows(index, filled - index)
+        elif event == "delete":
+            if args[0] < filled:
+                self._delete_rows(args[0])
+        elif event == "delete_many":
+            # 从后往前删除各段，前面各段的下标不受影响
+            for index, count in reversed(index_runs(args[0])):
+                if index < filled:
+                    self._delete_rows(index, min(count, filled - index))
+        elif event == "move":
+            from_index, to_index = args
+            if from_index < filled:
+                self._delete_rows(from_index)
+            if to_index <= len(self.line_counts):
+                self._insert_rows(to_index, 1)
+        elif event == "swap":
+            for index in sorted(args):
+                if index < filled:
+                    self._delete_rows(index)
+                    self._insert_rows(index, 1)
+        
+        # 第一条角色对话加入或最后一条删除时，头部是否输出角色定义随之变化
+        if (self.editor.dialogues.count_type("character") > 0) != self.has_character_dialog:
+            self._update_header()
+        self.txt_preview.config(state="disabled")
+        self.fill()
+    
+    def highlight_row(self, index):
+        self.txt_preview.tag_remove("selected_row", "1.0", tk.END)
+        if not self.active or index < 0 or index >= len(self.line_counts) or not self.line_counts[index]:
+            return
+        start = self._row_start(index)
+        self.txt_preview.tag_add("selected_row", f"{start}.0", f"{start + self.line_counts[index]}.0")
+        self.txt_preview.see(f"{start}.0")
+    
+    def on_click(self, event):
+        """点击预览中的语句时在内容列表中选中对应的条目"""
+        offset = int(self.txt_preview.index(f"@{event.x},{event.y}").split(".")[0]) - self.header_lines - 1
+        index = self.line_counts.find(offset)
+        if index >= 0:
+            self.editor.select_content(index)
+
+class StatsWindow(tk.Toplevel):
+    """项目统计窗口（非模态，编辑时自动刷新）"""
+    COLUMNS = (
+        ("var_name", "角色变量名", 120),
+        ("display_name", "显示名称", 120),
+        ("lines", "条数", 70),
+        ("words", "词数", 80),
+        ("chars", "字数", 80),
+        ("ratio", "条数占比", 80),
+        ("read_time", "预计朗读时长", 110)
+    )
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("项目统计")
+        self.geometry("760x420")
+        self.minsize(600, 300)
+        self.configure(bg="#f0f0f0")
+        self.parent = parent
+        self.rows = []
+        
+        self.summary_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.summary_var, font=parent.base_font).pack(fill="x", padx=15, pady=(10, 0))
+        
+        frame_table = ttk.Frame(self)
+        frame_table.pack(fill="both", padx=15, pady=10, expand=True)
+        
+        self.tree = ttk.Treeview(frame_table, columns=[column[0] for column in self.COLUMNS], show="headings")
+        for name, heading, width in self.COLUMNS:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, anchor="w" if name in ("var_name", "display_name") else "e")
+        self.tree.pack(side="left", fill="both", expand=True)
+        
+        scrollbar = ttk.Scrollbar(frame_table, orient="vertical", command=self.tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.config(yscrollcommand=scrollbar.set)
+        
+        ttk.Button(self, text="导出CSV", command=self.export_csv, style="Custom.TButton").pack(pady=(0, 10))
+    
+    def update_rows(self, rows):
+        self.rows = rows
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert("", tk.END, values=(
+                row.var_name, row.display_name, row.lines, row.words, row.chars,
+                f"{row.ratio:.1%}", format_duration(row.read_seconds)
+            ))
+        
+        total = rows[-1]
+        narration = rows[-2]
+        self.summary_var.set(
+            f"共{total.lines}条内容，{total.words}词，旁白占{narration.ratio:.1%}，"
+            f"预计朗读时长{format_duration(total.read_seconds)}"
+        )
+    
+    def export_csv(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")],
+            title="导出统计",
+            parent=self
+        )
+        if not file_path:
+            return
+        
+        try:
+            # 带BOM的UTF-8，Excel可直接识别中文
+            with open(file_path, "w", encoding="utf-8-sig", newline="") as f:
+                csv.writer(f).writerow(STATS_CSV_HEADER)
+                write_stats_csv(f, self.rows)
+            messagebox.showinfo("成功", f"统计已导出到：\n{file_path}", parent=self)
+        except Exception as e:
+            messagebox.showerror("错误", f"导出失败：{str(e)}", parent=self)
+
+# 角色导入结果：新增数、更新数、重复跳过数、无效条目数、冲突列表[(变量名, 原显示名称, 导入的显示名称)]
+ImportReport = namedtuple("ImportReport", ["added", "updated", "duplicates", "invalid", "conflicts"])
+
+def iter_json_members(f, stream_keys=()):
+    """流式解析顶层为对象的JSON文件，逐个产出 (键, 值)
+    
+    文件按块读取，不会把整个文件载入内存。stream_keys 中的键对应的值必须是数组，
+    产出的值改为逐个解码数组元素的迭代器，需在继续遍历之前用完（未用完的元素会被跳过）。
+    格式错误时抛出 json.JSONDecodeError。
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    
+    def fill():
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = f.read(CONFIG_READ_CHUNK)
+        if not chunk:
+            eof = True
+            return False
+        if pos:
+            buffer = buffer[pos:]
+            pos = 0
+        buffer += chunk
+        return True
+    
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            pos = JSON_WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or not fill():
+                return
+    
+    def expect(chars):
+        nonlocal pos
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", buffer, pos)
+        pos += 1
+        return buffer[pos - 1]
+    
+    def decode_value():
+        nonlocal pos
+        skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # 数字等值可能被截断在块的末尾，读到更多内容后再确认
+            if end == len(buffer) and fill():
+                continue
+            pos = end
+            return value
+    
+    # 跳过可能存在的 UTF-8 BOM
+    fill()
+    if buffer.startswith("\ufeff"):
+        pos = 1
+    
+    def iter_items():
+        nonlocal pos
+        expect("[")
+        skip_whitespace()
+        if pos < len(buffer) and buffer[pos] == "]":
+            pos += 1
+            return
+        while True:
+            yield decode_value()
+            if expect(",]") == "]":
+                return
+    
+    expect("{")
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == "}":
+        return
+    while True:
+        key = decode_value()
+        expect(":")
+        if key in stream_keys:
+            items = iter_items()
+            yield key, items
+            # 调用方未读完的元素直接跳过
+            for item in items:
+                pass
+        else:
+            yield key, decode_value()
+        if expect(",}") == "}":
+            return
+
+def iter_config_characters(f):
+    """流式解析角色配置文件，逐个产出 "characters" 数组中的条目
+    
+    每个角色单独解码，不会把整个文件载入内存。
+    缺少 "characters" 数组时抛出 KeyError，格式错误时抛出 json.JSONDecodeError。
+    """
+    for key, value in iter_json_members(f, ("characters",)):
+        if key == "characters":
+            yield from value
+            return
+    raise KeyError("characters")
+
+def merge_characters(existing, incoming, mode):
+    """按导入模式把导入的角色与现有角色合并
+    
+    完全相同（变量名与显示名称都相同）的角色按哈希去重；变量名相同但显示名称不同的记为冲突，
+    合并/替换模式下以导入的显示名称为准，仅新增模式下保留现有角色。
+    返回 (合并后的角色列表, ImportReport)。
+    """
+    merged = [] if mode == IMPORT_MODE_REPLACE else [dict(char) for char in existing]
+    positions = {}
+    seen = set()
+    for position, char in enumerate(merged):
+        positions.setdefault(char.get("var_name"), position)
+        seen.add((char.get("var_name"), char.get("display_name")))
+    
+    added = updated = duplicates = invalid = 0
+    conflicts = []
+    for char in incoming:
+        if not isinstance(char, dict) or not isinstance(char.get("var_name"), str) or not char["var_name"].strip():
+            invalid += 1
+            continue
+        var_name = char["var_name"].strip()
+        display_name = str(char.get("display_name") or var_name)
+        key = (var_name, display_name)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        
+        position = positions.get(var_name)
+        if position is None:
+            positions[var_name] = len(merged)
+            merged.append({"var_name": var_name, "display_name": display_name})
+            added += 1
+            continue
+        
+        conflicts.append((var_name, merged[position]["display_name"], display_name))
+        if mode != IMPORT_MODE_ADD_NEW:
+            merged[position]["display_name"] = display_name
+            updated += 1
+    
+    return merged, ImportReport(added, updated, duplicates, invalid, conflicts)
+
+def format_import_report(report):
+    lines = [f"新增{report.added}个角色，更新{report.updated}个，跳过重复{report.duplicates}个"]
+    if report.invalid:
+        lines.append(f"忽略无效条目{report.invalid}个（缺少变量名）")
+    if report.conflicts:
+        lines.append(f"变量名冲突{len(report.conflicts)}个（变量名相同、显示名称不同）：")
+        for var_name, old_display, new_display in report.conflicts[:MAX_REPORTED_CONFLICTS]:
+            lines.append(f"  {var_name}：「{old_display}」 / 「{new_display}」")
+        if len(report.conflicts) > MAX_REPORTED_CONFLICTS:
+            lines.append(f"  ……另有{len(report.conflicts) - MAX_REPORTED_CONFLICTS}个冲突未列出")
+    return "\n".join(lines)
+
+class ImportModeDialog(tk.Toplevel):
+    """选择角色导入模式的对话框，确认后 result 为所选模式，取消为None"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("选择导入模式")
+        self.resizable(False, False)
+        self.configure(bg="#f0f0f0")
+        self.transient(parent)
+        self.result = None
+        self.mode_var = tk.StringVar(value=IMPORT_MODE_MERGE)
+        
+        frame_modes = ttk.LabelFrame(self, text="当前已有角色，请选择导入方式", padding=(10, 8))
+        frame_modes.pack(fill="x", padx=15, pady=10)
+        for mode, text in IMPORT_MODES:
+            ttk.Radiobutton(frame_modes, text=text, value=mode, variable=self.mode_var).pack(anchor="w", padx=5, pady=3)
+        
+        frame_ops = ttk.Frame(self)
+        frame_ops.pack(pady=(0, 10))
+        ttk.Button(frame_ops, text="导入", command=self.on_ok).grid(row=0, column=0, padx=10)
+        ttk.Button(frame_ops, text="取消", command=self.destroy).grid(row=0, column=1, padx=10)
+        
+        self.bind("<Return>", lambda event: self.on_ok())
+        self.bind("<Escape>", lambda event: self.destroy())
+        self.grab_set()
+    
+    def on_ok(self):
+        self.result = self.mode_var.get()
+        self.destroy()
+    
+    @classmethod
+    def ask(cls, parent):
+        dialog = cls(parent)
+        parent.wait_window(dialog)
+        return dialog.result
+
+class LabelChooserDialog(tk.Toplevel):
+    """选择分片项目中要编辑的场景，也可输入新场景名；确认后 result 为场景名，取消为None"""
+    def __init__(self, parent, label_names, current_label):
+        super().__init__(parent)
+        self.title("选择场景")
+        self.resizable(False, False)
+        self.configure(bg="#f0f0f0")
+        self.transient(parent)
+        self.result = None
+        self.label_var = tk.StringVar(value=current_label)
+        
+        frame_labels = ttk.LabelFrame(self, text="选择要编辑的场景（输入新名称则新建场景）", padding=(10, 8))
+        frame_labels.pack(fill="x", padx=15, pady=10)
+        combobox = ttk.Combobox(frame_labels, textvariable=self.label_var, values=label_names, width=40)
+        combobox.pack(fill="x", padx=5, pady=3)
+        combobox.focus_set()
+        
+        frame_ops = ttk.Frame(self)
+        frame_ops.pack(pady=(0, 10))
+        ttk.Button(frame_ops, text="确定", command=self.on_ok).grid(row=0, column=0, padx=10)
+        ttk.Button(frame_ops, text="取消", command=self.destroy).grid(row=0, column=1, padx=10)
+        
+        self.bind("<Return>", lambda event: self.on_ok())
+        self.bind("<Escape>", lambda event: self.destroy())
+        self.grab_set()
+    
+    def on_ok(self):
+        label_name = self.label_var.get().strip()
+        if not label_name:
+            messagebox.showwarning("警告", "场景名称不能为空！", parent=self)
+            return
+        self.result = label_name
+        self.destroy()
+    
+    @classmethod
+    def ask(cls, parent, label_names, current_label):
+        dialog = cls(parent, label_names, current_label)
+        parent.wait_window(dialog)
+        return dialog.result
+
+class ConfigWindow(tk.Toplevel):
+    """角色配置文件编辑窗口"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("角色配置文件编辑")
+        self.geometry("550x600")
+        self.minsize(550, 600)
+        self.resizable(True, True)
+        self.configure(bg="#f0f0f0")
+        self.parent = parent
+        
+        self.config_characters = []
+        
+        self.base_font = font.Font(family="Microsoft YaHei", size=11)
+        self.title_font = font.Font(family="Microsoft YaHei", size=12, weight="bold")
+        
+        self._init_ui()
+    
+    def _init_ui(self):
+        lbl_title = ttk.Label(self, text="角色配置管理", font=self.title_font)
+        lbl_title.pack(pady=10)
+        
+        frame_list = ttk.LabelFrame(self, text="角色列表", padding=(10, 8))
+        frame_list.pack(fill="both", padx=15, pady=5, expand=True)
+        
+        self.lb_config_chars = tk.Listbox(
+            frame_list,
+            font=self.base_font,
+            width=50,
+            height=15,
+            bd=1,
+            relief="solid",
+            selectbackground="#4a90e2",
+            selectforeground="white"
+        )
+        self.lb_config_chars.pack(side="left", fill="both", padx=5, pady=5, expand=True)
+        
+        scrollbar = ttk.Scrollbar(frame_list, orient="vertical", command=self.lb_config_chars.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.lb_config_chars.config(yscrollcommand=scrollbar.set)
+        
+        frame_input = ttk.LabelFrame(self, text="角色信息编辑", padding=(10, 8))
+        frame_input.pack(fill="x", padx=15, pady=5)
+        
+        ttk.Label(frame_input, text="角色变量名（预定义值，仅字母/数字/下划线）：", font=self.base_font).grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.entry_var_name = ttk.Entry(frame_input, font=self.base_font, width=25)
+        self.entry_var_name.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        
+        ttk.Label(frame_input, text="角色显示名称（可中文）：", font=self.base_font).grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.entry_display_name = ttk.Entry(frame_input, font=self.base_font, width=25)
+        self.entry_display_name.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        
+        frame_input.columnconfigure(1, weight=1)
+        
+        frame_ops = ttk.Frame(self, padding=(10, 8))
+        frame_ops.pack(fill="x", padx=15, pady=5)
+        
+        btn_style = ttk.Style()
+        btn_style.configure("Config.TButton", font=self.base_font, padding=(8, 4))
+        
+        btn_add = ttk.Button(frame_ops, text="添加角色", command=self.add_character, style="Config.TButton")
+        btn_add.grid(row=0, column=0, padx=10, pady=5)
+        
+        btn_del = ttk.Button(frame_ops, text="删除选中角色", command=self.delete_character, style="Config.TButton")
+        btn_del.grid(row=0, column=1, padx=10, pady=5)
+        
+        btn_save_config = ttk.Button(frame_ops, text="保存配置文件", command=self.save_config, style="Config.TButton")
+        btn_save_config.grid(row=1, column=0, padx=10, pady=5)
+        
+        btn_import_to_editor = ttk.Button(frame_ops, text="导入到编辑界面", command=self.import_to_editor, style="Config.TButton")
+        btn_import_to_editor.grid(row=1, column=1, padx=10, pady=5)
+        
+        frame_ops.columnconfigure(0, weight=1)
+        frame_ops.columnconfigure(1, weight=1)
+    
+    def add_character(self):
+        var_name = self.entry_var_name.get().strip()
+        display_name = self.entry_display_name.get().strip()
+        
+        if not var_name:
+            messagebox.showwarning("警告", "角色变量名不能为空！", parent=self)
+            return
+        if not VAR_NAME_PATTERN.match(var_name):
+            messagebox.showwarning("警告", "变量名仅允许字母、数字、下划线，且不能以数字开头，禁止中文！", parent=self)
+            return
+        for char in self.config_characters:
+            if char["var_name"] == var_name:
+                messagebox.showinfo("提示", f"变量名「{var_name}」已存在！", parent=self)
+                return
+        
+        if not display_name:
+            display_name = var_name
+        
+        self.config_characters.append({
+            "var_name": var_name,
+            "display_name": display_name
+        })
+        display_text = f"{var_name} - {display_name}"
+        self.lb_config_chars.insert(tk.END, display_text)
+        
+        self.entry_var_name.delete(0, tk.END)
+        self.entry_display_name.delete(0, tk.END)
+    
+    def delete_character(self):
+        selected_index = self.lb_config_chars.curselection()
+        if not selected_index:
+            messagebox.showwarning("警告", "请先选中要删除的角色！", parent=self)
+            return
+        
+        selected_index = selected_index[0]
+        char_info = self.config_characters[selected_index]
+        if messagebox.askyesno("确认", f"是否删除角色「{char_info['var_name']} - {char_info['display_name']}」？", parent=self):
+            del self.config_characters[selected_index]
+            self.lb_config_chars.delete(selected_index)
+    
+    def save_config(self):
+        if not self.config_characters:
+            messagebox.showwarning("警告", "请先添加至少一个角色！", parent=self)
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("角色配置文件", "*.json"), *COMPRESSED_FILE_TYPES, ("所有文件", "*.*")],
+            title="保存角色配置文件",
+            parent=self
+        )
+        if not file_path:
+            return
+        
+        config_data = {"characters": self.config_characters}
+        try:
+            with open_data_file(file_path, "w") as f:
+                if self.parent.compact_json.get():
+                    json.dump(config_data, f, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+                else:
+                    json.dump(config_data, f, ensure_ascii=False, indent=4)
+            messagebox.showinfo("成功", f"配置文件已保存到：\n{file_path}", parent=self)
+        except Exception as e:
+            messagebox.showerror("错误", f"保存失败：{str(e)}", parent=self)
+    
+    def import_to_editor(self):
+        if not self.config_characters:
+            messagebox.showwarning("警告", "请先添加至少一个角色！", parent=self)
+            return
+        
+        mode = IMPORT_MODE_REPLACE
+        if self.parent.characters:
+            mode = ImportModeDialog.ask(self)
+            if mode is None:
+                return
+        
+        merged, report = merge_characters(self.parent.characters, self.config_characters, mode)
+        self.parent.set_characters(merged)
+        messagebox.showinfo("成功", "已导入角色到编辑界面！\n" + format_import_report(report), parent=self)
+        self.destroy()
+
+class StartWindow(tk.Toplevel):
+    """开始界面窗口"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Ren'Py脚本生成工具 - 开始界面")
+        self.geometry("500x400")
+        self.minsize(500, 400)
+        self.resizable(False, False)
+        self.configure(bg="#f0f0f0")
+        self.parent = parent
+        
+        parent.withdraw()
+        
+        self.base_font = font.Font(family="Microsoft YaHei", size=12)
+        self.title_font = font.Font(family="Microsoft YaHei", size=16, weight="bold")
+        
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        self._init_ui()
+    
+    def _init_ui(self):
+        lbl_title = ttk.Label(self, text="Ren'Py 对话脚本生成工具", font=self.title_font)
+        lbl_title.pack(pady=50)
+        
+        frame_buttons = ttk.Frame(self)
+        frame_buttons.pack(pady=20)
+        
+        btn_style = ttk.Style()
+        btn_style.configure("Start.TButton", font=self.base_font, padding=(15, 10), width=22)
+        
+        btn_new_file = ttk.Button(frame_buttons, text="新建脚本文件", command=self.new_script_file, style="Start.TButton")
+        btn_new_file.pack(pady=10)
+        
+        btn_open_file = ttk.Button(frame_buttons, text="打开临时脚本文件", command=self.open_script_file, style="Start.TButton")
+        btn_open_file.pack(pady=10)
+        
+        btn_new_config = ttk.Button(frame_buttons, text="新建角色配置文件", command=self.new_config_file, style="Start.TButton")
+        btn_new_config.pack(pady=10)
+    
+    def new_script_file(self):
+        self.parent.reset_editor()
+        self.parent.deiconify()
+        self.destroy()
+    
+    def open_script_file(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[
+                ("临时脚本文件", "*.json *.json.gz *.json.xz"),
+                *PROJECT_DB_FILE_TYPES,
+                *SHARDED_PROJECT_FILE_TYPES,
+                ("所有文件", "*.*")
+            ],
+            title="打开临时脚本文件",
+            parent=self
+        )
+        if not file_path:
+            return
+        if file_path.lower().endswith(PROJECT_DB_SUFFIX):
+            if self.parent.open_project_db(file_path, parent=self):
+                self.parent.deiconify()
+                self.destroy()
+            return
+        if file_path.lower().endswith(SHARDED_PROJECT_SUFFIX):
+            if self.parent.open_sharded_project(file_path, parent=self):
+                self.parent.deiconify()
+                self.destroy()
+            return
+        
+        try:
+            with open_data_file(file_path) as f:
+                temp_data = read_temp_data(f)
+            
+            required_keys = ["characters", "current_label", "dialogues"]
+            if not all(key in temp_data for key in required_keys):
+                messagebox.showerror("错误", "文件格式错误，不是有效的临时脚本文件！", parent=self)
+                return
+            
+            self.parent.load_temp_data(temp_data, file_path)
+            self.parent.deiconify()
+            self.destroy()
+        except json.JSONDecodeError:
+            messagebox.showerror("错误", "文件损坏，无法解析！", parent=self)
+        except Exception as e:
+            messagebox.showerror("错误", f"打开失败：{str(e)}", parent=self)
+    
+    def new_config_file(self):
+        config_win = ConfigWindow(self.parent)
+        config_win.grab_set()
+    
+    def on_close(self):
+        self.parent.destroy()
+        self.destroy()
+
+class RenPyScriptGenerator(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("Ren'Py 对话脚本生成工具 - 编辑界面")
+        self.geometry("1400x780")
+        self.minsize(900, 700)
+        self.resizable(True, True)
+        self.configure(bg="#f0f0f0")
+        
+        self.drag_item = None
+        self.drag_index = -1
+        self.drag_pointer_y = 0
+        self.drag_after_id = None
+        
+        self.characters = []
+        self.dialogues = DialogueStore()
+        self.current_label = tk.StringVar(value="start")
+        
+        # 上次生成翻译文件时输入的语言
+        self.translation_languages = []
+        
+        # 内容列表：每条内容的单行摘要按条目缓存
+        self.display_width = DISPLAY_TEXT_WIDTH
+        self.summary_cache = {}
+        self.tooltip_window = None
+        self.tooltip_after_id = None
+        self.tooltip_index = -1
+        
+        # 工作区全文索引：当前项目文件路径、工作区目录
+        self.project_path = None
+        self.workspace_dir = None
+        self.search_window = None
+        
+        # 项目数据库（.rpyproj）：打开后所有编辑直接提交到数据库
+        self.project_db = None
+        # 分片项目（.rpyshards）：编辑在内存中进行，保存时只重写有修改的分片
+        self.sharded_project = None
+        
+        # 项目统计：首次打开统计窗口时完整统计一次，之后随修改增量更新
+        self.stats = None
+        self.stats_window = None
+        self.stats_after_id = None
+        
+        # 快速录入：状态栏提示的定时器、可撤销的删除记录
+        self.status_after_id = None
+        self.undo_stack = deque(maxlen=UNDO_LIMIT)
+        # 删除与撤销删除自身引起的修改不使内容的撤销记录失效，其他修改会使其下标过期
+        self.recording_undo = False
+        
+        # 后台生成脚本
+        self.render_queue = queue.Queue()
+        self.render_thread = None
+        
+        # 后台项目检查
+        self.linter = ProjectLinter()
+        self.lint_queue = queue.Queue()
+        self.lint_thread = None
+        self.lint_pending = False
+        self.lint_after_id = None
+        self.lint_result = ([], 0, 0)
+        self.lint_window = None
+        
+        self.init_fonts()
+        self.protocol("WM_DELETE_WINDOW", self.on_window_close)
+        self._init_ui()
+        self.dialogues.add_listener(self.on_dialogues_changed)
+        self.linter.attach(self.dialogues)
+        self.preview_pane.set_active(self.show_preview.get())
+        self.current_label.trace_add("write", lambda *args: self.on_label_changed())
+        self.start_window = StartWindow(self)
+    
+    def init_fonts(self):
+        self.base_font = font.Font(family="Microsoft YaHei", size=11)
+        self.title_font = font.Font(family="Microsoft YaHei", size=12, weight="bold")
+        self.btn_font = font.Font(family="Microsoft YaHei", size=11)
+        
+        tk.TkDefaultFont = self.base_font
+        ttk.Style().configure('.', font=self.base_font)
+    
+    def _init_ui(self):
+        """初始化编辑界面布局（按钮移至上方+文本框新增滚动条）"""
+        # ========== 菜单栏 ==========
+        self.compact_json = tk.BooleanVar(value=False)
+        self.rapid_entry = tk.BooleanVar(value=False)
+        self.show_preview = tk.BooleanVar(value=True)
+        
+        menubar = tk.Menu(self)
+        self.menu_file = tk.Menu(menubar, tearoff=0)
+        self.menu_file.add_command(label="打开项目数据库…", command=self.open_project_db)
+        self.menu_file.add_command(label="另存为项目数据库…", command=self.save_as_project_db)
+        self.menu_file.add_separator()
+        self.menu_file.add_command(label="打开分片项目…", command=self.open_sharded_project)
+        self.menu_file.add_command(label="保存", accelerator="Ctrl+S", command=self.save_project)
+        self.menu_file.add_command(label="另存为分片项目…", command=self.save_as_sharded_project)
+        self.menu_file.add_command(label="切换场景（分片项目）…", command=self.switch_shard_label)
+        self.menu_file.add_separator()
+        self.menu_file.add_command(label="从表格导入台本（CSV/TSV）…", command=self.import_sheet)
+        self.menu_file.add_command(label="导出为表格（CSV/TSV）…", command=self.export_sheet)
+        menubar.add_cascade(label="文件", menu=self.menu_file)
+        
+        self.menu_edit = tk.Menu(menubar, tearoff=0)
+        self.menu_edit.add_command(label="撤销删除", accelerator="Ctrl+Z", command=self.undo_delete)
+        self.menu_edit.add_command(label="删除选中内容", accelerator="Delete", command=self.delete_content)
+        menubar.add_cascade(label="编辑", menu=self.menu_edit)
+        
+        self.menu_settings = tk.Menu(menubar, tearoff=0)
+        self.menu_settings.add_checkbutton(label="快速录入模式（不弹出提示框）", variable=self.rapid_entry)
+        self.menu_settings.add_checkbutton(label="显示脚本预览", variable=self.show_preview, command=self.toggle_preview)
+        self.menu_settings.add_checkbutton(label="保存为紧凑JSON（不缩进）", variable=self.compact_json)
+        self.menu_settings.add_command(label="内容列表显示宽度…", command=self.ask_display_width)
+        menubar.add_cascade(label="设置", menu=self.menu_settings)
+        
+        self.menu_tools = tk.Menu(menubar, tearoff=0)
+        self.menu_tools.add_command(label="在工作区中查找…", accelerator="Ctrl+Shift+F", command=self.show_workspace_search)
+        self.menu_tools.add_command(label="项目统计…", command=self.show_stats)
+        menubar.add_cascade(label="工具", menu=self.menu_tools)
+        self.bind_all("<Control-Shift-F>", lambda event: self.show_workspace_search())
+        self.bind_all("<Control-Shift-f>", lambda event: self.show_workspace_search())
+        self.bind("<Control-s>", lambda event: self.save_project())
+        self.config(menu=menubar)
+        
+        # ========== 顶部：场景设置区 ==========
+        frame_label = ttk.LabelFrame(self, text="场景设置（Label标签）", style="Title.TLabelframe")
+        frame_label.pack(fill="x", padx=15, pady=8)
+        frame_label.configure(padding=(10, 8))
+        
+        lbl_label = ttk.Label(frame_label, text="场景名称：", font=self.base_font)
+        lbl_label.grid(row=0, column=0, padx=8, pady=8)
+        
+        self.entry_label = ttk.Entry(frame_label, textvariable=self.current_label, font=self.base_font)
+        self.entry_label.grid(row=0, column=1, padx=8, pady=8, sticky="ew")
+        self.entry_label.configure(width=50)
+        frame_label.columnconfigure(1, weight=1)
+        
+        # ========== 顶部：操作按钮区（移至此处） ==========
+        frame_buttons = ttk.Frame(self)
+        frame_buttons.pack(fill="x", padx=15, pady=8)
+        
+        btn_style = ttk.Style()
+        btn_style.configure("Custom.TButton", font=self.btn_font, padding=(8, 4))
+        
+        btn_new = ttk.Button(
+            frame_buttons, 
+            text="新建脚本", 
+            command=self.new_script,
+            style="Custom.TButton"
+        )
+        btn_new.grid(row=0, column=0, padx=8, pady=5)
+        
+        btn_save_temp = ttk.Button(
+            frame_buttons, 
+            text="保存临时文件", 
+            command=self.save_temp_file,
+            style="Custom.TButton"
+        )
+        btn_save_temp.grid(row=0, column=1, padx=8, pady=5)
+        
+        btn_open_temp = ttk.Button(
+            frame_buttons, 
+            text="打开临时文件", 
+            command=self.open_temp_file,
+            style="Custom.TButton"
+        )
+        btn_open_temp.grid(row=0, column=2, padx=8, pady=5)
+        
+        btn_generate = ttk.Button(
+            frame_buttons, 
+            text="生成Ren'Py脚本", 
+            command=self.generate_script,
+            style="Custom.TButton"
+        )
+        btn_generate.grid(row=0, column=3, padx=8, pady=5)
+        
+        btn_save = ttk.Button(
+            frame_buttons, 
+            text="保存脚本文件", 
+            command=self.save_script,
+            style="Custom.TButton"
+        )
+        btn_save.grid(row=0, column=4, padx=8, pady=5)
+        
+        btn_translate = ttk.Button(
+            frame_buttons, 
+            text="生成翻译文件", 
+            command=self.generate_translations,
+            style="Custom.TButton"
+        )
+        btn_translate.grid(row=0, column=5, padx=8, pady=5)
+        
+        # ========== 底部：状态栏 ==========
+        frame_status = ttk.Frame(self)
+        frame_status.pack(side="bottom", fill="x", padx=15, pady=(0, 6))
+        
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(frame_status, textvariable=self.status_var, font=self.base_font).pack(side="left")
+        
+        self.lint_status_var = tk.StringVar(value="项目检查：无问题")
+        self.lbl_lint_status = tk.Label(
+            frame_status,
+            textvariable=self.lint_status_var,
+            font=self.base_font,
+            bg="#f0f0f0",
+            cursor="hand2"
+        )
+        self.lbl_lint_status.pack(side="right")
+        self.lbl_lint_status.bind("<Button-1>", lambda event: self.show_lint_report())
+        
+        # ========== 主体容器 ==========
+        main_frame = ttk.Frame(self)
+        main_frame.pack(fill="both", padx=15, pady=8, expand=True)
+        
+        # ========== 左侧：角色管理区 ==========
+        frame_char = ttk.LabelFrame(main_frame, text="角色管理", style="Title.TLabelframe")
+        frame_char.pack(side="left", fill="y", padx=(0, 10), pady=0, ipady=8)
+        frame_char.configure(width=260, padding=(10, 8))
+        
+        self.lb_characters = tk.Listbox(
+            frame_char, 
+            font=self.base_font,
+            width=30, 
+            height=15,
+            bd=1,
+            relief="solid",
+            selectbackground="#4a90e2",
+            selectforeground="white"
+        )
+        self.lb_characters.pack(padx=8, pady=8)
+        
+        frame_char_input = ttk.LabelFrame(frame_char, text="新增角色", padding=(8, 6))
+        frame_char_input.pack(padx=8, pady=5, fill="x")
+        
+        ttk.Label(frame_char_input, text="变量名（预定义值）：", font=self.base_font).pack(padx=5, pady=3, fill="x")
+        self.entry_var_name = ttk.Entry(frame_char_input, font=self.base_font, width=25)
+        self.entry_var_name.pack(padx=5, pady=3, fill="x")
+        
+        ttk.Label(frame_char_input, text="显示名称：", font=self.base_font).pack(padx=5, pady=3, fill="x")
+        self.entry_display_name = ttk.Entry(frame_char_input, font=self.base_font, width=25)
+        self.entry_display_name.pack(padx=5, pady=3, fill="x")
+        
+        frame_char_btns = ttk.Frame(frame_char)
+        frame_char_btns.pack(padx=8, pady=5, fill="x")
+        
+        btn_add_char = ttk.Button(
+            frame_char_btns, 
+            text="添加角色", 
+            command=self.add_character,
+            style="Custom.TButton"
+        )
+        btn_add_char.pack(padx=5, pady=3, fill="x")
+        
+        btn_del_char = ttk.Button(
+            frame_char_btns, 
+            text="删除选中角色", 
+            command=self.delete_character,
+            style="Custom.TButton"
+        )
+        btn_del_char.pack(padx=5, pady=3, fill="x")
+        
+        btn_import_config = ttk.Button(
+            frame_char_btns,
+            text="从配置文件导入角色",
+            command=self.import_from_config,
+            style="Custom.TButton"
+        )
+        btn_import_config.pack(padx=5, pady=3, fill="x")
+        
+        # ========== 最右侧：脚本预览 ==========
+        self.preview_pane = ScriptPreviewPane(main_frame, self)
+        self.preview_pane.pack(side="right", fill="both", padx=(10, 0), pady=0, expand=True)
+        
+        # ========== 右侧：内容编辑+列表区 ==========
+        right_frame = ttk.Frame(main_frame)
+        right_frame.pack(side="right", fill="both", expand=True)
+        self.right_frame = right_frame
+        
+        # ========== 右侧上半：内容编辑区（文本框新增滚动条） ==========
+        frame_content_edit = ttk.LabelFrame(right_frame, text="内容编辑", style="Title.TLabelframe")
+        frame_content_edit.pack(fill="x", padx=0, pady=0)
+        frame_content_edit.configure(padding=(10, 8))
+        
+        # 角色对话子区域（文本框新增滚动条）
+        frame_character_dialog = ttk.LabelFrame(frame_content_edit, text="角色对话", style="Sub.TLabelframe")
+        frame_character_dialog.pack(fill="x", padx=5, pady=5)
+        
+        ttk.Label(frame_character_dialog, text="选择角色：", font=self.base_font).grid(row=0, column=0, padx=8, pady=8)
+        
+        self.cb_character = ttk.Combobox(
+            frame_character_dialog, 
+            state="readonly",
+            font=self.base_font,
+            width=35
+        )
+        self.cb_character.grid(row=0, column=1, columnspan=2, padx=8, pady=8, sticky="ew")
+        
+        ttk.Label(frame_character_dialog, text="对话内容：", font=self.base_font).grid(row=1, column=0, padx=8, pady=8, sticky="n")
+        
+        # 角色对话文本框+滚动条容器
+        frame_char_dialog_text = ttk.Frame(frame_character_dialog)
+        frame_char_dialog_text.grid(row=1, column=1, columnspan=2, padx=8, pady=8, sticky="nsew")
+        
+        self.txt_character_dialog = tk.Text(
+            frame_char_dialog_text, 
+            font=self.base_font,
+            height=4,
+            width=50,
+            bd=1,
+            relief="solid"
+        )
+        self.txt_character_dialog.pack(side="left", fill="both", expand=True)
+        
+        # 新增角色对话滚动条
+        scrollbar_char_dialog = ttk.Scrollbar(frame_char_dialog_text, orient="vertical", command=self.txt_character_dialog.yview)
+        scrollbar_char_dialog.pack(side="right", fill="y")
+        self.txt_character_dialog.config(yscrollcommand=scrollbar_char_dialog.set)
+        
+        btn_add_character_dialog = ttk.Button(
+            frame_character_dialog, 
+            text="添加角色对话", 
+            command=self.add_character_dialogue,
+            style="Custom.TButton"
+        )
+        btn_add_character_dialog.grid(row=2, column=0, columnspan=3, pady=8)
+        
+        frame_character_dialog.columnconfigure(1, weight=1)
+        
+        # 旁白子区域（文本框新增滚动条）
+        frame_narration = ttk.LabelFrame(frame_content_edit, text="旁白内容", style="Sub.TLabelframe")
+        frame_narration.pack(fill="x", padx=5, pady=5)
+        
+        ttk.Label(frame_narration, text="旁白文本：", font=self.base_font).grid(row=0, column=0, padx=8, pady=8, sticky="n")
+        
+        # 旁白文本框+滚动条容器
+        frame_narration_text = ttk.Frame(frame_narration)
+        frame_narration_text.grid(row=0, column=1, columnspan=2, padx=8, pady=8, sticky="nsew")
+        
+        self.txt_narration = tk.Text(
+            frame_narration_text, 
+            font=self.base_font,
+            height=4,
+            width=50,
+            bd=1,
+            relief="solid"
+        )
+        self.txt_narration.pack(side="left", fill="both", expand=True)
+        
+        # 新增旁白滚动条
+        scrollbar_narration = ttk.Scrollbar(frame_narration_text, orient="vertical", command=self.txt_narration.yview)
+        scrollbar_narration.pack(side="right", fill="y")
+        self.txt_narration.config(yscrollcommand=scrollbar_narration.set)
+        
+        btn_add_narration = ttk.Button(
+            frame_narration, 
+            text="添加旁白", 
+            command=self.add_narration,
+            style="Custom.TButton"
+        )
+        btn_add_narration.grid(row=1, column=0, columnspan=3, pady=8)
+        
+        frame_narration.columnconfigure(1, weight=1)
+        
+        # ========== 右侧下半：内容列表+排序按钮 ==========
+        frame_dialog_list = ttk.LabelFrame(right_frame, text="内容列表（可拖动排序）", style="Title.TLabelframe")
+        frame_dialog_list.pack(fill="both", padx=0, pady=8, expand=True)
+        frame_dialog_list.configure(padding=(10, 8))
+        
+        frame_sort_btns = ttk.Frame(frame_dialog_list)
+        frame_sort_btns.pack(fill="x", padx=5, pady=5)
+        
+        btn_move_up = ttk.Button(
+            frame_sort_btns, 
+            text="上移选中项", 
+            command=self.move_item_up,
+            style="Custom.TButton"
+        )
+        btn_move_up.pack(side="left", padx=5, pady=2)
+        
+        btn_move_down = ttk.Button(
+            frame_sort_btns, 
+            text="下移选中项", 
+            command=self.move_item_down,
+            style="Custom.TButton"
+        )
+        btn_move_down.pack(side="left", padx=5, pady=2)
+        
+        btn_del_dialog = ttk.Button(
+            frame_sort_btns, 
+            text="删除选中内容", 
+            command=self.delete_content,
+            style="Custom.TButton"
+        )
+        btn_del_dialog.pack(side="left", padx=5, pady=2)
+        
+        self.lb_contents = VirtualListbox(
+            frame_dialog_list,
+            lambda: len(self.dialogues),
+            self.get_content_rows,
+            font=self.base_font,
+            width=65,
+            height=15,
+            bd=1,
+            relief="solid",
+            selectmode=tk.EXTENDED,
+            selectbackground="#4a90e2",
+            selectforeground="white"
+        )
+        self.lb_contents.pack(side="left", fill="both", padx=5, pady=5, expand=True)
+        
+        scrollbar = ttk.Scrollbar(
+            frame_dialog_list, 
+            orient="vertical", 
+            command=self.lb_contents.yview
+        )
+        scrollbar.pack(side="right", fill="y", padx=0, pady=5)
+        self.lb_contents.config(yscrollcommand=scrollbar.set)
+        
+        # 拖动时的插入位置指示线（代替逐次修改选中项）
+        self.drop_indicator = tk.Frame(self.lb_contents, height=2, bg="#e94e3c")
+        
+        self.lb_contents.bind("<ButtonPress-1>", self.on_drag_start)
+        self.lb_contents.bind("<B1-Motion>", self.on_drag_motion)
+        self.lb_contents.bind("<ButtonRelease-1>", self.on_drag_end)
+        self.lb_contents.bind("<Motion>", self.on_contents_hover)
+        self.lb_contents.bind("<Leave>", self.hide_content_tooltip)
+        self.lb_contents.bind("<<ListboxSelect>>", lambda event: self.sync_preview_selection())
+        
+        # 快速录入快捷键：Ctrl+Enter提交当前文本框，Alt+1~9选择角色，Alt+0切换到旁白，Delete删除，Ctrl+Z撤销删除
+        self.txt_character_dialog.bind("<Control-Return>", lambda event: self.submit_from_text(self.add_character_dialogue))
+        self.txt_narration.bind("<Control-Return>", lambda event: self.submit_from_text(self.add_narration))
+        for number in range(1, 10):
+            self.bind(f"<Alt-Key-{number}>", lambda event, index=number - 1: self.select_speaker(index))
+        self.bind("<Alt-Key-0>", lambda event: self.txt_narration.focus_set())
+        self.lb_contents.bind("<Delete>", lambda event: self.delete_content())
+        self.lb_characters.bind("<Delete>", lambda event: self.delete_character())
+        self.bind("<Control-z>", self.on_undo_key)
+        
+        self._init_styles()
+    
+    def _init_styles(self):
+        style = ttk.Style()
+        
+        style.configure(".", background="#f0f0f0", font=self.base_font)
+        
+        style.configure(
+            "Title.TLabelframe",
+            font=self.title_font,
+            padding=(10, 8),
+            background="#f0f0f0"
+        )
+        style.configure(
+            "Title.TLabelframe.Label",
+            font=self.title_font,
+            background="#f0f0f0"
+        )
+        
+        style.configure(
+            "Sub.TLabelframe",
+            font=self.base_font,
+            padding=(8, 6),
+            background="#f0f0f0"
+        )
+        style.configure(
+            "Sub.TLabelframe.Label",
+            font=self.base_font,
+            background="#f0f0f0"
+        )
+        
+        style.configure(
+            "Custom.TButton",
+            font=self.btn_font,
+            padding=(8, 4),
+            relief="flat",
+            background="#4a90e2",
+            foreground="white"
+        )
+        style.map(
+            "Custom.TButton",
+            background=[("active", "#357abd"), ("pressed", "#28598f")]
+        )
+    
+    def set_characters(self, characters):
+        """整体替换角色列表（角色列表一次性批量插入）"""
+        self.characters = characters
+        self.lb_characters.delete(0, tk.END)
+        if characters:
+            self.lb_characters.insert(tk.END, *[f"{char['var_name']} - {char['display_name']}" for char in characters])
+        self.update_character_combobox()
+        # 显示名称可能变化，同步内容列表中的角色名
+        if self.dialogues.count_type("character"):
+            self.lb_contents.refresh()
+        self.save_project_characters()
+        self.schedule_lint()
+    
+    def update_character_combobox(self):
+        char_options = [f"{c['var_name']} - {c['display_name']}" for c in self.characters]
+        self.cb_character['values'] = char_options
+        if char_options:
+            self.cb_character.current(0)
+        else:
+            self.cb_character.set("")
+        # 角色增删改都会经过这里，统计表与预览中的角色定义同步刷新
+        self.schedule_stats_refresh()
+        self.preview_pane.update_header()
+    
+    def reset_editor(self):
+        self.detach_project_db()
+        self.detach_sharded_project()
+        # 翻译摘要缓存只对当前项目有用
+        cached_translation_digest.cache_clear()
+        self.undo_stack.clear()
+        self.characters.clear()
+        self.dialogues.clear()
+        self.current_label.set("start")
+        self.lb_characters.delete(0, tk.END)
+        self.entry_var_name.delete(0, tk.END)
+        self.entry_display_name.delete(0, tk.END)
+        self.txt_character_dialog.delete("1.0", tk.END)
+        self.txt_narration.delete("1.0", tk.END)
+        self.update_character_combobox()
+        self.project_path = None
+    
+    def load_temp_data(self, temp_data, file_path=None):
+        self.reset_editor()
+        self.project_path = file_path
+        if file_path and not self.workspace_dir:
+            self.workspace_dir = os.path.dirname(os.path.abspath(file_path))
+        
+        self.characters = temp_data["characters"]
+        for char in self.characters:
+            display_text = f"{char['var_name']} - {char['display_name']}"
+            self.lb_characters.insert(tk.END, display_text)
+        
+        self.current_label.set(temp_data["current_label"])
+        
+        self.dialogues.extend(temp_data["dialogues"])
+        
+        self.update_character_combobox()
+        self.schedule_lint()
+    
+    def on_dialogues_changed(self, event, *args):
+        if event == "clear":
+            self.summary_cache.clear()
+        elif event in ("delete", "delete_many") and len(self.summary_cache) > len(self.dialogues) * 2 + 1024:
+            # 清理已删除条目的摘要缓存
+            live_uids = set(uid for uid, content_type, char_var in self.dialogues.iter_headers())
+            self.summary_cache = {uid: summary for uid, summary in self.summary_cache.items() if uid in live_uids}
+        if not self.recording_undo:
+            self.discard_content_undo()
+        self.sync_content_list(event, *args)
+        self.preview_pane.on_dialogues_changed(event, *args)
+        self.schedule_stats_refresh()
+        self.schedule_lint()
+    
+    def on_label_changed(self):
+        if self.project_db is not None:
+            self.project_db.set_label(self.current_label.get())
+        if self.sharded_project is not None:
+            self.sharded_project.set_label(self.current_label.get())
+        self.preview_pane.update_label()
+        self.schedule_lint()
+    
+    def set_dialogue_store(self, dialogues):
+        """切换内容存储（内存存储或项目数据库），重新挂接修改通知并重建内容列表"""
+        self.dialogues.remove_listener(self.on_dialogues_changed)
+        self.linter.detach()
+        self.dialogues = dialogues
+        self.dialogues.add_listener(self.on_dialogues_changed)
+        # 不同存储的条目编号互不相关，按条目编号缓存的结果全部作废
+        self.summary_cache.clear()
+        self.linter = ProjectLinter()
+        self.linter.attach(self.dialogues)
+        if self.stats is not None:
+            self.stats.detach()
+            self.stats = None
+        self.refresh_content_list()
+        self.preview_pane.rebuild()
+        self.schedule_lint()
+    
+    def save_project_characters(self):
+        if self.project_db is not None:
+            self.project_db.save_characters(self.characters)
+        if self.sharded_project is not None:
+            self.sharded_project.save_characters(self.characters)
+    
+    def detach_project_db(self):
+        """关闭项目数据库，切换回内存存储"""
+        if self.project_db is None:
+            return
+        project = self.project_db
+        self.project_db = None
+        self.set_dialogue_store(DialogueStore())
+        project.close()
+        self.update_status()
+    
+    def detach_sharded_project(self):
+        """放弃分片项目中未保存的修改，切换回普通的内存存储"""
+        if self.sharded_project is None:
+            return
+        self.sharded_project = None
+        self.set_dialogue_store(DialogueStore())
+        self.update_status()
+    
+    def update_status(self):
+        if self.project_db is not None:
+            self.status_var.set(f"项目数据库：{self.project_db.file_path}（修改自动保存）")
+        elif self.sharded_project is not None:
+            project = self.sharded_project
+            self.status_var.set(f"分片项目：{project.file_path}（场景 {project.get_label()}，共{len(project.labels)}个场景）")
+        else:
+            self.status_var.set("")
+    
+    def show_status_message(self, message):
+        """在状态栏显示一条提示，一段时间后恢复"""
+        if self.status_after_id is not None:
+            self.after_cancel(self.status_after_id)
+        self.status_var.set(message)
+        self.status_after_id = self.after(STATUS_MESSAGE_MS, self._clear_status_message)
+    
+    def _clear_status_message(self):
+        self.status_after_id = None
+        self.update_status()
+    
+    def notify(self, title, message, warning=False):
+        """操作结果提示：快速录入模式下显示在状态栏，否则弹出提示框"""
+        if self.rapid_entry.get():
+            self.show_status_message(f"{title}：{message}")
+        elif warning:
+            messagebox.showwarning(title, message)
+        else:
+            messagebox.showinfo(title, message)
+    
+    def confirm(self, message):
+        """删除前确认；快速录入模式下不再逐次确认（可用Ctrl+Z撤销）"""
+        return self.rapid_entry.get() or messagebox.askyesno("确认", message)
+    
+    def schedule_lint(self):
+        """修改后延迟启动后台检查，连续修改只触发一次"""
+        if self.lint_after_id is not None:
+            self.after_cancel(self.lint_after_id)
+        self.lint_after_id = self.after(LINT_DELAY_MS, self._start_lint)
+    
+    def _start_lint(self):
+        self.lint_after_id = None
+        if self.lint_thread is not None:
+            # 上一次检查尚未结束，结束后再检查一次
+            self.lint_pending = True
+            return
+        
+        # 只把修改通知记下的待检查行交给后台线程，不复制整个内容缓冲区
+        job = self.linter.take_job()
+        if job is None:
+            self.refresh_lint_result()
+            return
+        cells, sources = job
+        self.lint_thread = threading.Thread(
+            target=self._run_lint,
+            args=(self.linter, cells, sources),
+            daemon=True
+        )
+        self.lint_thread.start()
+        self.after(LINT_POLL_MS, self._poll_lint)
+    
+    def _run_lint(self, linter, cells, sources):
+        try:
+            results = ProjectLinter.check_job(sources)
+        except Exception as e:
+            results = e
+        self.lint_queue.put((linter, cells, results))
+    
+    def _poll_lint(self):
+        try:
+            linter, cells, results = self.lint_queue.get_nowait()
+        except queue.Empty:
+            self.after(LINT_POLL_MS, self._poll_lint)
+            return
+        
+        self.lint_thread = None
+        if isinstance(results, Exception):
+            self.lint_result = ([LintIssue("错误", "label", 0, f"检查失败：{str(results)}")], 1, 0)
+            self.update_lint_status()
+        elif linter is self.linter:
+            # 检查期间切换了内容存储时，旧检查器的结果直接丢弃
+            linter.apply_job(cells, results)
+            self.refresh_lint_result()
+        if self.lint_pending or self.linter.has_pending():
+            self.lint_pending = False
+            self._start_lint()
+    
+    def refresh_lint_result(self):
+        """汇总检查结果；检查报告窗口未打开时不生成内容问题列表"""
+        report_open = self.lint_window is not None and self.lint_window.winfo_exists()
+        self.lint_result = self.linter.lint(self.characters, self.current_label.get(), list_dialogues=report_open)
+        self.update_lint_status()
+    
+    def update_lint_status(self):
+        issues, error_count, warning_count = self.lint_result
+        if error_count or warning_count:
+            self.lint_status_var.set(f"项目检查：{error_count}个错误，{warning_count}个警告（点击查看）")
+            self.lbl_lint_status.config(fg="#d0021b" if error_count else "#b8860b")
+        else:
+            self.lint_status_var.set("项目检查：无问题")
+            self.lbl_lint_status.config(fg="black")
+        
+        if self.lint_window is not None and self.lint_window.winfo_exists():
+            self.lint_window.update_issues(*self.lint_result)
+    
+    def show_stats(self):
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            self.stats_window = StatsWindow(self)
+        self.refresh_stats()
+        self.stats_window.lift()
+    
+    def schedule_stats_refresh(self):
+        """统计窗口打开时，连续修改后只刷新一次统计表"""
+        if self.stats_window is None or not self.stats_window.winfo_exists() or self.stats_after_id is not None:
+            return
+        self.stats_after_id = self.after(STATS_REFRESH_MS, self.refresh_stats)
+    
+    def refresh_stats(self):
+        self.stats_after_id = None
+        if self.stats_window is None or not self.stats_window.winfo_exists():
+            return
+        if self.stats is None:
+            self.config(cursor="watch")
+            self.update_idletasks()
+            try:
+                self.stats = ProjectStats()
+                self.stats.attach(self.dialogues)
+            finally:
+                self.config(cursor="")
+        self.stats_window.update_rows(self.stats.rows(self.characters))
+    
+    def show_lint_report(self):
+        if self.lint_window is None or not self.lint_window.winfo_exists():
+            self.lint_window = LintReportWindow(self)
+        if self.lint_thread is None:
+            self.refresh_lint_result()
+        else:
+            self.lint_window.update_issues(*self.lint_result)
+        self.lint_window.lift()
+    
+    def goto_lint_issue(self, issue):
+        """定位到检查问题对应的角色、内容或场景名输入框"""
+        if issue.target == "label":
+            self.entry_label.focus_set()
+            return
+        
+        if issue.target == "dialogue":
+            self.select_content(issue.index)
+            return
+        
+        if issue.index < self.lb_characters.size():
+            self.lb_characters.selection_clear(0, tk.END)
+            self.lb_characters.selection_set(issue.index)
+            self.lb_characters.activate(issue.index)
+            self.lb_characters.see(issue.index)
+    
+    def get_character_display_map(self):
+        # 变量名重复时以第一个角色为准
+        return {char["var_name"]: char["display_name"] for char in reversed(self.characters)}
+    
+    def get_content_summary(self, index):
+        """内容的单行摘要（按条目编号缓存，每条只计算一次）"""
+        uid = self.dialogues.uid(index)
+        summary = self.summary_cache.get(uid)
+        if summary is None:
+            summary = summarize_text(self.dialogues.text(index), self.display_width)
+            self.summary_cache[uid] = summary
+        return summary
+    
+    def get_content_display(self, index, display_map):
+        summary = self.get_content_summary(index)
+        if self.dialogues.content_type(index) == "character":
+            char_var = self.dialogues.char_var(index)
+            return f"[角色] {display_map.get(char_var, char_var)}: {summary}"
+        return f"[旁白] {summary}"
+    
+    def get_content_rows(self, start, end):
+        """内容列表第 start ~ end-1 行的显示文本（列表只在绘制可见行时读取）"""
+        display_map = self.get_character_display_map()
+        return [self.get_content_display(index, display_map) for index in range(start, end)]
+    
+    def refresh_content_list(self):
+        """内容存储或显示方式变化后重绘内容列表（只读取可见的行），并清除选中"""
+        self.lb_contents.reset()
+    
+    def sync_content_list(self, event, *args):
+        """按修改通知调整内容列表的选中行，重绘可见的行"""
+        self.lb_contents.on_rows_changed(event, *args)
+    
+    def ask_display_width(self):
+        width = simpledialog.askinteger(
+            "内容列表显示宽度",
+            "每行最多显示的文本字符数：",
+            initialvalue=self.display_width,
+            minvalue=10,
+            maxvalue=1000,
+            parent=self
+        )
+        if width and width != self.display_width:
+            self.display_width = width
+            self.summary_cache.clear()
+            self.lb_contents.refresh()
+    
+    def on_contents_hover(self, event):
+        index = self.lb_contents.nearest(event.y)
+        bbox = self.lb_contents.bbox(index) if index >= 0 else None
+        if not bbox or not (bbox[1] <= event.y < bbox[1] + bbox[3]):
+            index = -1
+        if index == self.tooltip_index:
+            return
+        
+        self.hide_content_tooltip()
+        self.tooltip_index = index
+        if index >= 0:
+            self.tooltip_after_id = self.after(
+                TOOLTIP_DELAY_MS, lambda: self.show_content_tooltip(index, event.x_root, event.y_root)
+            )
+    
+    def show_content_tooltip(self, index, x_root, y_root):
+        """悬停提示中显示完整内容"""
+        self.tooltip_after_id = None
+        if index >= len(self.dialogues):
+            return
+        content = self.dialogues.text(index)
+        if len(content) > TOOLTIP_MAX_CHARS:
+            content = content[:TOOLTIP_MAX_CHARS] + "…"
+        
+        self.tooltip_window = tk.Toplevel(self)
+        self.tooltip_window.wm_overrideredirect(True)
+        self.tooltip_window.wm_geometry(f"+{x_root + 16}+{y_root + 16}")
+        tk.Label(
+            self.tooltip_window,
+            text=content,
+            font=self.base_font,
+            justify="left",
+            wraplength=500,
+            bg="#ffffe0",
+            bd=1,
+            relief="solid",
+            padx=6,
+            pady=4
+        ).pack()
+    
+    def hide_content_tooltip(self, event=None):
+        if self.tooltip_after_id is not None:
+            self.after_cancel(self.tooltip_after_id)
+            self.tooltip_after_id = None
+        if self.tooltip_window is not None:
+            self.tooltip_window.destroy()
+            self.tooltip_window = None
+        self.tooltip_index = -1
+    
+    def move_content(self, from_index, to_index):
+        """移动一条内容，列表中只更新被移动的一行"""
+        self.dialogues.move(from_index, to_index)
+        self.lb_contents.selection_clear(0, tk.END)
+        self.lb_contents.selection_set(to_index)
+        self.sync_preview_selection()
+    
+    def select_content(self, index):
+        """在内容列表中选中第 index 条并滚动到可见位置"""
+        if not 0 <= index < len(self.dialogues):
+            return
+        self.lb_contents.selection_clear(0, tk.END)
+        self.lb_contents.selection_set(index)
+        self.lb_contents.activate(index)
+        self.lb_contents.see(index)
+        self.sync_preview_selection()
+    
+    def sync_preview_selection(self):
+        selected_indices = self.lb_contents.curselection()
+        self.preview_pane.highlight_row(selected_indices[0] if selected_indices else -1)
+    
+    def toggle_preview(self):
+        if self.show_preview.get():
+            self.preview_pane.pack(side="right", fill="both", padx=(10, 0), pady=0, expand=True, before=self.right_frame)
+        else:
+            self.preview_pane.pack_forget()
+        self.preview_pane.set_active(self.show_preview.get())
+        self.sync_preview_selection()
+    
+    def add_character(self):
+        var_name = self.entry_var_name.get().strip()
+        display_name = self.entry_display_name.get().strip()
+        
+        if not var_name:
+            self.notify("警告", "角色变量名不能为空！", warning=True)
+            return
+        if not VAR_NAME_PATTERN.match(var_name):
+            self.notify("警告", "变量名仅允许字母、数字、下划线，且不能以数字开头，禁止中文！", warning=True)
+            return
+        for char in self.characters:
+            if char["var_name"] == var_name:
+                self.notify("提示", f"变量名「{var_name}」已存在！")
+                return
+        
+        if not display_name:
+            display_name = var_name
+        
+        self.characters.append({
+            "var_name": var_name,
+            "display_name": display_name
+        })
+        display_text = f"{var_name} - {display_name}"
+        self.lb_characters.insert(tk.END, display_text)
+        
+        self.entry_var_name.delete(0, tk.END)
+        self.entry_display_name.delete(0, tk.END)
+        
+        self.update_character_combobox()
+        self.save_project_characters()
+        self.schedule_lint()
+        self.notify("成功", f"角色「{var_name} - {display_name}」添加完成！")
+    
+    def delete_character(self):
+        selected_index = self.lb_characters.curselection()
+        if not selected_index:
+            self.notify("警告", "请先选中要删除的角色！", warning=True)
+            return
+        
+        selected_index = selected_index[0]
+        char_info = self.characters[selected_index]
+        if self.confirm(f"是否删除角色「{char_info['var_name']} - {char_info['display_name']}」？"):
+            del self.characters[selected_index]
+            self.lb_characters.delete(selected_index)
+            self.update_character_combobox()
+            self.save_project_characters()
+            self.schedule_lint()
+            self.undo_stack.append(("character", [(selected_index, char_info)]))
+            self.notify("成功", "角色已删除！（Ctrl+Z可撤销）")
+    
+    def import_from_config(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("角色配置文件", "*.json *.json.gz *.json.xz"), ("所有文件", "*.*")],
+            title="打开角色配置文件"
+        )
+        if not file_path:
+            return
+        
+        mode = IMPORT_MODE_REPLACE
+        if self.characters:
+            mode = ImportModeDialog.ask(self)
+            if mode is None:
+                return
+        
+        try:
+            with open_data_file(file_path) as f:
+                merged, report = merge_characters(self.characters, iter_config_characters(f), mode)
+            
+            if not (report.added or report.updated or report.duplicates or report.invalid):
+                messagebox.showwarning("警告", "配置文件中无角色数据！")
+                return
+            
+            self.set_characters(merged)
+            messagebox.showinfo("成功", "已从配置文件导入角色！\n" + format_import_report(report))
+        except KeyError:
+            messagebox.showerror("错误", "配置文件格式错误，缺少角色数据！")
+        except json.JSONDecodeError:
+            messagebox.showerror("错误", "配置文件损坏，无法解析！")
+        except Exception as e:
+            messagebox.showerror("错误", f"导入失败：{str(e)}")
+    
+    def add_character_dialogue(self):
+        selected_char_text = self.cb_character.get()
+        dialog_content = self.txt_character_dialog.get("1.0", tk.END).strip()
+        
+        if not selected_char_text:
+            self.notify("警告", "请先选择一个角色！", warning=True)
+            return
+        if not dialog_content:
+            self.notify("警告", "角色对话内容不能为空！", warning=True)
+            return
+        
+        char_var = selected_char_text.split(" - ")[0]
+        
+        self.dialogues.append("character", char_var, dialog_content)
+        self.txt_character_dialog.delete("1.0", tk.END)
+        self.show_added_content()
+    
+    def add_narration(self):
+        narration_content = self.txt_narration.get("1.0", tk.END).strip()
+        
+        if not narration_content:
+            self.notify("警告", "旁白内容不能为空！", warning=True)
+            return
+        
+        self.dialogues.append("narration", "", narration_content)
+        self.txt_narration.delete("1.0", tk.END)
+        self.show_added_content()
+    
+    def show_added_content(self):
+        """新增内容后滚动到列表末尾，快速录入模式下在状态栏提示"""
+        self.lb_contents.see(tk.END)
+        if self.rapid_entry.get():
+            self.show_status_message(f"已添加第{len(self.dialogues)}条内容")
+    
+    def submit_from_text(self, add_function):
+        """文本框中按Ctrl+Enter直接提交（不插入换行）"""
+        add_function()
+        return "break"
+    
+    def select_speaker(self, index):
+        """按序号选择角色并切换到对话输入框"""
+        values = self.cb_character["values"]
+        if index >= len(values):
+            return "break"
+        self.cb_character.current(index)
+        self.txt_character_dialog.focus_set()
+        self.show_status_message(f"当前角色：{values[index]}")
+        return "break"
+    
+    def on_drag_start(self, event):
+        self.hide_content_tooltip()
+        # 按住Shift/Ctrl点击时交给列表多选，不开始拖动
+        if event.state & 0x0005:
+            self.drag_item = None
+            self.drag_index = -1
+            return
+        self.drag_index = self.lb_contents.nearest(event.y)
+        if self.drag_index >= 0:
+            self.drag_item = self.lb_contents.get(self.drag_index)
+            self.drag_pointer_y = event.y
+            self.lb_contents.selection_clear(0, tk.END)
+            self.lb_contents.selection_set(self.drag_index)
+    
+    def on_drag_motion(self, event):
+        if self.drag_item is None:
+            return
+        # 只记录鼠标位置，指示线与自动滚动合并到下一帧统一更新
+        self.drag_pointer_y = event.y
+        if self.drag_after_id is None:
+            self.drag_after_id = self.after(DRAG_FRAME_MS, self._update_drag)
+        # 阻止Listbox默认的拖动选中行为
+        return "break"
+    
+    def _update_drag(self):
+        self.drag_after_id = None
+        if self.drag_item is None:
+            return
+        
+        y = self.drag_pointer_y
+        height = self.lb_contents.winfo_height()
+        scroll_units = 0
+        if y < DRAG_AUTOSCROLL_MARGIN:
+            scroll_units = -1 - (DRAG_AUTOSCROLL_MARGIN - y) // 8
+        elif y > height - DRAG_AUTOSCROLL_MARGIN:
+            scroll_units = 1 + (y - height + DRAG_AUTOSCROLL_MARGIN) // 8
+        if scroll_units:
+            self.lb_contents.yview_scroll(scroll_units, "units")
+        
+        self._show_drop_indicator(self._get_drop_slot(y))
+        
+        # 鼠标停在边缘时持续滚动
+        if scroll_units:
+            self.drag_after_id = self.after(DRAG_FRAME_MS, self._update_drag)
+    
+    def _get_drop_slot(self, y):
+        """根据鼠标位置计算插入位置（0 ~ 条目数，表示插入到该行之前）"""
+        size = self.lb_contents.size()
+        if size == 0:
+            return 0
+        index = self.lb_contents.nearest(y)
+        bbox = self.lb_contents.bbox(index)
+        if bbox and y > bbox[1] + bbox[3] / 2:
+            index += 1
+        return index
+    
+    def _show_drop_indicator(self, slot):
+        size = self.lb_contents.size()
+        if slot < size:
+            bbox = self.lb_contents.bbox(slot)
+            line_y = bbox[1] - 1 if bbox else None
+        else:
+            bbox = self.lb_contents.bbox(size - 1)
+            line_y = bbox[1] + bbox[3] if bbox else None
+        
+        if line_y is None:
+            self.drop_indicator.place_forget()
+        else:
+            self.drop_indicator.place(x=0, y=max(line_y, 0), relwidth=1.0, height=2)
+    
+    def _finish_drag(self):
+        if self.drag_after_id is not None:
+            self.after_cancel(self.drag_after_id)
+            self.drag_after_id = None
+        self.drop_indicator.place_forget()
+        self.drag_item = None
+        self.drag_index = -1
+    
+    def on_drag_end(self, event):
+        if self.drag_item is None or self.drag_index < 0:
+            self._finish_drag()
+            return
+        
+        slot = self._get_drop_slot(event.y)
+        # 插入位置在原位置之后时，取出原条目后目标下标需减一
+        drop_index = slot - 1 if slot > self.drag_index else slot
+        if drop_index != self.drag_index:
+            self.move_content(self.drag_index, drop_index)
+        self._finish_drag()
+    
+    def move_item_up(self):
+        selected_index = self.lb_contents.curselection()
+        if not selected_index:
+            self.notify("警告", "请先选中要上移的内容！", warning=True)
+            return
+        
+        selected_index = selected_index[0]
+        if selected_index == 0:
+            self.notify("提示", "已到最顶部，无法上移！")
+            return
+        
+        self.move_content(selected_index, selected_index-1)
+    
+    def move_item_down(self):
+        selected_index = self.lb_contents.curselection()
+        if not selected_index:
+            self.notify("警告", "请先选中要下移的内容！", warning=True)
+            return
+        
+        selected_index = selected_index[0]
+        if selected_index == len(self.dialogues)-1:
+            self.notify("提示", "已到最底部，无法下移！")
+            return
+        
+        self.move_content(selected_index, selected_index+1)
+    
+    def delete_content(self):
+        """删除选中的内容（可多选，只确认一次）"""
+        selected_indices = self.lb_contents.curselection()
+        if not selected_indices:
+            self.notify("警告", "请先选中要删除的内容！", warning=True)
+            return
+        
+        message = "是否删除选中的内容？" if len(selected_indices) == 1 else f"是否删除选中的{len(selected_indices)}条内容？"
+        if self.confirm(message):
+            self.recording_undo = True
+            try:
+                entries = self.dialogues.delete_many(selected_indices)
+            finally:
+                self.recording_undo = False
+            deleted = list(zip(selected_indices, entries))
+            self.undo_stack.append(("contents", deleted))
+            # 选中删除位置的下一条，便于连续删除
+            next_index = min(deleted[0][0], self.lb_contents.size() - 1)
+            if next_index >= 0:
+                self.lb_contents.selection_set(next_index)
+                self.lb_contents.activate(next_index)
+            self.notify("成功", f"选中的{len(deleted)}条内容已删除！（Ctrl+Z可撤销）")
+    
+    def on_undo_key(self, event):
+        """Ctrl+Z：焦点在输入框或文本框中时留给其自身的编辑，其他位置撤销最近一次删除"""
+        if isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Text)):
+            return None
+        return self.undo_delete()
+    
+    def discard_content_undo(self):
+        """内容被删除以外的操作修改后，丢弃内容的撤销记录（记录的下标已不再对应），保留角色的"""
+        if any(kind == "contents" for kind, deleted in self.undo_stack):
+            self.undo_stack = deque(
+                ((kind, deleted) for kind, deleted in self.undo_stack if kind != "contents"),
+                maxlen=UNDO_LIMIT
+            )
+    
+    def undo_delete(self):
+        """撤销最近一次删除（内容或角色），恢复到原来的位置"""
+        if not self.undo_stack:
+            self.notify("提示", "没有可撤销的删除！")
+            return "break"
+        
+        kind, deleted = self.undo_stack.pop()
+        if kind == "character":
+            for index, char in deleted:
+                self.characters.insert(index, char)
+                self.lb_characters.insert(index, f"{char['var_name']} - {char['display_name']}")
+            self.update_character_combobox()
+            self.save_project_characters()
+            self.schedule_lint()
+            self.notify("成功", f"已恢复角色「{deleted[0][1]['var_name']}」")
+            return "break"
+        
+        # 记录的是删除前的下标（升序），一次插回即可恢复原有顺序
+        self.recording_undo = True
+        try:
+            self.dialogues.insert_many(deleted)
+        finally:
+            self.recording_undo = False
+        self.lb_contents.selection_clear(0, tk.END)
+        for index, entry in deleted:
+            if index < self.lb_contents.size():
+                self.lb_contents.selection_set(index)
+        if deleted[0][0] < self.lb_contents.size():
+            self.lb_contents.see(deleted[0][0])
+        self.notify("成功", f"已恢复{len(deleted)}条内容")
+        return "break"
+    
+    def new_script(self):
+        if messagebox.askyesno("确认", "是否新建脚本？当前未保存的内容将丢失！"):
+            self.reset_editor()
+            messagebox.showinfo("提示", "已新建空白脚本！")
+    
+    def generate_script(self):
+        if not self.dialogues:
+            messagebox.showwarning("警告", "请先添加至少一条角色对话或旁白！")
+            return
+        
+        if self.render_thread is not None:
+            return
+        
+        # 在后台线程中渲染内容快照，界面保持响应，期间显示等待光标
+        self.config(cursor="watch")
+        self.render_thread = threading.Thread(
+            target=self._run_render,
+            args=([dict(char) for char in self.characters], self.get_label_name(), self.dialogues.snapshot()),
+            daemon=True
+        )
+        self.render_thread.start()
+        self.after(RENDER_POLL_MS, self._poll_render)
+    
+    def _run_render(self, characters, label_name, snapshot):
+        try:
+            result = render_script(characters, label_name, snapshot)
+        except Exception as e:
+            result = e
+        self.render_queue.put(result)
+    
+    def _poll_render(self):
+        try:
+            result = self.render_queue.get_nowait()
+        except queue.Empty:
+            self.after(RENDER_POLL_MS, self._poll_render)
+            return
+        
+        self.render_thread = None
+        self.config(cursor="")
+        if isinstance(result, Exception):
+            messagebox.showerror("错误", f"脚本生成失败：{str(result)}")
+            return
+        self.generated_script = result
+        self.show_generated_script()
+    
+    def show_generated_script(self):
+        script_window = tk.Toplevel(self)
+        script_window.title("生成的Ren'Py脚本")
+        script_window.geometry("750x550")
+        script_window.minsize(700, 500)
+        script_window.configure(bg="#f0f0f0")
+        
+        txt_script = tk.Text(script_window, font=self.base_font, bd=1, relief="solid")
+        txt_script.pack(fill="both", padx=15, pady=15, expand=True)
+        txt_script.insert("1.0", self.generated_script)
+        txt_script.config(state="disabled")
+        
+        ttk.Button(
+            script_window, 
+            text="关闭", 
+            command=script_window.destroy,
+            style="Custom.TButton"
+        ).pack(pady=10)
+    
+    def get_label_name(self):
+        return normalize_label_name(self.current_label.get())
+    
+    def generate_translations(self):
+        if not self.dialogues:
+            messagebox.showwarning("警告", "请先添加至少一条角色对话或旁白！")
+            return
+        
+        languages_text = simpledialog.askstring(
+            "生成翻译文件",
+            "目标语言（多个语言用逗号分隔，如：english, japanese）：",
+            initialvalue=", ".join(self.translation_languages),
+            parent=self
+        )
+        if not languages_text:
+            return
+        
+        languages = []
+        for language in re.split(r"[,，\s]+", languages_text):
+            if language and language not in languages:
+                languages.append(language)
+        invalid_languages = [language for language in languages if not VAR_NAME_PATTERN.match(language)]
+        if not languages or invalid_languages:
+            messagebox.showwarning("警告", "语言名仅允许字母、数字、下划线，且不能以数字开头！")
+            return
+        
+        tl_dir = filedialog.askdirectory(title="选择翻译根目录（Ren'Py项目的game/tl目录）")
+        if not tl_dir:
+            return
+        
+        try:
+            results = write_translation_files(tl_dir, languages, self.get_label_name(), self.dialogues)
+        except Exception as e:
+            messagebox.showerror("错误", f"翻译文件生成失败：{str(e)}")
+            return
+        
+        self.translation_languages = languages
+        summary = []
+        for language, (added, kept, stale, written) in results.items():
+            state = "已更新" if written else "无变化"
+            summary.append(f"{language}：新增{added}条，保留{kept}条，过期{stale}条（{state}）")
+        messagebox.showinfo("成功", "翻译文件已生成：\n" + "\n".join(summary))
+    
+    def show_workspace_search(self):
+        if self.search_window is None or not self.search_window.winfo_exists():
+            self.search_window = WorkspaceSearchWindow(self)
+        self.search_window.lift()
+        self.search_window.entry_query.focus_set()
+    
+    def update_workspace_index(self, file_path, background=True):
+        """保存后增量更新工作区索引（只重新索引刚保存的文件）；文件不在工作区内时忽略"""
+        if not self.workspace_dir:
+            return
+        workspace_dir = os.path.abspath(self.workspace_dir)
+        file_path = os.path.abspath(file_path)
+        if os.path.commonpath([workspace_dir, file_path]) != workspace_dir:
+            return
+        
+        args = (workspace_dir, file_path, [dict(char) for char in self.characters], self.current_label.get(), self.dialogues.snapshot())
+        if background:
+            threading.Thread(target=self._index_project, args=args, daemon=True).start()
+        else:
+            self._index_project(*args)
+    
+    def _index_project(self, workspace_dir, file_path, characters, current_label, dialogues):
+        # 索引只是查找用的缓存，更新失败不影响保存；下次打开查找窗口时会按修改时间补上
+        try:
+            index = WorkspaceIndex(workspace_dir)
+            try:
+                index.index_project(file_path, characters, current_label, dialogues)
+            finally:
+                index.close()
+        except (sqlite3.Error, OSError):
+            pass
+    
+    def open_project_at(self, file_path, position, parent=None):
+        """打开指定的临时脚本文件并定位到第 position 条内容"""
+        if os.path.abspath(file_path) != os.path.abspath(self.project_path or ""):
+            if not messagebox.askyesno("确认", f"是否打开项目？当前未保存的内容将丢失！\n{file_path}", parent=parent):
+                return
+            try:
+                characters, current_label, dialogues = read_temp_file(file_path)
+            except Exception as e:
+                messagebox.showerror("错误", f"打开失败：{str(e)}", parent=parent)
+                return
+            self.load_temp_data({"characters": characters, "current_label": current_label, "dialogues": dialogues}, file_path)
+        
+        # 大项目的内容列表分批填充，定位的行可能尚未填入
+        self.select_content(position)
+        self.lift()
+    
+    def save_script(self):
+        if not hasattr(self, 'generated_script') or not self.generated_script:
+            messagebox.showwarning("警告", "请先点击「生成Ren'Py脚本」按钮！")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".rpy",
+            filetypes=[("Ren'Py脚本文件", "*.rpy"), ("所有文件", "*.*")],
+            title="保存Ren'Py脚本"
+        )
+        if not file_path:
+            return
+        
+        try:
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(self.generated_script)
+            messagebox.showinfo("成功", f"脚本已保存到：\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("错误", f"保存失败：{str(e)}")
+    
+    def save_temp_file(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("临时配置文件", "*.json"), *COMPRESSED_FILE_TYPES, ("所有文件", "*.*")],
+            title="保存临时文件"
+        )
+        if not file_path:
+            return
+        
+        try:
+            with open_data_file(file_path, "w") as f:
+                write_temp_data(f, self.characters, self.current_label.get(), self.dialogues, self.compact_json.get())
+            self.project_path = file_path
+            self.update_workspace_index(file_path)
+            messagebox.showinfo("成功", f"临时文件已保存到：\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("错误", f"临时文件保存失败：{str(e)}")
+    
+    def open_project_db(self, file_path=None, parent=None):
+        """打开项目数据库，之后的编辑直接提交到数据库；成功时返回 True"""
+        if file_path is None:
+            file_path = filedialog.askopenfilename(
+                filetypes=[*PROJECT_DB_FILE_TYPES, ("所有文件", "*.*")],
+                title="打开项目数据库",
+                parent=parent
+            )
+            if not file_path:
+                return False
+        
+        project = None
+        try:
+            project = SQLiteProject(file_path)
+            characters = project.load_characters()
+            current_label = project.get_label()
+            dialogues = project.open_dialogues()
+        except Exception as e:
+            if project is not None:
+                project.close()
+            messagebox.showerror("错误", f"打开项目数据库失败：{str(e)}", parent=parent)
+            return False
+        
+        self.reset_editor()
+        self.set_characters(characters)
+        self.current_label.set(current_label)
+        self.project_db = project
+        self.project_path = project.file_path
+        if not self.workspace_dir:
+            self.workspace_dir = os.path.dirname(project.file_path)
+        self.set_dialogue_store(dialogues)
+        self.update_status()
+        return True
+    
+    def save_as_project_db(self):
+        """将当前内容另存为项目数据库并切换到该数据库继续编辑（临时文件由此转换为项目数据库）"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=PROJECT_DB_SUFFIX,
+            filetypes=[*PROJECT_DB_FILE_TYPES, ("所有文件", "*.*")],
+            title="另存为项目数据库"
+        )
+        if not file_path:
+            return
+        if self.project_db is not None and os.path.abspath(file_path) == self.project_db.file_path:
+            messagebox.showinfo("提示", "当前项目数据库的修改已自动保存！")
+            return
+        
+        self.config(cursor="watch")
+        self.update_idletasks()
+        try:
+            project = SQLiteProject.create(file_path, self.characters, self.current_label.get(), self.dialogues)
+            dialogues = project.open_dialogues()
+        except Exception as e:
+            messagebox.showerror("错误", f"项目数据库保存失败：{str(e)}")
+            return
+        finally:
+            self.config(cursor="")
+        
+        previous = self.project_db
+        self.project_db = project
+        self.sharded_project = None
+        self.project_path = project.file_path
+        self.set_dialogue_store(dialogues)
+        if previous is not None:
+            previous.close()
+        self.update_status()
+        messagebox.showinfo("成功", f"已另存为项目数据库，之后的修改将自动保存：\n{file_path}")
+    
+    def ask_shard_label(self, project, parent=None):
+        """让用户选择分片项目中要编辑的场景（输入新名称则新建），返回场景下标，取消时返回None"""
+        label_name = LabelChooserDialog.ask(parent or self, project.label_names(), project.get_label())
+        if label_name is None:
+            return None
+        if label_name in project.label_names():
+            return project.label_names().index(label_name)
+        return project.add_label(label_name)
+    
+    def open_sharded_project(self, file_path=None, parent=None):
+        """打开分片项目，只读取所选场景的分片；成功时返回 True"""
+        if file_path is None:
+            file_path = filedialog.askopenfilename(
+                filetypes=[*SHARDED_PROJECT_FILE_TYPES, ("所有文件", "*.*")],
+                title="打开分片项目",
+                parent=parent
+            )
+            if not file_path:
+                return False
+        
+        try:
+            project = ShardedProject(file_path)
+            # 只有一个场景时直接打开
+            label_index = self.ask_shard_label(project, parent) if len(project.labels) > 1 else project.label_index
+            if label_index is None:
+                return False
+            dialogues = project.open_label(label_index)
+        except Exception as e:
+            messagebox.showerror("错误", f"打开分片项目失败：{str(e)}", parent=parent)
+            return False
+        
+        self.reset_editor()
+        self.set_characters(project.load_characters())
+        self.current_label.set(project.get_label())
+        self.sharded_project = project
+        self.project_path = project.file_path
+        if not self.workspace_dir:
+            self.workspace_dir = os.path.dirname(project.file_path)
+        self.set_dialogue_store(dialogues)
+        dialogues.add_listener(project.on_dialogues_changed)
+        project.save_local_state()
+        self.update_status()
+        return True
+    
+    def save_sharded_project(self):
+        """只重写有修改的分片与清单，成功时返回 True"""
+        try:
+            written = self.sharded_project.save(self.dialogues)
+        except Exception as e:
+            messagebox.showerror("错误", f"分片项目保存失败：{str(e)}")
+            return False
+        self.show_status_message(f"已保存分片项目（重写{written}个分片）")
+        return True
+    
+    def save_project(self):
+        """Ctrl+S：分片项目只保存修改，项目数据库已自动保存，其余情况保存临时文件"""
+        if self.sharded_project is not None:
+            self.save_sharded_project()
+        elif self.project_db is not None:
+            self.show_status_message("项目数据库的修改已自动保存")
+        else:
+            self.save_temp_file()
+    
+    def save_as_sharded_project(self):
+        """将当前内容另存为分片项目并切换到该项目继续编辑（临时文件由此转换为分片项目）"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=SHARDED_PROJECT_SUFFIX,
+            filetypes=[*SHARDED_PROJECT_FILE_TYPES, ("所有文件", "*.*")],
+            title="另存为分片项目"
+        )
+        if not file_path:
+            return
+        if self.sharded_project is not None and os.path.abspath(file_path) == self.sharded_project.file_path:
+            self.save_sharded_project()
+            return
+        
+        self.config(cursor="watch")
+        self.update_idletasks()
+        try:
+            project = ShardedProject.create(file_path, self.characters, [(self.current_label.get(), self.dialogues)])
+            dialogues = project.open_label()
+        except Exception as e:
+            messagebox.showerror("错误", f"分片项目保存失败：{str(e)}")
+            return
+        finally:
+            self.config(cursor="")
+        
+        previous = self.project_db
+        self.project_db = None
+        self.sharded_project = project
+        self.project_path = project.file_path
+        self.set_dialogue_store(dialogues)
+        dialogues.add_listener(project.on_dialogues_changed)
+        project.save_local_state()
+        if previous is not None:
+            previous.close()
+        self.update_status()
+        messagebox.showinfo("成功", f"已另存为分片项目：\n{file_path}")
+    
+    def switch_shard_label(self):
+        """保存当前场景后切换到分片项目中的另一个场景（或新建场景）"""
+        project = self.sharded_project
+        if project is None:
+            messagebox.showwarning("警告", "请先打开分片项目！")
+            return
+        if project.has_changes():
+            answer = messagebox.askyesnocancel("保存修改", "当前场景有未保存的修改，是否先保存？")
+            if answer is None or (answer and not self.save_sharded_project()):
+                return
+        label_index = self.ask_shard_label(project)
+        if label_index is None:
+            return
+        
+        try:
+            dialogues = project.open_label(label_index)
+        except Exception as e:
+            messagebox.showerror("错误", f"读取场景失败：{str(e)}")
+            return
+        # 撤销记录属于原场景
+        self.undo_stack.clear()
+        self.current_label.set(project.get_label())
+        self.set_dialogue_store(dialogues)
+        dialogues.add_listener(project.on_dialogues_changed)
+        project.save_local_state()
+        self.update_status()
+    
+    def import_sheet(self):
+        """从台本表格追加内容，未知的说话人自动创建角色"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[*SHEET_FILE_TYPES, ("所有文件", "*.*")],
+            title="从表格导入台本"
+        )
+        if not file_path:
+            return
+        
+        count_before = len(self.dialogues)
+        importer = SheetImporter(self.characters)
+        self.config(cursor="watch")
+        self.update_idletasks()
+        error = None
+        try:
+            with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+                self.dialogues.extend(importer.iter_dialogues(iter_sheet_rows(f, sheet_delimiter(file_path))))
+        except Exception as e:
+            error = e
+        finally:
+            self.config(cursor="")
+        
+        # 出错时以内容存储中实际留下的条数为准：内存存储保留已导入的行，
+        # 项目数据库的整批插入在一个事务中，出错时全部回滚，新建的角色也一并放弃
+        imported_count = len(self.dialogues) - count_before
+        if error is not None and imported_count == 0:
+            messagebox.showerror("错误", f"导入失败：{str(error)}\n没有导入任何内容")
+            return
+        if importer.created:
+            self.set_characters(importer.characters)
+        if count_before == 0 and importer.labels:
+            self.current_label.set(importer.labels[0])
+        
+        summary = f"导入{imported_count}条内容，新建{len(importer.created)}个角色"
+        if len(importer.labels) > 1:
+            summary += f"\n表格中包含{len(importer.labels)}个场景，已全部导入到当前场景"
+        if error is not None:
+            messagebox.showerror("错误", f"导入中断：{str(error)}\n已导入的内容保留：{summary}")
+        elif imported_count == 0:
+            messagebox.showwarning("警告", "表格中没有可导入的台词！")
+        else:
+            self.notify("成功", summary)
+    
+    def export_sheet(self):
+        if not self.dialogues:
+            messagebox.showwarning("警告", "请先添加至少一条角色对话或旁白！")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("TSV文件", "*.tsv"), ("所有文件", "*.*")],
+            title="导出为表格"
+        )
+        if not file_path:
+            return
+        
+        try:
+            # 带BOM的UTF-8，Excel可直接识别中文
+            with open(file_path, "w", encoding="utf-8-sig", newline="") as f:
+                write_sheet(f, self.characters, [(self.current_label.get(), self.dialogues)], sheet_delimiter(file_path))
+            messagebox.showinfo("成功", f"台本已导出到：\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("错误", f"导出失败：{str(e)}")
+    
+    def open_temp_file(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[
+                ("临时配置文件", "*.json *.json.gz *.json.xz"),
+                *PROJECT_DB_FILE_TYPES,
+                *SHARDED_PROJECT_FILE_TYPES,
+                ("所有文件", "*.*")
+            ],
+            title="打开临时文件"
+        )
+        if not file_path:
+            return
+        if file_path.lower().endswith(PROJECT_DB_SUFFIX):
+            self.open_project_db(file_path)
+            return
+        if file_path.lower().endswith(SHARDED_PROJECT_SUFFIX):
+            self.open_sharded_project(file_path)
+            return
+        
+        try:
+            with open_data_file(file_path) as f:
+                temp_data = read_temp_data(f)
+            
+            required_keys = ["characters", "current_label", "dialogues"]
+            if not all(key in temp_data for key in required_keys):
+                messagebox.showerror("错误", "临时文件格式错误，缺少必要数据！")
+                return
+            
+            self.load_temp_data(temp_data, file_path)
+            messagebox.showinfo("成功", f"已从临时文件恢复数据：\n{file_path}")
+        except json.JSONDecodeError:
+            messagebox.showerror("错误", "临时文件损坏，无法解析！")
+        except Exception as e:
+            messagebox.showerror("错误", f"打开临时文件失败：{str(e)}")
+    
+    def on_window_close(self):
+        close_confirm = messagebox.askyesno("确认关闭", "是否确定关闭Ren'Py脚本生成工具？")
+        if not close_confirm:
+            return
+        
+        # 项目数据库的修改已随编辑提交，无需备份
+        if self.project_db is not None:
+            self.project_db.close()
+        elif self.sharded_project is not None:
+            if self.sharded_project.has_changes():
+                answer = messagebox.askyesnocancel("保存修改", "分片项目有未保存的修改，是否保存？")
+                if answer is None or (answer and not self.save_sharded_project()):
+                    return
+        else:
+            backup_confirm = messagebox.askyesno("备份文档", "是否需要备份当前编辑的内容为临时脚本文件？")
+            if backup_confirm:
+                self.save_temp_file_on_close()
+        
+        self.destroy()
+    
+    def save_temp_file_on_close(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("临时配置文件", "*.json"), *COMPRESSED_FILE_TYPES, ("所有文件", "*.*")],
+            title="备份临时脚本文件"
+        )
+        if not file_path:
+            return
+        
+        try:
+            with open_data_file(file_path, "w") as f:
+                write_temp_data(f, self.characters, self.current_label.get(), self.dialogues, self.compact_json.get())
+            self.update_workspace_index(file_path, background=False)
+            messagebox.showinfo("备份成功", f"当前内容已备份到：\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("备份失败", f"临时文件备份失败：{str(e)}")
+
+def run_cli(argv):
+    """命令行（无界面）模式，返回进程退出码"""
+    parser = argparse.ArgumentParser(
+        prog="renpy_script_generator",
+        description="Ren'Py脚本生成工具（命令行模式），不带参数运行时打开图形界面"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    parser_render = subparsers.add_parser("render", help="将临时脚本文件渲染为Ren'Py脚本")
+    parser_render.add_argument(
+        "project",
+        help="临时脚本文件（.json/.json.gz/.json.xz）、项目数据库（.rpyproj）、分片项目（.rpyshards，渲染全部场景）或台本表格（.csv/.tsv）"
+    )
+    parser_render.add_argument("-o", "--output", required=True, help="输出的.rpy文件")
+    
+    parser_convert = subparsers.add_parser("convert", help="在临时脚本文件、项目数据库与分片项目之间转换（按扩展名识别格式）")
+    parser_convert.add_argument("input", help="输入文件（.json/.json.gz/.json.xz/.rpyproj/.rpyshards）")
+    parser_convert.add_argument("output", help="输出文件（.json/.json.gz/.json.xz/.rpyproj/.rpyshards）")
+    parser_convert.add_argument("--compact", action="store_true", help="输出JSON时不缩进")
+    parser_convert.add_argument("--label", help="输入为分片项目时要转换的场景（默认为清单中的当前场景）")
+    
+    parser_import_sheet = subparsers.add_parser("import-csv", help="将台本表格（CSV/TSV）转换为临时脚本文件或项目数据库")
+    parser_import_sheet.add_argument("sheet", help="台本表格（.csv/.tsv）")
+    parser_import_sheet.add_argument(
+        "-o", "--output", required=True,
+        help="输出文件（.json/.json.gz/.json.xz/.rpyproj，或按场景名列分场景保存的.rpyshards）"
+    )
+    parser_import_sheet.add_argument("--compact", action="store_true", help="输出JSON时不缩进")
+    
+    parser_export_sheet = subparsers.add_parser("export-csv", help="将临时脚本文件、项目数据库或分片项目导出为台本表格（CSV/TSV）")
+    parser_export_sheet.add_argument("project", help="临时脚本文件、项目数据库或分片项目（导出全部场景）")
+    parser_export_sheet.add_argument("-o", "--output", required=True, help="输出的.csv/.tsv文件")
+    
+    parser_stats = subparsers.add_parser("stats", help="统计一个或多个项目文件的台词数量与预计朗读时长，输出CSV")
+    parser_stats.add_argument("projects", nargs="+", help="临时脚本文件、项目数据库或分片项目（统计全部场景）")
+    parser_stats.add_argument("-o", "--output", help="输出的.csv文件（默认输出到标准输出）")
+    
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "import-csv":
+            # 第一遍收集角色与场景名，第二遍逐行写出，内存占用与表格行数无关
+            importer = read_sheet_characters(args.sheet)
+            current_label = importer.labels[0] if importer.labels else "start"
+            second_pass = SheetImporter(importer.characters)
+            if args.output.lower().endswith(SHARDED_PROJECT_SUFFIX):
+                check_sheet_labels(args.sheet, importer)
+                ShardedProject.create(args.output, importer.characters, iter_sheet_labels(args.sheet, second_pass, current_label))
+            else:
+                write_project_file(args.output, importer.characters, current_label, iter_sheet_file(args.sheet, second_pass), args.compact)
+            print(f"已转换：{args.output}（{importer.row_count}条内容，新建{len(importer.created)}个角色）")
+        elif args.command == "export-csv":
+            characters, labels = read_project_labels(args.project)
+            try:
+                with open(args.output, "w", encoding="utf-8-sig", newline="") as f:
+                    row_count = write_sheet(f, characters, labels, sheet_delimiter(args.output))
+            finally:
+                close_project_labels(labels)
+            print(f"已导出：{args.output}（{row_count}条内容）")
+        elif args.command == "stats":
+            output = open(args.output, "w", encoding="utf-8-sig", newline="") if args.output else sys.stdout
+            try:
+                csv.writer(output).writerow(["文件"] + STATS_CSV_HEADER)
+                for project in args.projects:
+                    # 分片项目统计全部场景
+                    characters, labels = read_project_labels(project)
+                    try:
+                        stats = ProjectStats.from_dialogues(chain.from_iterable(dialogues for label_name, dialogues in labels))
+                    finally:
+                        close_project_labels(labels)
+                    write_stats_csv(output, stats.rows(characters), project)
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+        elif args.command == "convert":
+            characters, current_label, dialogues = read_project_file(args.input, args.label)
+            try:
+                write_project_file(args.output, characters, current_label, dialogues, args.compact)
+                print(f"已转换：{args.output}（{len(dialogues)}条内容）")
+            finally:
+                dialogues.close()
+        elif args.command == "render" and args.project.lower().endswith((".csv", ".tsv", ".tab")):
+            with open(args.output, "w", encoding="utf-8") as f:
+                row_count, created_count = write_sheet_script(args.project, f)
+            print(f"已生成：{args.output}（{row_count}条内容，{created_count}个角色）")
+        elif args.command == "render" and args.project.lower().endswith(SHARDED_PROJECT_SUFFIX):
+            with open(args.output, "w", encoding="utf-8") as f:
+                label_count, row_count = write_sharded_script(args.project, f)
+            print(f"已生成：{args.output}（{label_count}个场景，{row_count}条内容）")
+        elif args.command == "render":
+            characters, current_label, dialogues = read_project_file(args.project)
+            try:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    for part in iter_script_parts(characters, normalize_label_name(current_label), dialogues):
+                        f.write(part)
+                print(f"已生成：{args.output}（{len(dialogues)}条内容）")
+            finally:
+                dialogues.close()
+    except (OSError, ValueError, EOFError, lzma.LZMAError, sqlite3.Error, csv.Error) as e:
+        print(f"错误：{str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+    
+    try:
+        from ctypes import windll
+        windll.shcore.SetProcessDpiAwareness(1)
+    except:
+        pass
+    
+    app = RenPyScriptGenerator()
     app.mainloop()
\ No newline at end of file